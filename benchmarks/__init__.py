@@ -0,0 +1 @@
+"""Performance benchmarks for LinkSaver. Run modules with `python -m benchmarks.<name>`."""
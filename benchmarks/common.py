@@ -0,0 +1,49 @@
+"""Timing helpers shared by the benchmark scripts"""
+import json
+import math
+import time
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(int(math.ceil(pct / 100.0 * len(ordered))) - 1, 0)
+    return ordered[rank]
+
+
+def summarize(samples_ms, elapsed_s=None):
+    """Latency summary (milliseconds) and throughput for a list of samples"""
+    count = len(samples_ms)
+    summary = {
+        'count': count,
+        'mean_ms': round(sum(samples_ms) / count, 4) if count else 0.0,
+        'p50_ms': round(percentile(samples_ms, 50), 4),
+        'p95_ms': round(percentile(samples_ms, 95), 4),
+        'p99_ms': round(percentile(samples_ms, 99), 4),
+        'max_ms': round(max(samples_ms), 4) if count else 0.0,
+    }
+    if elapsed_s:
+        summary['throughput_per_s'] = round(count / elapsed_s, 2)
+    return summary
+
+
+def time_calls(func, iterations):
+    """Call `func` repeatedly; return (samples in ms, total elapsed seconds)"""
+    samples = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return samples, time.perf_counter() - started
+
+
+def dump_json(data, path=None):
+    text = json.dumps(data, indent=2, sort_keys=True)
+    if path:
+        with open(path, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
@@ -0,0 +1,207 @@
+"""
+Seed a scratch database with a large, realistic-looking dataset.
+
+Creates N users sharing --links links between them: the first user
+(bench0@example.com) gets --largest-share of them, so there is always one
+power user, and the rest split the remainder. Links get titles, domains,
+categories and keywords drawn from skewed distributions, as real accounts
+have a few favourite categories and tags. A few percent are soft-deleted.
+
+The schema comes from the real migrations, so the SQLite FTS table and the
+MySQL FULLTEXT index exist just as in production. Tags, per-user stats and
+the search index are filled in as well. Every user's password is
+BENCH_PASSWORD.
+
+    python -m benchmarks.datagen --database-url sqlite:////tmp/linksaver_bench.db --users 20 --links 1000000
+    python -m benchmarks.datagen --database-url mysql+pymysql://u:p@localhost/linksaver_bench --users 5 --links 200000
+
+Only ever point --database-url at a scratch database.
+"""
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+from flask_migrate import upgrade
+
+from benchmarks.common import dump_json
+from pkg.hashing import password_hasher
+from pkg.models import db, Link, User
+from pkg.search import search_index
+from pkg.stats import rebuild_user_stats
+from pkg.tags import attach_tags
+from pkg.urls import canonical_url_hash
+
+BENCH_PASSWORD = 'benchmark-password'
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+# (category, weight); None is a link saved without a category
+CATEGORIES = [('work', 30), ('learning', 22), ('personal', 12), ('news', 10), ('entertainment', 8),
+              ('shopping', 5), ('other', 3), (None, 10)]
+DOMAINS = ['github.com', 'stackoverflow.com', 'medium.com', 'dev.to', 'news.ycombinator.com',
+           'en.wikipedia.org', 'youtube.com', 'arxiv.org', 'docs.python.org', 'developer.mozilla.org',
+           'nytimes.com', 'theguardian.com', 'amazon.com', 'reddit.com', 'substack.com',
+           'martinfowler.com', 'realpython.com', 'lwn.net', 'blog.cloudflare.com', 'netflixtechblog.com']
+TOPICS = ['python', 'flask', 'sql', 'postgres', 'mysql', 'sqlite', 'javascript', 'typescript', 'react',
+          'css', 'design', 'performance', 'caching', 'testing', 'security', 'docker', 'kubernetes', 'linux',
+          'rust', 'go', 'java', 'machine learning', 'data', 'career', 'productivity', 'music', 'travel',
+          'cooking', 'finance', 'health', 'history', 'science', 'books', 'photography', 'gaming', 'startups']
+TITLE_PATTERNS = ['A practical guide to {topic}', 'Understanding {topic} internals', '{topic} tips and tricks',
+                  'Why {topic} matters', 'The state of {topic} in {year}', 'Getting started with {topic}',
+                  '{topic}: lessons learned', 'How we scaled {topic}', 'Ten {topic} mistakes to avoid',
+                  'Notes on {topic}']
+DESCRIPTION_WORDS = ('the of and to in is for on with as at by from this that an be are we how our '
+                     'fast slow index query cache page user data server client latency memory request').split()
+
+
+def build_app(database_url, **config):
+    from pkg import create_app
+    return create_app({'SQLALCHEMY_DATABASE_URI': database_url, 'WTF_CSRF_ENABLED': False, **config})
+
+
+def _slug(text):
+    return '-'.join(''.join(c if c.isalnum() else ' ' for c in text.lower()).split())
+
+
+class LinkFactory:
+    """Deterministic stream of realistic link rows"""
+
+    def __init__(self, seed=42, started=None, days=3 * 365):
+        self.rng = random.Random(seed)
+        self.started = started or datetime.utcnow() - timedelta(days=days)
+        self.seconds = days * 24 * 3600
+        self.categories, self.category_weights = zip(*CATEGORIES)
+        # Zipf-like: the tenth topic is used a tenth as often as the first
+        self.topic_weights = [1.0 / rank for rank in range(1, len(TOPICS) + 1)]
+
+    def rows(self, user_id, count):
+        rng = self.rng
+        offsets = sorted(rng.randrange(self.seconds) for _ in range(count))
+        for i, offset in enumerate(offsets):
+            topic = rng.choices(TOPICS, self.topic_weights)[0]
+            created_at = self.started + timedelta(seconds=offset)
+            title = rng.choice(TITLE_PATTERNS).format(topic=topic, year=created_at.year)
+            title = title[0].upper() + title[1:]
+            url = f"https://{rng.choice(DOMAINS)}/{_slug(title)}-{user_id}-{i}"
+            keywords = {topic}
+            keywords.update(rng.choices(TOPICS, self.topic_weights, k=rng.randint(0, 4)))
+            description = None
+            if rng.random() < 0.7:
+                description = ' '.join(rng.choices(DESCRIPTION_WORDS, k=rng.randint(8, 30))).capitalize() + '.'
+            edited = rng.random() < 0.1
+            yield {
+                'user_id': user_id,
+                'title': title,
+                'url': url,
+                'url_hash': canonical_url_hash(url),
+                'description': description,
+                'category': rng.choices(self.categories, self.category_weights)[0],
+                'keywords': ', '.join(sorted(keywords)),
+                'created_at': created_at,
+                'updated_at': created_at + timedelta(days=rng.randint(1, 90)) if edited else created_at,
+                'is_active': rng.random() > 0.03,
+                'fetch_status': 'done',
+            }
+
+
+def split_links(total, users, largest_share):
+    """How many links each user gets: one power user, the rest shared evenly"""
+    if users == 1:
+        return [total]
+    largest = int(total * largest_share)
+    rest, extra = divmod(total - largest, users - 1)
+    return [largest] + [rest + (1 if i < extra else 0) for i in range(users - 1)]
+
+
+def generate(app, users=10, links=100000, largest_share=0.5, batch_size=5000, seed=42, progress=None):
+    """Migrate and seed the app's database; returns a summary dict"""
+    started = time.perf_counter()
+    factory = LinkFactory(seed)
+    with app.app_context():
+        upgrade(directory=MIGRATIONS_DIR)
+        if db.session.query(User.id).first() is not None:
+            raise RuntimeError("The database already has users; datagen only seeds an empty scratch database.")
+
+        password_hash = password_hasher.hash(BENCH_PASSWORD)  # One hash, shared by every account
+        db.session.execute(db.insert(User), [
+            {'name': f"Bench User {i}", 'email': f"bench{i}@example.com", '_password_hash': password_hash}
+            for i in range(users)
+        ])
+        user_ids = [row.id for row in db.session.query(User.id).order_by(User.id)]
+
+        written = 0
+        for user_id, count in zip(user_ids, split_links(links, users, largest_share)):
+            batch = []
+            for row in factory.rows(user_id, count):
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    written += _insert_batch(user_id, batch)
+                    batch = []
+                    if progress:
+                        progress(written)
+            if batch:
+                written += _insert_batch(user_id, batch)
+            rebuild_user_stats(user_id)
+            db.session.commit()
+            if progress:
+                progress(written)
+
+        search_index.rebuild()
+        db.session.commit()
+        if db.engine.dialect.name == 'sqlite':
+            db.session.execute(db.text("ANALYZE"))
+        else:
+            db.session.execute(db.text("ANALYZE TABLE users, links, link_tags, tags"))
+        db.session.commit()
+
+    return {
+        'users': users,
+        'links': written,
+        'user_ids': user_ids,
+        'largest_user_links': split_links(links, users, largest_share)[0],
+        'seconds': round(time.perf_counter() - started, 2),
+    }
+
+
+def _insert_batch(user_id, batch):
+    # Links are only ever added here, so new rows are the ones past the old maximum id
+    last_id = db.session.query(db.func.max(Link.id)).filter(Link.user_id == user_id).scalar() or 0
+    db.session.execute(db.insert(Link), batch)
+    attach_tags(user_id, db.session.query(Link.id, Link.keywords).filter(
+        Link.user_id == user_id, Link.id > last_id
+    ).all())
+    db.session.commit()
+    return len(batch)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', required=True, help='Empty scratch database to seed')
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--links', type=int, default=100000, help='Links in total, across all users')
+    parser.add_argument('--largest-share', type=float, default=0.5,
+                        help="Fraction of the links owned by the first user")
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', dest='json_path', nargs='?', const='-', default=None,
+                        help='Write the summary to a file (or stdout with no value)')
+    args = parser.parse_args(argv)
+    if args.users < 1 or args.links < 0 or not 0 < args.largest_share <= 1:
+        parser.error('need --users >= 1, --links >= 0 and 0 < --largest-share <= 1')
+
+    app = build_app(args.database_url)
+    summary = generate(app, users=args.users, links=args.links, largest_share=args.largest_share,
+                       batch_size=args.batch_size, seed=args.seed,
+                       progress=lambda n: print(f"\r{n} links", end='', flush=True))
+    print()
+    if args.json_path:
+        dump_json(summary, None if args.json_path == '-' else args.json_path)
+    else:
+        print(f"Seeded {summary['users']} users and {summary['links']} links in {summary['seconds']}s "
+              f"(largest account: {summary['largest_user_links']} links).")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
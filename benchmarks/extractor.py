@@ -0,0 +1,138 @@
+"""
+Benchmark the streaming head-only extractor against the old BeautifulSoup parser.
+
+Each fixture in benchmarks/fixtures/html is optionally padded with body
+content (to mimic multi-megabyte pages) and then:
+
+- parsed in full by the legacy parser (what fetch_metadata used to do), and
+- streamed to pkg.extractor in 16 KiB chunks, as it is read from the socket.
+
+The script checks that both produce the same metadata, then reports per-call
+latency, peak Python memory and how many bytes each approach had to consume.
+
+    python -m benchmarks.extractor --body-kb 2048 --iterations 50 --json out.json
+"""
+import argparse
+import os
+import tracemalloc
+
+from benchmarks.common import dump_json, summarize, time_calls
+from pkg.extractor import DEFAULT_CHUNK_SIZE, DEFAULT_MAX_BYTES, HeadMetadataParser, extract_metadata
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures', 'html')
+BASE_URL = 'https://fixtures.example.com/path/page.html'
+FILLER = b'<p>' + b'Lorem ipsum dolor sit amet, consectetur adipiscing elit. ' * 16 + b'</p>\n'
+
+
+def load_fixtures(body_kb):
+    """Return {name: document bytes}, padded with `body_kb` KiB of body content"""
+    fixtures = {}
+    for name in sorted(os.listdir(FIXTURES_DIR)):
+        if not name.endswith('.html'):
+            continue
+        with open(os.path.join(FIXTURES_DIR, name), 'rb') as f:
+            document = f.read()
+        if body_kb:
+            padding = FILLER * (body_kb * 1024 // len(FILLER) + 1)
+            marker = document.rfind(b'</body>')
+            if marker == -1:
+                document = document + padding
+            else:
+                document = document[:marker] + padding + document[marker:]
+        fixtures[name] = document
+    return fixtures
+
+
+def chunked(document, chunk_size=DEFAULT_CHUNK_SIZE):
+    for start in range(0, len(document), chunk_size):
+        yield document[start:start + chunk_size]
+
+
+def streaming_bytes_consumed(document):
+    """How much of the document the streaming extractor reads before stopping"""
+    parser = HeadMetadataParser()
+    for chunk in chunked(document):
+        if parser.feed(chunk) or parser.bytes_read >= DEFAULT_MAX_BYTES:
+            break
+    parser.close()
+    return parser.bytes_read
+
+
+def peak_memory(func):
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(body_kb, iterations):
+    from benchmarks.legacy_metadata import legacy_parse_metadata
+
+    results = {'body_kb': body_kb, 'iterations': iterations, 'fixtures': {}}
+    mismatches = []
+
+    for name, document in load_fixtures(body_kb).items():
+        def legacy():
+            return legacy_parse_metadata(document, BASE_URL)
+
+        def streaming():
+            return extract_metadata(chunked(document), BASE_URL)
+
+        legacy_result, streaming_result = legacy(), streaming()
+        if legacy_result != streaming_result:
+            mismatches.append({'fixture': name, 'legacy': legacy_result, 'streaming': streaming_result})
+
+        legacy_samples, legacy_elapsed = time_calls(legacy, iterations)
+        streaming_samples, streaming_elapsed = time_calls(streaming, iterations)
+
+        legacy_summary = summarize(legacy_samples, legacy_elapsed)
+        legacy_summary.update(peak_bytes=peak_memory(legacy), bytes_consumed=len(document))
+        streaming_summary = summarize(streaming_samples, streaming_elapsed)
+        streaming_summary.update(peak_bytes=peak_memory(streaming),
+                                 bytes_consumed=streaming_bytes_consumed(document))
+
+        results['fixtures'][name] = {
+            'document_bytes': len(document),
+            'legacy': legacy_summary,
+            'streaming': streaming_summary,
+            'speedup': round(legacy_summary['mean_ms'] / streaming_summary['mean_ms'], 2)
+            if streaming_summary['mean_ms'] else None,
+        }
+
+    results['mismatches'] = mismatches
+    return results
+
+
+def print_table(results):
+    print(f"body padding: {results['body_kb']} KiB, iterations: {results['iterations']}")
+    print(f"{'fixture':<18}{'size':>10}{'legacy ms':>12}{'stream ms':>12}{'speedup':>9}"
+          f"{'legacy peak':>14}{'stream peak':>14}{'read':>10}")
+    for name, row in results['fixtures'].items():
+        print(f"{name:<18}{row['document_bytes']:>10}{row['legacy']['mean_ms']:>12.3f}"
+              f"{row['streaming']['mean_ms']:>12.3f}{row['speedup'] or 0:>8.1f}x"
+              f"{row['legacy']['peak_bytes']:>14}{row['streaming']['peak_bytes']:>14}"
+              f"{row['streaming']['bytes_consumed']:>10}")
+    for mismatch in results['mismatches']:
+        print(f"MISMATCH {mismatch['fixture']}: legacy={mismatch['legacy']} streaming={mismatch['streaming']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--body-kb', type=int, default=1024, help='KiB of body content added to each fixture')
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--json', dest='json_path', nargs='?', const='-', default=None,
+                        help='Write machine-readable results to a file (or stdout with no value)')
+    args = parser.parse_args(argv)
+
+    results = run(args.body_kb, args.iterations)
+    if args.json_path:
+        dump_json(results, None if args.json_path == '-' else args.json_path)
+    else:
+        print_table(results)
+    return 1 if results['mismatches'] else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
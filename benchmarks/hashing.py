@@ -0,0 +1,117 @@
+"""
+Benchmark password hashing methods for PASSWORD_HASH_METHOD.
+
+For each method the script measures single-threaded hashes per second, then
+drives the real /auth/login route (scratch SQLite database, Flask test
+client) with `--concurrency` simultaneous logins and reports the login
+latency percentiles, p99 included. Pick the most expensive method whose p99
+still fits the login latency budget at the concurrency you expect.
+
+    python -m benchmarks.hashing
+    python -m benchmarks.hashing --method scrypt:32768:8:1 --method pbkdf2:sha256:600000 \\
+        --logins 200 --concurrency 8 --json out.json
+"""
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import generate_password_hash
+
+from benchmarks.common import dump_json, summarize, time_calls
+from pkg.hashing import DEFAULT_METHOD
+
+EMAIL = 'bench@example.com'
+PASSWORD = 'correct horse battery staple'
+
+
+def build_app(database_url, method):
+    from pkg import create_app
+    return create_app({
+        'SQLALCHEMY_DATABASE_URI': database_url,
+        'PASSWORD_HASH_METHOD': method,
+        'SEARCH_BACKEND': 'memory',
+        'WTF_CSRF_ENABLED': False,
+        'TESTING': True,
+    })
+
+
+def seed(app):
+    from pkg.models import db, User
+    with app.app_context():
+        db.create_all()
+        user = User(name='Bench', email=EMAIL)
+        user.password = PASSWORD
+        db.session.add(user)
+        db.session.commit()
+
+
+def login_latencies(app, logins, concurrency):
+    """Run `logins` logins, `concurrency` at a time; (samples in ms, elapsed seconds, failures)"""
+    def attempt(_):
+        client = app.test_client()
+        t0 = time.perf_counter()
+        response = client.post('/auth/login', data={'email': EMAIL, 'password': PASSWORD})
+        elapsed = (time.perf_counter() - t0) * 1000
+        return elapsed, response.headers.get('Location', '').endswith('/dashboard/')
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(attempt, range(logins)))
+    elapsed = time.perf_counter() - started
+    return [ms for ms, _ in outcomes], elapsed, sum(1 for _, ok in outcomes if not ok)
+
+
+def run(methods, hash_iterations, logins, concurrency):
+    results = {'logins': logins, 'concurrency': concurrency, 'methods': {}}
+    with tempfile.TemporaryDirectory() as scratch:
+        for index, method in enumerate(methods):
+            samples, elapsed = time_calls(lambda: generate_password_hash(PASSWORD, method=method), hash_iterations)
+            hashing = summarize(samples, elapsed)
+
+            app = build_app('sqlite:///' + os.path.join(scratch, f'hashing{index}.db'), method)
+            seed(app)
+            login_samples, login_elapsed, failures = login_latencies(app, logins, concurrency)
+            login = summarize(login_samples, login_elapsed)
+            login['failures'] = failures
+
+            results['methods'][method] = {
+                'hashes_per_s': hashing['throughput_per_s'],
+                'hash': hashing,
+                'login': login,
+            }
+    return results
+
+
+def print_table(results):
+    print(f"logins: {results['logins']}, concurrency: {results['concurrency']}")
+    print(f"{'method':<28}{'hashes/s':>10}{'logins/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'failed':>8}")
+    for method, row in results['methods'].items():
+        login = row['login']
+        print(f"{method:<28}{row['hashes_per_s']:>10.1f}{login['throughput_per_s']:>10.1f}"
+              f"{login['p50_ms']:>10.1f}{login['p95_ms']:>10.1f}{login['p99_ms']:>10.1f}{login['failures']:>8}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--method', dest='methods', action='append',
+                        help=f'Werkzeug hash method; repeat to compare (default: {DEFAULT_METHOD})')
+    parser.add_argument('--hash-iterations', type=int, default=20, help='Hashes timed per method')
+    parser.add_argument('--logins', type=int, default=100, help='Login requests per method')
+    parser.add_argument('--concurrency', type=int, default=4, help='Simultaneous logins')
+    parser.add_argument('--json', dest='json_path', nargs='?', const='-', default=None,
+                        help='Write machine-readable results to a file (or stdout with no value)')
+    args = parser.parse_args(argv)
+
+    results = run(args.methods or [DEFAULT_METHOD], args.hash_iterations, args.logins, args.concurrency)
+    if args.json_path:
+        dump_json(results, None if args.json_path == '-' else args.json_path)
+    else:
+        print_table(results)
+    failed = sum(row['login']['failures'] for row in results['methods'].values())
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,76 @@
+"""
+The BeautifulSoup metadata parser that pkg.extractor replaced, kept verbatim
+as the baseline for benchmarks.extractor.
+"""
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+
+
+def legacy_parse_metadata(html, base_url):
+    """Extract title, description and image URL from an HTML document"""
+    soup = BeautifulSoup(html, 'lxml')  # Use lxml; fall back to 'html.parser' if lxml not installed
+
+    metadata = {
+        'title': '',
+        'description': '',
+        'image_url': ''
+    }
+
+    # Fetch Title (Order: <title>, og:title, twitter:title)
+    if soup.title and soup.title.string:
+        metadata['title'] = soup.title.string.strip()
+
+    if not metadata['title']:
+        og_title = soup.find('meta', property='og:title')
+        if og_title and og_title.get('content'):
+            metadata['title'] = og_title['content'].strip()
+
+    if not metadata['title']:
+        twitter_title = soup.find('meta', attrs={'name': 'twitter:title'})
+        if twitter_title and twitter_title.get('content'):
+            metadata['title'] = twitter_title['content'].strip()
+
+    # Fetch Description (Order: meta description, og:description, twitter:description)
+    meta_description = soup.find('meta', attrs={'name': 'description'})
+    if meta_description and meta_description.get('content'):
+        metadata['description'] = meta_description['content'].strip()
+
+    if not metadata['description']:
+        og_description = soup.find('meta', property='og:description')
+        if og_description and og_description.get('content'):
+            metadata['description'] = og_description['content'].strip()
+
+    if not metadata['description']:
+        twitter_description = soup.find('meta', attrs={'name': 'twitter:description'})
+        if twitter_description and twitter_description.get('content'):
+            metadata['description'] = twitter_description['content'].strip()
+
+    # Fetch Image URL (Order: og:image, twitter:image, apple-touch-icon, icon)
+    image_url_found = None
+    og_image = soup.find('meta', property='og:image')
+    if og_image and og_image.get('content'):
+        image_url_found = og_image['content']
+
+    if not image_url_found:
+        twitter_image = soup.find('meta', attrs={'name': 'twitter:image'})
+        if twitter_image and twitter_image.get('content'):
+            image_url_found = twitter_image['content']
+
+    if not image_url_found:
+        # Check for apple-touch-icon (often higher quality than favicon)
+        apple_icon = soup.find('link', rel='apple-touch-icon')
+        if apple_icon and apple_icon.get('href'):
+            image_url_found = apple_icon['href']
+
+    if not image_url_found:
+        # Fallback to generic icon
+        icon_link = soup.find('link', rel='icon')
+        if icon_link and icon_link.get('href'):
+            image_url_found = icon_link['href']
+
+    if image_url_found:
+        # Resolve relative URL to absolute using the final URL after redirects
+        metadata['image_url'] = urljoin(base_url, image_url_found.strip())
+
+    return metadata
@@ -0,0 +1,255 @@
+"""
+Load and throughput scenarios against a seeded database.
+
+Drives the real routes in-process through the Flask test client, with
+--concurrency threads sharing the work. Each thread has its own client,
+logged in as the seeded power user (bench0@example.com). Timings cover the
+app and the database, not a WSGI server or the network. Scenarios:
+
+    dashboard        GET /dashboard/
+    scroll           GET /api/v1/links, the second page
+    api_links        GET /api/v1/links
+    search           GET /dashboard/?search=<topic>
+    filter_category  GET /dashboard/?category=<category>
+    filter_tag       GET /dashboard/?tag=<topic>
+    add              POST /dashboard/links/add
+    edit             POST /dashboard/links/edit/<id>    (links made by `add`)
+    delete           POST /dashboard/links/delete/<id>  (the same links)
+    metadata_fetch   POST /dashboard/fetch-metadata     (stub server, cache misses)
+    metadata_cached  POST /dashboard/fetch-metadata     (the same URL every time)
+
+The write scenarios change the database: seed a scratch one with
+benchmarks.datagen first, or leave out --database-url to seed a temporary one.
+Results are JSON with the commit they ran on; --compare prints the change
+between two result files.
+
+    python -m benchmarks.datagen --database-url sqlite:////tmp/linksaver_bench.db --links 1000000
+    python -m benchmarks.load --database-url sqlite:////tmp/linksaver_bench.db --requests 200 --json before.json
+    python -m benchmarks.load --compare before.json after.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from benchmarks import datagen
+from benchmarks.common import dump_json, summarize
+from benchmarks.stub_server import running as stub_server
+from pkg.models import db, Link, User
+
+SCENARIOS = ('dashboard', 'scroll', 'api_links', 'search', 'filter_category', 'filter_tag',
+             'add', 'edit', 'delete', 'metadata_fetch', 'metadata_cached')
+SEARCH_TERMS = ['python', 'performance guide', 'sql', 'caching tips', 'docker', 'react', 'travel', 'rust']
+FIXTURE = 'article.html'
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class LoadRun:
+    """One benchmark run: the app, the logged-in clients and per-scenario state"""
+
+    def __init__(self, app, stub_url, concurrency):
+        self.app = app
+        self.stub_url = stub_url
+        self.concurrency = concurrency
+        self.run_id = uuid.uuid4().hex[:8]
+        self._local = threading.local()
+        with app.app_context():
+            user = User.query.filter_by(email='bench0@example.com').first()
+            if user is None:
+                raise RuntimeError("No bench0@example.com user; seed the database with benchmarks.datagen first.")
+            self.user_id = user.id
+            self.dataset = {
+                'users': db.session.query(db.func.count(User.id)).scalar(),
+                'links': db.session.query(db.func.count(Link.id)).scalar(),
+                'user_links': db.session.query(db.func.count(Link.id)).filter(Link.user_id == user.id).scalar(),
+                'dialect': db.engine.dialect.name,
+            }
+        self.second_page_cursor = None
+        self.created_ids = []
+
+    @property
+    def client(self):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+            with client.session_transaction() as session:
+                session['user_id'] = self.user_id
+        return client
+
+    def prepare(self, name):
+        """Scenario setup, outside the timed requests"""
+        if name == 'scroll':
+            page = self.client.get('/api/v1/links?fields=id').get_json()
+            self.second_page_cursor = page['next_cursor']
+        elif name in ('edit', 'delete'):
+            with self.app.app_context():
+                self.created_ids = [row.id for row in db.session.query(Link.id).filter(
+                    Link.user_id == self.user_id, Link.is_active.is_(True),
+                    Link.url.like(f"https://bench.example.com/load-{self.run_id}/%"),
+                ).order_by(Link.id)]
+            if not self.created_ids:
+                raise RuntimeError(f"'{name}' needs the links made by the 'add' scenario; run it first.")
+
+    def request(self, name, i):
+        """Issue request number `i` of a scenario; returns the response status"""
+        client = self.client
+        if name == 'dashboard':
+            response = client.get('/dashboard/')
+        elif name == 'scroll':
+            response = client.get(f"/api/v1/links?cursor={self.second_page_cursor or ''}")
+        elif name == 'api_links':
+            response = client.get('/api/v1/links')
+        elif name == 'search':
+            response = client.get('/dashboard/', query_string={'search': SEARCH_TERMS[i % len(SEARCH_TERMS)]})
+        elif name == 'filter_category':
+            category = datagen.CATEGORIES[i % (len(datagen.CATEGORIES) - 1)][0]
+            response = client.get('/dashboard/', query_string={'category': category})
+        elif name == 'filter_tag':
+            response = client.get('/dashboard/', query_string={'tag': datagen.TOPICS[i % 10]})
+        elif name == 'add':
+            response = client.post('/dashboard/links/add', data={
+                'title': f"Load test link {i}",
+                'url': f"https://bench.example.com/load-{self.run_id}/{i}",
+                'category': 'work',
+                'keywords': 'python, performance',
+            })
+        elif name == 'edit':
+            link_id = self.created_ids[i % len(self.created_ids)]
+            response = client.post(f"/dashboard/links/edit/{link_id}", data={
+                'title': f"Edited load test link {i}",
+                'url': f"https://bench.example.com/load-{self.run_id}/{link_id}",
+                'category': 'learning',
+                'keywords': 'python, benchmarks',
+            })
+        elif name == 'delete':
+            if i >= len(self.created_ids):
+                return None  # Each link can only be deleted once
+            response = client.post(f"/dashboard/links/delete/{self.created_ids[i]}")
+        elif name == 'metadata_fetch':
+            response = client.post('/dashboard/fetch-metadata',
+                                   json={'url': f"{self.stub_url}/{FIXTURE}?run={self.run_id}&n={i}"})
+        elif name == 'metadata_cached':
+            response = client.post('/dashboard/fetch-metadata', json={'url': f"{self.stub_url}/{FIXTURE}"})
+        else:
+            raise ValueError(f"Unknown scenario: {name}")
+        return response.status_code
+
+    def run_scenario(self, name, requests):
+        self.prepare(name)
+        if name == 'metadata_cached':
+            self.request(name, 0)  # Warm the cache
+
+        def timed(i):
+            t0 = time.perf_counter()
+            status = self.request(name, i)
+            return status, (time.perf_counter() - t0) * 1000
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            outcomes = [outcome for outcome in pool.map(timed, range(requests)) if outcome[0] is not None]
+        elapsed = time.perf_counter() - started
+
+        summary = summarize([ms for _, ms in outcomes], elapsed)
+        summary['errors'] = sum(1 for status, _ in outcomes if status >= 400)
+        return summary
+
+
+def run(database_url, scenarios, requests, concurrency, latency_ms):
+    app = datagen.build_app(database_url)
+    results = {
+        'commit': git_commit(),
+        'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'requests': requests,
+        'concurrency': concurrency,
+        'stub_latency_ms': latency_ms,
+        'scenarios': {},
+    }
+    with stub_server(latency_ms) as stub_url:
+        load = LoadRun(app, stub_url, concurrency)
+        results['dataset'] = load.dataset
+        for name in scenarios:
+            results['scenarios'][name] = load.run_scenario(name, requests)
+    return results
+
+
+def print_table(results):
+    dataset = results['dataset']
+    print(f"commit {results['commit']}, {dataset['dialect']}: {dataset['links']} links "
+          f"({dataset['user_links']} for the test user), concurrency {results['concurrency']}")
+    print(f"{'scenario':<18}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for name, row in results['scenarios'].items():
+        print(f"{name:<18}{row.get('throughput_per_s', 0):>9.1f}{row['p50_ms']:>10.2f}"
+              f"{row['p95_ms']:>10.2f}{row['p99_ms']:>10.2f}{row['errors']:>8}")
+
+
+def compare(before_path, after_path):
+    """Print the relative change of each scenario's p50/p99 and throughput"""
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+
+    def change(old, new):
+        return f"{(new - old) / old * 100:+.1f}%" if old else 'n/a'
+
+    print(f"{before.get('commit')} -> {after.get('commit')}")
+    print(f"{'scenario':<18}{'p50':>10}{'p99':>10}{'req/s':>10}")
+    for name, new in after['scenarios'].items():
+        old = before['scenarios'].get(name)
+        if old is None:
+            continue
+        print(f"{name:<18}{change(old['p50_ms'], new['p50_ms']):>10}{change(old['p99_ms'], new['p99_ms']):>10}"
+              f"{change(old.get('throughput_per_s', 0), new.get('throughput_per_s', 0)):>10}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', default=None,
+                        help='Database seeded by benchmarks.datagen (default: seed a temporary SQLite file)')
+    parser.add_argument('--seed-links', type=int, default=20000,
+                        help='Links to seed when no --database-url is given')
+    parser.add_argument('--scenario', dest='scenarios', action='append', choices=SCENARIOS,
+                        help='Scenario to run; repeat for several (default: all, in order)')
+    parser.add_argument('--requests', type=int, default=100, help='Requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--latency-ms', type=float, default=20, help='Stub server delay per response')
+    parser.add_argument('--json', dest='json_path', nargs='?', const='-', default=None,
+                        help='Write machine-readable results to a file (or stdout with no value)')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'),
+                        help='Compare two result files instead of running')
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    scenarios = args.scenarios or list(SCENARIOS)
+    with tempfile.TemporaryDirectory() as scratch:
+        database_url = args.database_url
+        if database_url is None:
+            database_url = 'sqlite:///' + os.path.join(scratch, 'load.db')
+            datagen.generate(datagen.build_app(database_url), users=5, links=args.seed_links)
+        results = run(database_url, scenarios, args.requests, args.concurrency, args.latency_ms)
+
+    if args.json_path:
+        dump_json(results, None if args.json_path == '-' else args.json_path)
+    else:
+        print_table(results)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
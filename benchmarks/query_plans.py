@@ -0,0 +1,270 @@
+"""
+Query-plan regression check for the dashboard's hot queries.
+
+Seeds a scratch database, drives the real dashboard endpoints and helpers
+through the Flask test client, captures every SQL statement each step runs
+and EXPLAINs it. The script exits non-zero if a hot query falls back to a
+full table scan or a sort that an index should have served (SQLite: SCAN
+without an index, USE TEMP B-TREE; MySQL: type=ALL, Using filesort).
+
+    python -m benchmarks.query_plans                      # temporary SQLite file
+    python -m benchmarks.query_plans --links 50000 --verbose
+    python -m benchmarks.query_plans --database-url mysql+pymysql://u:p@localhost/linksaver_scratch
+
+The database given with --database-url is created and seeded in place: only
+ever point it at an empty scratch database.
+"""
+import argparse
+import os
+import random
+import re
+import tempfile
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from benchmarks.common import dump_json
+
+CATEGORIES = ['work', 'personal', 'learning', 'entertainment', 'news', 'shopping', 'other', None]
+TAGS = ['python', 'flask', 'sql', 'design', 'music', 'travel', 'java', 'javascript', 'go', 'rust']
+
+SQLITE_SCAN = re.compile(r'^SCAN (\w+)(?! USING (COVERING )?INDEX)')
+# Ordering by an aggregate (e.g. tag counts) always needs a sort; no index can serve it
+AGGREGATE_ORDER = re.compile(r'ORDER BY (count|sum|max|min)\(', re.IGNORECASE)
+
+
+class Step:
+    """One dashboard action; `allow` lists plan problems accepted for it"""
+
+    def __init__(self, name, run, hot=True, allow=()):
+        self.name = name
+        self.run = run
+        self.hot = hot
+        self.allow = set(allow)
+
+
+def build_app(database_url):
+    from pkg import create_app
+    return create_app({
+        'SQLALCHEMY_DATABASE_URI': database_url,
+        'SEARCH_BACKEND': 'memory',  # Search has its own index; not what this checks
+        'WTF_CSRF_ENABLED': False,
+        'TESTING': True,
+    })
+
+
+def seed(app, links_per_user, other_users):
+    """Schema via create_all, then one big account and some smaller ones"""
+    from pkg.models import db, Link, User, Tag, link_tags
+    from pkg.stats import rebuild_user_stats
+    from pkg.urls import canonical_url_hash
+
+    rng = random.Random(42)
+    with app.app_context():
+        db.create_all()
+        users = [User(name=f"User {i}", email=f"user{i}@example.com", _password_hash='x')
+                 for i in range(other_users + 1)]
+        db.session.add_all(users)
+        db.session.flush()
+
+        started = datetime(2020, 1, 1)
+        for user in users:
+            count = links_per_user if user is users[0] else max(links_per_user // 20, 10)
+            tags = [Tag(user_id=user.id, name=name) for name in TAGS]
+            db.session.add_all(tags)
+            db.session.flush()
+
+            rows = []
+            for i in range(count):
+                url = f"https://site{i % 500}.example.com/{user.id}/{i}"
+                rows.append({
+                    'user_id': user.id,
+                    'title': f"Link {i}",
+                    'url': url,
+                    'url_hash': canonical_url_hash(url),
+                    'category': rng.choice(CATEGORIES),
+                    'keywords': None,
+                    'created_at': started + timedelta(minutes=i),
+                    'updated_at': started + timedelta(minutes=i),
+                    'is_active': rng.random() > 0.05,
+                })
+            for start in range(0, len(rows), 5000):
+                db.session.execute(db.insert(Link), rows[start:start + 5000])
+
+            ids = [row.id for row in db.session.query(Link.id).filter(Link.user_id == user.id)]
+            pairs = [{'link_id': link_id, 'tag_id': tag.id}
+                     for link_id in ids for tag in rng.sample(tags, 2)]
+            for start in range(0, len(pairs), 5000):
+                db.session.execute(link_tags.insert(), pairs[start:start + 5000])
+            rebuild_user_stats(user.id)
+        db.session.commit()
+
+        if db.engine.dialect.name == 'sqlite':
+            db.session.execute(db.text("ANALYZE"))
+        else:
+            db.session.execute(db.text("ANALYZE TABLE links, link_tags, tags"))
+        db.session.commit()
+        return users[0].id
+
+
+def build_steps(app, client, user_id):
+    from pkg.archive import archive_batch
+    from pkg.duplicates import find_duplicate
+    from pkg.link_health import claim_links
+    from pkg.similarity import similarity_index
+    from pkg.stats import rebuild_user_stats
+    from pkg.tags import tag_facets
+
+    def in_app(func):
+        def run():
+            with app.app_context():
+                func()
+        return run
+
+    def next_cursor(path):
+        html = client.get(path).get_data(as_text=True)
+        found = re.search(r'data-next-cursor="([^"]+)"', html)
+        return found.group(1) if found else ''
+
+    cursor = {}
+
+    def first_page():
+        cursor['all'] = next_cursor('/dashboard/')
+
+    def first_page_category():
+        cursor['work'] = next_cursor('/dashboard/?category=work')
+
+    return [
+        Step('dashboard', first_page),
+        Step('dashboard_category', first_page_category),
+        Step('next_page', lambda: client.get(f"/api/v1/links?cursor={cursor['all']}")),
+        Step('next_page_category',
+             lambda: client.get(f"/api/v1/links?cursor={cursor['work']}&category=work")),
+        Step('duplicate_lookup', in_app(lambda: find_duplicate(user_id, 'https://site7.example.com/1/7'))),
+        Step('tag_facets', in_app(lambda: tag_facets(user_id))),
+        # Tagged links are found through link_tags, then sorted by date
+        Step('tag_filter', lambda: client.get('/dashboard/?tag=python'), hot=False),
+        Step('broken_filter', lambda: client.get('/dashboard/?health=broken')),
+        # The link modal's suggestions: band matches counted on the index, then joined to links.
+        # The sorts and the scan are over those few matches (at most BANDS rows per link), not links
+        Step('similar_links', lambda: client.post('/dashboard/links/suggest', json={
+            'url': 'https://site7.example.com/python-tips', 'title': 'Python performance tips'}),
+             allow=('scan', 'sort')),
+        # The link checker's batch claim: least recently checked links first
+        Step('health_due', in_app(lambda: claim_links(500, datetime.utcnow())), hot=False),
+        Step('stats_rebuild', in_app(lambda: rebuild_user_stats(user_id)), hot=False),
+        # The archiver's batch: long-deleted links moved to links_archive (changes the data, so it runs last)
+        Step('archive_batch', in_app(lambda: archive_batch(datetime.utcnow() - timedelta(days=30), 500)),
+             hot=False),
+    ]
+
+
+def explain(connection, statement, parameters):
+    """Plan rows for a captured statement, and the problems found in them"""
+    dialect = connection.dialect.name
+    problems = set()
+    if dialect == 'sqlite':
+        rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+        plan = [row[-1] for row in rows]
+        for detail in plan:
+            if SQLITE_SCAN.match(detail):
+                problems.add('scan')
+            if 'USE TEMP B-TREE' in detail:
+                problems.add('sort')
+    else:
+        result = connection.exec_driver_sql(f"EXPLAIN {statement}", parameters)
+        keys = list(result.keys())
+        plan = [dict(zip(keys, row)) for row in result]
+        for row in plan:
+            if row.get('type') == 'ALL':
+                problems.add('scan')
+            if 'Using filesort' in (row.get('Extra') or ''):
+                problems.add('sort')
+        plan = [str(row) for row in plan]
+    return plan, problems
+
+
+def run(database_url, links_per_user, other_users):
+    app = build_app(database_url)
+    user_id = seed(app, links_per_user, other_users)
+
+    from pkg.models import db
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+
+    with app.app_context():
+        engine = db.engine
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT') and not executemany:
+            captured.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', capture)
+    steps = build_steps(app, client, user_id)
+    results = {'dialect': engine.dialect.name, 'links_per_user': links_per_user, 'steps': [], 'failures': []}
+    try:
+        for step in steps:
+            captured.clear()
+            step.run()
+            statements = list(captured)
+            entries = []
+            with engine.connect() as connection:
+                for statement, parameters in statements:
+                    if 'links' not in statement and 'link_tags' not in statement:
+                        continue  # users / user_link_stats primary-key lookups
+                    plan, problems = explain(connection, statement, parameters)
+                    if AGGREGATE_ORDER.search(statement):
+                        problems.discard('sort')
+                    blocking = sorted(problems - step.allow) if step.hot else []
+                    entries.append({'sql': ' '.join(statement.split()), 'plan': plan,
+                                    'problems': sorted(problems), 'failed': blocking})
+                    if blocking:
+                        results['failures'].append({'step': step.name, 'problems': blocking,
+                                                    'sql': entries[-1]['sql'], 'plan': plan})
+            results['steps'].append({'name': step.name, 'hot': step.hot, 'queries': entries})
+    finally:
+        event.remove(engine, 'before_cursor_execute', capture)
+    return results
+
+
+def print_report(results, verbose):
+    print(f"dialect: {results['dialect']}, links in seeded account: {results['links_per_user']}")
+    for step in results['steps']:
+        worst = 'FAIL' if any(q['failed'] for q in step['queries']) else 'ok'
+        print(f"{step['name']:<22}{'hot' if step['hot'] else '':<5}{len(step['queries']):>3} queries  {worst}")
+        for query in step['queries']:
+            if verbose or query['failed']:
+                print(f"    {query['sql'][:160]}")
+                for line in query['plan']:
+                    print(f"        {line}")
+    for failure in results['failures']:
+        print(f"FAILED {failure['step']}: {', '.join(failure['problems'])}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', default=None,
+                        help='Scratch database to seed (default: a temporary SQLite file)')
+    parser.add_argument('--links', type=int, default=20000, help='Links in the main seeded account')
+    parser.add_argument('--other-users', type=int, default=20)
+    parser.add_argument('--verbose', action='store_true', help='Print every plan, not just failures')
+    parser.add_argument('--json', dest='json_path', nargs='?', const='-', default=None,
+                        help='Write machine-readable results to a file (or stdout with no value)')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as scratch:
+        database_url = args.database_url or 'sqlite:///' + os.path.join(scratch, 'plans.db')
+        results = run(database_url, args.links, args.other_users)
+
+    if args.json_path:
+        dump_json(results, None if args.json_path == '-' else args.json_path)
+    else:
+        print_report(results, args.verbose)
+    return 1 if results['failures'] else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,117 @@
+"""
+Local HTTP server for metadata-fetch benchmarks.
+
+Serves the HTML fixtures in benchmarks/fixtures/html with a configurable
+delay, so fetch timings measure our code plus a known latency rather than
+whatever a real site does that day.
+
+    GET /<fixture>.html            the fixture, after the default latency
+    GET /<fixture>.html?delay=250  ... after 250 ms instead
+    GET /status/503                an empty response with that status
+
+Any other query parameters are ignored, so ?n=1, ?n=2, ... give distinct URLs
+(cache misses) for the same page. Run it standalone to poke at it:
+
+    python -m benchmarks.stub_server --port 8900 --latency-ms 50
+"""
+import argparse
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures', 'html')
+
+
+def load_fixtures():
+    fixtures = {}
+    for name in sorted(os.listdir(FIXTURES_DIR)):
+        if name.endswith('.html'):
+            with open(os.path.join(FIXTURES_DIR, name), 'rb') as f:
+                fixtures[name] = f.read()
+    return fixtures
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive, like real sites; lets the client pool connections
+    fixtures = {}
+    latency_ms = 0
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        query = parse_qs(parts.query)
+        try:
+            delay_ms = float(query['delay'][0]) if 'delay' in query else self.latency_ms
+        except ValueError:
+            delay_ms = self.latency_ms
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000.0)
+
+        name = parts.path.lstrip('/')
+        if name.startswith('status/') and name[7:].isdigit():
+            self._respond(int(name[7:]), b'', 'text/plain')
+        elif name in self.fixtures:
+            self._respond(200, self.fixtures[name], 'text/html; charset=utf-8')
+        else:
+            self._respond(404, b'Not found', 'text/plain')
+
+    do_HEAD = do_GET
+
+    def _respond(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Keep benchmark output clean
+
+
+def make_server(host='127.0.0.1', port=0, latency_ms=0):
+    handler = type('ConfiguredStubHandler', (StubHandler,), {
+        'fixtures': load_fixtures(),
+        'latency_ms': latency_ms,
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+@contextmanager
+def running(latency_ms=0, host='127.0.0.1', port=0):
+    """Serve in a background thread; yields the base URL (e.g. http://127.0.0.1:54321)"""
+    server = make_server(host, port, latency_ms)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://{host}:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--latency-ms', type=float, default=0, help='Default delay before each response')
+    args = parser.parse_args(argv)
+
+    server = make_server(args.host, args.port, args.latency_ms)
+    print(f"Serving {len(server.RequestHandlerClass.fixtures)} fixtures on "
+          f"http://{args.host}:{server.server_address[1]}/ (latency {args.latency_ms} ms)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,104 @@
+"""normalized tags
+
+Revision ID: 07f9d32918bf
+Revises: e6be5e669eca
+Create Date: 2026-10-18 17:20:41.508316
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '07f9d32918bf'
+down_revision = 'e6be5e669eca'
+branch_labels = None
+depends_on = None
+
+
+def _normalize(name):
+    # Same rule as Tag.normalize
+    return ' '.join((name or '').split()).lower()[:50]
+
+
+def upgrade():
+    op.create_table('tags',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'name', name='uq_tags_user_id_name')
+    )
+    op.create_table('link_tags',
+    sa.Column('link_id', sa.Integer(), nullable=False),
+    sa.Column('tag_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['link_id'], ['links.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['tag_id'], ['tags.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('link_id', 'tag_id')
+    )
+    with op.batch_alter_table('link_tags', schema=None) as batch_op:
+        batch_op.create_index('ix_link_tags_tag_id_link_id', ['tag_id', 'link_id'], unique=False)
+
+    # Backfill from the comma-separated keywords, in id order and in chunks
+    bind = op.get_bind()
+    links = sa.table('links',
+                     sa.column('id', sa.Integer),
+                     sa.column('user_id', sa.Integer),
+                     sa.column('keywords', sa.Text))
+    tags = sa.table('tags',
+                    sa.column('id', sa.Integer),
+                    sa.column('user_id', sa.Integer),
+                    sa.column('name', sa.String),
+                    sa.column('created_at', sa.DateTime))
+    link_tags = sa.table('link_tags',
+                         sa.column('link_id', sa.Integer),
+                         sa.column('tag_id', sa.Integer))
+
+    now = datetime.utcnow()
+    tag_ids = {}  # (user_id, name) -> id
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(links.c.id, links.c.user_id, links.c.keywords)
+            .where(links.c.id > last_id, links.c.keywords.isnot(None))
+            .order_by(links.c.id)
+            .limit(1000)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        pairs = []
+        for link_id, user_id, keywords in rows:
+            names = []
+            for keyword in keywords.split(','):
+                name = _normalize(keyword)
+                if name and name not in names:
+                    names.append(name)
+            pairs.extend((link_id, user_id, name) for name in names)
+
+        new_tags = sorted({(user_id, name) for _, user_id, name in pairs} - tag_ids.keys())
+        if new_tags:
+            op.bulk_insert(tags, [{'user_id': user_id, 'name': name, 'created_at': now}
+                                  for user_id, name in new_tags])
+            for user_id in {user_id for user_id, _ in new_tags}:
+                for tag_id, name in bind.execute(
+                    sa.select(tags.c.id, tags.c.name).where(tags.c.user_id == user_id)
+                ):
+                    tag_ids[(user_id, name)] = tag_id
+
+        if pairs:
+            op.bulk_insert(link_tags, [{'link_id': link_id, 'tag_id': tag_ids[(user_id, name)]}
+                                       for link_id, user_id, name in pairs])
+
+
+def downgrade():
+    with op.batch_alter_table('link_tags', schema=None) as batch_op:
+        batch_op.drop_index('ix_link_tags_tag_id_link_id')
+
+    op.drop_table('link_tags')
+    op.drop_table('tags')
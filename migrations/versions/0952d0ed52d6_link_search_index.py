@@ -0,0 +1,42 @@
+"""link search index
+
+Revision ID: 0952d0ed52d6
+Revises: 2ced2684066b
+Create Date: 2026-10-18 09:40:05.531870
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0952d0ed52d6'
+down_revision = '2ced2684066b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'mysql':
+        op.create_index('ix_links_fulltext', 'links', ['title', 'description', 'url', 'keywords'],
+                        mysql_prefix='FULLTEXT')
+    elif dialect == 'sqlite':
+        op.execute(
+            "CREATE VIRTUAL TABLE links_fts USING fts5("
+            "user_id UNINDEXED, title, description, url, keywords, "
+            "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+        op.execute(
+            "INSERT INTO links_fts (rowid, user_id, title, description, url, keywords) "
+            "SELECT id, user_id, title, COALESCE(description, ''), url, COALESCE(keywords, '') "
+            "FROM links WHERE is_active = 1"
+        )
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'mysql':
+        op.drop_index('ix_links_fulltext', table_name='links')
+    elif dialect == 'sqlite':
+        op.execute("DROP TABLE links_fts")
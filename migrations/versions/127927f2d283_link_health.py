@@ -0,0 +1,41 @@
+"""link health columns
+
+Revision ID: 127927f2d283
+Revises: a74e165b81fa
+Create Date: 2026-10-18 21:12:40.418305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '127927f2d283'
+down_revision = 'a74e165b81fa'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('links', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('health_status', sa.String(length=20), nullable=True))
+        batch_op.add_column(sa.Column('health_code', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('health_final_url', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('health_error', sa.String(length=255), nullable=True))
+        batch_op.add_column(sa.Column('health_failures', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('health_checked_at', sa.DateTime(), nullable=True))
+        batch_op.create_index('ix_links_user_active_health',
+                              ['user_id', 'is_active', 'health_status', 'created_at', 'id'], unique=False)
+        batch_op.create_index('ix_links_health_due', ['is_active', 'health_checked_at', 'url_hash'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('links', schema=None) as batch_op:
+        batch_op.drop_index('ix_links_health_due')
+        batch_op.drop_index('ix_links_user_active_health')
+        batch_op.drop_column('health_checked_at')
+        batch_op.drop_column('health_failures')
+        batch_op.drop_column('health_error')
+        batch_op.drop_column('health_final_url')
+        batch_op.drop_column('health_code')
+        batch_op.drop_column('health_status')
@@ -0,0 +1,26 @@
+"""user link stats sync floor
+
+Revision ID: 18b4b3376c36
+Revises: 58a80db0be25
+Create Date: 2026-10-19 14:02:51.306127
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '18b4b3376c36'
+down_revision = '58a80db0be25'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user_link_stats', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('sync_floor', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('user_link_stats', schema=None) as batch_op:
+        batch_op.drop_column('sync_floor')
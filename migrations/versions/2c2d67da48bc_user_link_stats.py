@@ -0,0 +1,64 @@
+"""user link stats
+
+Revision ID: 2c2d67da48bc
+Revises: 0952d0ed52d6
+Create Date: 2026-10-18 11:02:37.114529
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2c2d67da48bc'
+down_revision = '0952d0ed52d6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('user_link_stats',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('total_links', sa.Integer(), nullable=False),
+    sa.Column('category_counts', sa.JSON(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+    # Backfill from the existing links
+    bind = op.get_bind()
+    users = sa.table('users', sa.column('id', sa.Integer))
+    links = sa.table('links',
+                     sa.column('user_id', sa.Integer),
+                     sa.column('category', sa.String),
+                     sa.column('is_active', sa.Boolean))
+    stats_table = sa.table('user_link_stats',
+                           sa.column('user_id', sa.Integer),
+                           sa.column('total_links', sa.Integer),
+                           sa.column('category_counts', sa.JSON),
+                           sa.column('updated_at', sa.DateTime))
+
+    counts = {row.id: {} for row in bind.execute(sa.select(users.c.id))}
+    rows = bind.execute(
+        sa.select(links.c.user_id, links.c.category, sa.func.count())
+        .where(links.c.is_active == sa.true())
+        .group_by(links.c.user_id, links.c.category)
+    )
+    for user_id, category, count in rows:
+        per_user = counts.setdefault(user_id, {})
+        per_user[category or ''] = per_user.get(category or '', 0) + count
+
+    now = datetime.utcnow()
+    if counts:
+        op.bulk_insert(stats_table, [
+            {'user_id': user_id, 'total_links': sum(per_user.values()),
+             'category_counts': per_user, 'updated_at': now}
+            for user_id, per_user in counts.items()
+        ])
+
+
+def downgrade():
+    op.drop_table('user_link_stats')
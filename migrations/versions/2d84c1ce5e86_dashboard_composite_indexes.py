@@ -0,0 +1,28 @@
+"""composite indexes for the dashboard queries
+
+Revision ID: 2d84c1ce5e86
+Revises: 69cf4686a199
+Create Date: 2026-10-18 18:02:55.731904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2d84c1ce5e86'
+down_revision = '69cf4686a199'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('links', schema=None) as batch_op:
+        batch_op.create_index('ix_links_user_active_created', ['user_id', 'is_active', 'created_at', 'id'], unique=False)
+        batch_op.create_index('ix_links_user_active_category', ['user_id', 'is_active', 'category', 'created_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('links', schema=None) as batch_op:
+        batch_op.drop_index('ix_links_user_active_category')
+        batch_op.drop_index('ix_links_user_active_created')
@@ -0,0 +1,26 @@
+"""user link stats version
+
+Revision ID: 58a80db0be25
+Revises: 6bf9af2f61d4
+Create Date: 2026-10-19 09:12:40.118734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '58a80db0be25'
+down_revision = '6bf9af2f61d4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user_link_stats', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.BigInteger(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('user_link_stats', schema=None) as batch_op:
+        batch_op.drop_column('version')
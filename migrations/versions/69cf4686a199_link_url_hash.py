@@ -0,0 +1,128 @@
+"""link url hash for duplicate detection
+
+Revision ID: 69cf4686a199
+Revises: 07f9d32918bf
+Create Date: 2026-10-18 17:41:12.220915
+
+"""
+import hashlib
+import re
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '69cf4686a199'
+down_revision = '07f9d32918bf'
+branch_labels = None
+depends_on = None
+
+# A frozen copy of pkg.urls.canonical_url_hash as of this revision, so later
+# changes to the app's canonicalization don't change what this migration does
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+SCHEME_RE = re.compile(r'^[a-z][a-z0-9+.-]*://', re.IGNORECASE)
+TRACKING_PARAMS = frozenset({
+    'fbclid', 'gclid', 'gclsrc', 'dclid', 'gbraid', 'wbraid', 'msclkid', 'yclid', 'twclid',
+    'igshid', 'mc_cid', 'mc_eid', '_hsenc', '_hsmi', 'mkt_tok', 'oly_anon_id', 'oly_enc_id',
+    'vero_id', 'wickedid', 'ref_src', 'ref_url', '_ga', '_gl',
+})
+TRACKING_PREFIXES = ('utm_', 'pk_', 'hsa_')
+
+
+def _normalize_url(url):
+    url = url.strip()
+    if not SCHEME_RE.match(url):
+        url = 'https:' + url if url.startswith('//') else 'https://' + url
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if ':' in host:
+        host = f"[{host}]"
+
+    netloc = host
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        netloc = f"{host}:{parts.port}"
+    if parts.username:
+        userinfo = parts.username
+        if parts.password:
+            userinfo += f":{parts.password}"
+        netloc = f"{userinfo}@{netloc}"
+
+    return urlunsplit((scheme, netloc, parts.path or '/', parts.query, ''))
+
+
+def _canonicalize_url(url):
+    parts = urlsplit(_normalize_url(url))
+
+    path = parts.path
+    if len(path) > 1 and path.endswith('/'):
+        path = path.rstrip('/') or '/'
+
+    params = [(name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+              if not (name.lower() in TRACKING_PARAMS or name.lower().startswith(TRACKING_PREFIXES))]
+    query = urlencode(sorted(params))
+
+    fragment = urlsplit(url.strip()).fragment
+    if not fragment.startswith(('!', '/')):
+        fragment = ''
+
+    return urlunsplit((parts.scheme, parts.netloc, path, query, fragment))
+
+
+def canonical_url_hash(url):
+    try:
+        canonical = _canonicalize_url(url)
+    except ValueError:
+        # Unparseable (bad port, broken IPv6 literal): only an identical URL matches it
+        canonical = url.strip()
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def upgrade():
+    with op.batch_alter_table('links', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('url_hash', sa.String(length=64), nullable=True))
+
+    # Backfill. Where a user already has the same page more than once only the
+    # keeper (active first, then oldest) gets the hash; `flask links dedupe`
+    # merges the rest.
+    bind = op.get_bind()
+    links = sa.table('links',
+                     sa.column('id', sa.Integer),
+                     sa.column('user_id', sa.Integer),
+                     sa.column('url', sa.Text),
+                     sa.column('is_active', sa.Boolean),
+                     sa.column('url_hash', sa.String))
+
+    rows = bind.execute(
+        sa.select(links.c.id, links.c.user_id, links.c.url, links.c.is_active)
+        .order_by(links.c.user_id, sa.desc(links.c.is_active), links.c.id)
+    )
+    seen = set()
+    updates = []
+    update = (
+        links.update()
+        .where(links.c.id == sa.bindparam('link_id'))
+        .values(url_hash=sa.bindparam('hash'))
+    )
+    for link_id, user_id, url, _ in rows.all():
+        key = (user_id, canonical_url_hash(url))
+        if key in seen:
+            continue
+        seen.add(key)
+        updates.append({'link_id': link_id, 'hash': key[1]})
+        if len(updates) >= 1000:
+            bind.execute(update, updates)
+            updates = []
+    if updates:
+        bind.execute(update, updates)
+
+    with op.batch_alter_table('links', schema=None) as batch_op:
+        batch_op.create_index('ix_links_user_id_url_hash', ['user_id', 'url_hash'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('links', schema=None) as batch_op:
+        batch_op.drop_index('ix_links_user_id_url_hash')
+        batch_op.drop_column('url_hash')
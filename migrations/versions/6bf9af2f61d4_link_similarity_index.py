@@ -0,0 +1,42 @@
+"""link similarity index
+
+Revision ID: 6bf9af2f61d4
+Revises: 9e25e4e5cf34
+Create Date: 2026-10-18 23:10:52.644183
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6bf9af2f61d4'
+down_revision = '9e25e4e5cf34'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('link_similarity_bands',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('band_key', sa.BigInteger(), nullable=False),
+    sa.Column('link_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['link_id'], ['links.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'band_key', 'link_id')
+    )
+    with op.batch_alter_table('link_similarity_bands', schema=None) as batch_op:
+        batch_op.create_index('ix_link_similarity_bands_link_id', ['link_id'], unique=False)
+
+    # Filled in by `flask links similarity-index`
+    with op.batch_alter_table('links', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('similarity_signature', sa.LargeBinary(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('links', schema=None) as batch_op:
+        batch_op.drop_column('similarity_signature')
+
+    with op.batch_alter_table('link_similarity_bands', schema=None) as batch_op:
+        batch_op.drop_index('ix_link_similarity_bands_link_id')
+
+    op.drop_table('link_similarity_bands')
@@ -0,0 +1,43 @@
+"""metadata cache
+
+Revision ID: 7b08557b16ba
+Revises: 2c2d67da48bc
+Create Date: 2026-10-18 12:26:51.802317
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b08557b16ba'
+down_revision = '2c2d67da48bc'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('metadata_cache',
+    sa.Column('url_hash', sa.String(length=64), nullable=False),
+    sa.Column('url', sa.Text(), nullable=False),
+    sa.Column('final_url', sa.Text(), nullable=True),
+    sa.Column('title', sa.Text(), nullable=True),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('image_url', sa.Text(), nullable=True),
+    sa.Column('etag', sa.String(length=255), nullable=True),
+    sa.Column('last_modified', sa.String(length=64), nullable=True),
+    sa.Column('status_code', sa.Integer(), nullable=False),
+    sa.Column('error', sa.String(length=255), nullable=True),
+    sa.Column('fetched_at', sa.DateTime(), nullable=True),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('url_hash')
+    )
+    with op.batch_alter_table('metadata_cache', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_metadata_cache_expires_at'), ['expires_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('metadata_cache', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_metadata_cache_expires_at'))
+
+    op.drop_table('metadata_cache')
@@ -0,0 +1,55 @@
+"""links archive
+
+Revision ID: 9e25e4e5cf34
+Revises: 127927f2d283
+Create Date: 2026-10-18 22:04:17.351920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e25e4e5cf34'
+down_revision = '127927f2d283'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('links_archive',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('link_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('title', sa.String(length=200), nullable=False),
+    sa.Column('url', sa.Text(), nullable=False),
+    sa.Column('url_hash', sa.String(length=64), nullable=True),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('category', sa.String(length=50), nullable=True),
+    sa.Column('keywords', sa.Text(), nullable=True),
+    sa.Column('image_url', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('links_archive', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_links_archive_link_id'), ['link_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_links_archive_archived_at'), ['archived_at'], unique=False)
+        batch_op.create_index('ix_links_archive_user_updated', ['user_id', 'updated_at'], unique=False)
+
+    with op.batch_alter_table('links', schema=None) as batch_op:
+        batch_op.create_index('ix_links_inactive_updated', ['is_active', 'updated_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('links', schema=None) as batch_op:
+        batch_op.drop_index('ix_links_inactive_updated')
+
+    with op.batch_alter_table('links_archive', schema=None) as batch_op:
+        batch_op.drop_index('ix_links_archive_user_updated')
+        batch_op.drop_index(batch_op.f('ix_links_archive_archived_at'))
+        batch_op.drop_index(batch_op.f('ix_links_archive_link_id'))
+
+    op.drop_table('links_archive')
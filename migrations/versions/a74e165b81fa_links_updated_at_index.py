@@ -0,0 +1,26 @@
+"""links (user_id, updated_at, id) index
+
+Revision ID: a74e165b81fa
+Revises: 2d84c1ce5e86
+Create Date: 2026-10-18 18:24:07.318442
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a74e165b81fa'
+down_revision = '2d84c1ce5e86'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('links', schema=None) as batch_op:
+        batch_op.create_index('ix_links_user_updated', ['user_id', 'updated_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('links', schema=None) as batch_op:
+        batch_op.drop_index('ix_links_user_updated')
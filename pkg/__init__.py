@@ -4,20 +4,50 @@ from flask_migrate import Migrate
 from flask_mail import Mail
 
 from pkg.models import db 
+from pkg.search import search_index
+from pkg.http_client import http_client
+from pkg.stats import link_stats
+from pkg.tags import tagging
+from pkg.metadata_cache import metadata_cache
+from pkg.jobs import job_queue
+from pkg.importer import importer
+from pkg.link_health import link_health
+from pkg.archive import archiver
+from pkg.similarity import similarity_index
+from pkg.user_cache import user_cache
+from pkg.hashing import password_hasher
+from pkg.instrumentation import instrumentation
+from pkg.assets import assets
 from pkg.routes import register_blueprints
 
 csrf = CSRFProtect()
 migrate = Migrate()
 mail = Mail()
 
-def create_app():
+def create_app(config=None):
     app = Flask(__name__, instance_relative_config=True, static_folder='static', template_folder='templates')
     app.config.from_pyfile("config.py")
+    if config:
+        app.config.update(config)  # Overrides for scripts, e.g. benchmarks pointing at a scratch database
 
     db.init_app(app)
     csrf.init_app(app)
     migrate.init_app(app, db)
     mail.init_app(app)
+    search_index.init_app(app)
+    link_stats.init_app(app)
+    tagging.init_app(app)
+    http_client.init_app(app)
+    metadata_cache.init_app(app)
+    job_queue.init_app(app)
+    importer.init_app(app)
+    link_health.init_app(app)
+    archiver.init_app(app)
+    similarity_index.init_app(app)
+    user_cache.init_app(app)
+    password_hasher.init_app(app)
+    instrumentation.init_app(app)
+    assets.init_app(app)
 
     register_blueprints(app)
 
@@ -0,0 +1,324 @@
+"""
+Archiving deleted links.
+
+Deleting a link only sets is_active = false, so without this the links table
+- and every index the dashboard walks - keeps growing with rows nobody sees.
+`flask links archive` moves links deleted more than LINK_ARCHIVE_AFTER_DAYS
+ago into links_archive and drops their tag and similarity rows. Run it from
+cron, or leave it running with --every:
+
+    15 3 * * *  flask links archive
+    flask links archive --every 60
+
+Rows move LINK_ARCHIVE_BATCH_SIZE at a time, one short transaction per batch
+(INSERT ... SELECT, then DELETE by id), with a LINK_ARCHIVE_PAUSE sleep in
+between so web requests writing to links are never kept waiting for long.
+A second archiver skips rows the first one has locked.
+
+Archived links keep their content, so `flask links restore` can bring them
+back as active links; pages the user has saved again since are skipped.
+Incremental exports still report archived links as deleted, and the sync
+feed sends a replica whose cursor predates an archived deletion back to a
+full resync (410). `flask links purge-archive` removes archived rows for
+good once they are older than LINK_ARCHIVE_PURGE_DAYS; it leaves each user a
+sync floor behind, and cursors at or before it get the same 410.
+"""
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from sqlalchemy import and_, literal, or_
+
+from pkg.models import db, Link, LinkArchive, User, UserLinkStats, link_similarity_bands, link_tags
+from pkg.duplicates import existing_hashes
+from pkg.exporter import parse_since
+from pkg.cli import links_cli
+from pkg.search import search_index
+from pkg.similarity import similarity_index
+from pkg.stats import raise_sync_floor, record_link_added
+from pkg.tags import attach_tags
+from pkg.urls import canonical_url_hash
+
+# Copied across as they are; health and fetch state is left behind and redone after a restore
+ARCHIVED_FIELDS = ('user_id', 'title', 'url', 'url_hash', 'description', 'category', 'keywords',
+                   'image_url', 'created_at', 'updated_at')
+
+
+def _archivable(cutoff, user_id=None):
+    # Walks ix_links_inactive_updated
+    query = db.session.query(Link.id).filter(Link.is_active.is_(False), Link.updated_at < cutoff)
+    if user_id is not None:
+        query = query.filter(Link.user_id == user_id)
+    return query
+
+
+def count_archivable(cutoff, user_id=None):
+    return _archivable(cutoff, user_id).count()
+
+
+def archive_batch(cutoff, batch_size, user_id=None):
+    """Move up to `batch_size` links deleted before `cutoff` into links_archive and commit"""
+    ids = [row.id for row in _archivable(cutoff, user_id).limit(batch_size).with_for_update(skip_locked=True)]
+    if not ids:
+        db.session.commit()
+        return 0
+
+    links = Link.__table__
+    # is_active is checked again: a link saved again since the SELECT stays where it is
+    moving = and_(links.c.id.in_(ids), links.c.is_active.is_(False))
+    db.session.execute(
+        LinkArchive.__table__.insert().from_select(
+            ('link_id',) + ARCHIVED_FIELDS + ('archived_at',),
+            db.select(links.c.id, *(links.c[field] for field in ARCHIVED_FIELDS), literal(datetime.utcnow()))
+            .where(moving),
+        )
+    )
+    # SQLite doesn't enforce ON DELETE CASCADE unless asked to
+    for dependent in (link_tags, link_similarity_bands):
+        db.session.execute(dependent.delete().where(dependent.c.link_id.in_(
+            db.select(links.c.id).where(moving)
+        )))
+    moved = db.session.execute(links.delete().where(moving)).rowcount
+    db.session.commit()
+    return moved
+
+
+def archive_deleted_links(older_than=None, batch_size=None, user_id=None, pause=None, limit=None, progress=None):
+    """
+    Archive links deleted more than `older_than` (a timedelta) ago, batch by
+    batch. `progress(total)` is called after each batch. Returns how many moved.
+    """
+    config = current_app.config
+    if older_than is None:
+        older_than = timedelta(days=config['LINK_ARCHIVE_AFTER_DAYS'])
+    batch_size = batch_size or config['LINK_ARCHIVE_BATCH_SIZE']
+    pause = config['LINK_ARCHIVE_PAUSE'] if pause is None else pause
+    cutoff = datetime.utcnow() - older_than
+
+    total = 0
+    while limit is None or total < limit:
+        size = batch_size if limit is None else min(batch_size, limit - total)
+        try:
+            moved = archive_batch(cutoff, size, user_id)
+        except Exception:
+            db.session.rollback()
+            raise
+        total += moved
+        if progress and moved:
+            progress(total)
+        if moved < size:
+            break
+        time.sleep(pause)  # Let other writers in between batches
+    return total
+
+
+def restore_links(user_id, link_ids=None, deleted_since=None, batch_size=None):
+    """
+    Bring a user's archived links back as active links, optionally only
+    `link_ids` (their original ids) or those deleted at or after
+    `deleted_since`. Links the user has saved again since stay archived.
+    Returns (restored, skipped).
+    """
+    batch_size = batch_size or current_app.config['LINK_ARCHIVE_BATCH_SIZE']
+    query = LinkArchive.query.filter(LinkArchive.user_id == user_id)
+    if link_ids is not None:
+        query = query.filter(LinkArchive.link_id.in_(list(link_ids)))
+    if deleted_since is not None:
+        query = query.filter(LinkArchive.updated_at >= deleted_since)
+
+    restored = skipped = 0
+    seen = set()  # url_hash values restored by this run; older archived copies of the same page stay put
+    last_id = None
+    try:
+        while True:
+            # Most recently archived first, so the latest copy of a page wins
+            page = query if last_id is None else query.filter(LinkArchive.id < last_id)
+            rows = page.order_by(LinkArchive.id.desc()).limit(batch_size).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            rows.sort(key=lambda row: row.updated_at or datetime.min, reverse=True)
+
+            hashes = {row.id: row.url_hash or canonical_url_hash(row.url) for row in rows}
+            known = existing_hashes(user_id, hashes.values())
+            taken = {found.id for found in db.session.query(Link.id).filter(
+                Link.id.in_([row.link_id for row in rows]))}
+
+            now = datetime.utcnow()
+            links = []
+            for row in rows:
+                url_hash = hashes[row.id]
+                if url_hash in known or url_hash in seen:
+                    skipped += 1
+                    continue
+                seen.add(url_hash)
+                link = Link(**{field: getattr(row, field) for field in ARCHIVED_FIELDS})
+                if row.link_id not in taken:
+                    link.id = row.link_id  # Keeps bookmarks and replica entries pointing at it
+                    taken.add(row.link_id)
+                link.url_hash = url_hash
+                link.updated_at = now
+                link.is_active = True
+                links.append(link)
+                db.session.delete(row)
+            if not links:
+                continue
+
+            db.session.add_all(links)
+            db.session.flush()
+            attach_tags(user_id, [(link.id, link.keywords) for link in links if link.keywords])
+            similarity_index.index_links(links)
+            per_category = {}
+            for link in links:
+                per_category[link.category] = per_category.get(link.category, 0) + 1
+            for category, count in per_category.items():
+                record_link_added(user_id, category, count)
+            db.session.commit()
+            restored += len(links)
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        if restored:
+            search_index.reindex_user(user_id)
+            db.session.commit()
+    return restored, skipped
+
+
+def purge_archive(older_than, batch_size=None):
+    """
+    Permanently delete archived links archived more than `older_than` ago;
+    returns how many. Each user's sync floor is raised past the deletions
+    purged, so replicas whose cursor predates them resync from scratch.
+    """
+    batch_size = batch_size or current_app.config['LINK_ARCHIVE_BATCH_SIZE']
+    cutoff = datetime.utcnow() - older_than
+    table = LinkArchive.__table__
+    # Undated deletions sort before every dated one; any stand-in date keeps them behind the floor
+    deleted_at = db.func.coalesce(LinkArchive.updated_at, LinkArchive.created_at, LinkArchive.archived_at)
+    total = 0
+    while True:
+        ids = [row.id for row in db.session.query(LinkArchive.id)
+               .filter(LinkArchive.archived_at < cutoff).limit(batch_size)]
+        if ids:
+            floors = (
+                db.session.query(LinkArchive.user_id, db.func.max(deleted_at))
+                .filter(LinkArchive.id.in_(ids))
+                .group_by(LinkArchive.user_id)
+                .order_by(LinkArchive.user_id)  # Same lock order in every writer
+                .all()
+            )
+            for user_id, floor in floors:
+                raise_sync_floor(user_id, floor)
+            total += db.session.execute(table.delete().where(table.c.id.in_(ids))).rowcount
+        db.session.commit()
+        if len(ids) < batch_size:
+            return total
+
+
+def archived_since(user_id, updated_at, link_id):
+    """
+    Whether a link deleted after the sync cursor (updated_at, link_id) has
+    been archived, or may have been and purged since (cursor at or before the
+    user's sync floor)
+    """
+    floor = db.session.query(UserLinkStats.sync_floor).filter(UserLinkStats.user_id == user_id).scalar()
+    if floor is not None and (updated_at is None or updated_at <= floor):
+        return True
+    if updated_at is None:
+        after = or_(LinkArchive.updated_at.isnot(None),
+                    and_(LinkArchive.updated_at.is_(None), LinkArchive.link_id > link_id))
+    else:
+        after = or_(LinkArchive.updated_at > updated_at,
+                    and_(LinkArchive.updated_at == updated_at, LinkArchive.link_id > link_id))
+    return db.session.query(
+        LinkArchive.query.filter(LinkArchive.user_id == user_id, after).exists()
+    ).scalar()
+
+
+class Archiver:
+    """Flask extension holding the archiver configuration"""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('LINK_ARCHIVE_AFTER_DAYS', 30)  # Deleted links are archived after this long
+        app.config.setdefault('LINK_ARCHIVE_BATCH_SIZE', 500)  # Rows moved per transaction
+        app.config.setdefault('LINK_ARCHIVE_PAUSE', 0.1)  # Seconds between batches
+        app.config.setdefault('LINK_ARCHIVE_PURGE_DAYS', None)  # Archived links are kept for good unless set
+        app.extensions['archiver'] = self
+
+
+archiver = Archiver()
+
+
+@links_cli.command("archive")
+@click.option("--older-than-days", type=float, default=None,
+              help="Archive links deleted more than this many days ago (default LINK_ARCHIVE_AFTER_DAYS).")
+@click.option("--user-id", type=int, default=None, help="Only this user's links.")
+@click.option("--batch-size", type=int, default=None, help="Rows per transaction (default LINK_ARCHIVE_BATCH_SIZE).")
+@click.option("--limit", type=int, default=None, help="Archive at most this many links per run.")
+@click.option("--dry-run", is_flag=True, help="Count the links that would be archived.")
+@click.option("--every", type=float, default=None, help="Keep running, starting a new run every this many minutes.")
+def archive_command(older_than_days, user_id, batch_size, limit, dry_run, every):
+    """Move long-deleted links out of the links table."""
+    older_than = timedelta(days=older_than_days) if older_than_days is not None else None
+    if dry_run:
+        days = older_than_days if older_than_days is not None else current_app.config['LINK_ARCHIVE_AFTER_DAYS']
+        count = count_archivable(datetime.utcnow() - timedelta(days=days), user_id)
+        click.echo(f"{count} deleted link(s) would be archived.")
+        return
+
+    def report(total):
+        click.echo(f"  {total} archived...")
+
+    while True:
+        started = time.perf_counter()
+        try:
+            total = archive_deleted_links(older_than, batch_size, user_id, limit=limit, progress=report)
+        except KeyboardInterrupt:
+            click.echo("Stopped; batches already moved stay archived.")
+            return
+        elapsed = time.perf_counter() - started
+        click.echo(f"Archived {total} deleted link(s) in {elapsed:.1f}s.")
+        if every is None:
+            return
+        try:
+            time.sleep(max(every * 60 - elapsed, 0))
+        except KeyboardInterrupt:
+            return
+
+
+@links_cli.command("restore")
+@click.option("--user-id", type=int, required=True, help="Owner of the archived links.")
+@click.option("--link-id", "link_ids", type=int, multiple=True, help="Original link id; repeat for several.")
+@click.option("--deleted-since", default=None, help="Only links deleted at or after this time (ISO 8601).")
+def restore_command(user_id, link_ids, deleted_since):
+    """Bring archived links back (all of the user's, unless narrowed down)."""
+    if db.session.get(User, user_id) is None:
+        raise click.ClickException(f"No user with id {user_id}.")
+    try:
+        since = parse_since(deleted_since) if deleted_since else None
+    except ValueError:
+        raise click.BadParameter("Use ISO 8601 or Unix seconds.", param_hint="--deleted-since")
+
+    restored, skipped = restore_links(user_id, link_ids or None, since)
+    click.echo(f"Restored {restored} link(s); {skipped} skipped because the user has saved them again.")
+
+
+@links_cli.command("purge-archive")
+@click.option("--older-than-days", type=float, default=None,
+              help="Delete links archived more than this many days ago (default LINK_ARCHIVE_PURGE_DAYS).")
+@click.option("--yes", is_flag=True, help="Don't ask for confirmation.")
+def purge_archive_command(older_than_days, yes):
+    """Permanently delete old archived links."""
+    days = older_than_days if older_than_days is not None else current_app.config['LINK_ARCHIVE_PURGE_DAYS']
+    if days is None:
+        raise click.UsageError("Pass --older-than-days or set LINK_ARCHIVE_PURGE_DAYS.")
+    if not yes:
+        click.confirm(f"Permanently delete links archived more than {days:g} days ago?", abort=True)
+    purged = purge_archive(timedelta(days=days))
+    click.echo(f"Purged {purged} archived link(s).")
@@ -0,0 +1,366 @@
+"""
+Static asset pipeline.
+
+`flask assets build` minifies every CSS and JS file under static/ and writes
+content-hashed copies to static/dist/ (css/main/index.css ->
+dist/css/main/index.3f9a1c0b2e.css), each with precompressed .gz and .br
+siblings, and records the mapping in static/dist/manifest.json.
+
+Templates link assets through asset_url('css/main/index.css'), which resolves
+the hashed name from the manifest and falls back to the plain file when no
+build has been run (e.g. in development). Hashed files are served with the
+best precompressed variant the browser accepts and
+`Cache-Control: public, max-age=31536000, immutable`: their name changes
+whenever their content does, so browsers never need to revalidate them.
+
+The minifiers are deliberately conservative: comments and redundant
+whitespace go, line breaks in JS stay (no reliance on semicolon insertion),
+and strings, template literals and regex literals are copied verbatim.
+Brotli output needs the optional `brotli` package; without it only gzip
+variants are written.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+
+import click
+from flask import current_app, request, send_from_directory, url_for
+from flask.cli import AppGroup
+
+try:
+    import brotli
+except ImportError:  # Optional: gzip variants are still written
+    brotli = None
+
+assets_cli = AppGroup("assets", help="Build and clean minified, hashed static assets.")
+
+MANIFEST_NAME = 'manifest.json'
+ASSET_EXTENSIONS = ('.css', '.js')
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Encoding -> file suffix, in order of preference
+PRECOMPRESSED = (('br', '.br'), ('gzip', '.gz'))
+
+
+# Minification
+
+def minify_css(source):
+    """Drop comments and collapse whitespace, leaving strings untouched"""
+    out = []
+    i, length = 0, len(source)
+    while i < length:
+        char = source[i]
+        if char in '"\'':
+            end = _string_end(source, i, char)
+            out.append(source[i:end])
+            i = end
+        elif source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            i = length if end == -1 else end + 2
+            out.append(' ')
+        elif char.isspace():
+            while i < length and source[i].isspace():
+                i += 1
+            out.append(' ')
+        else:
+            out.append(char)
+            i += 1
+
+    # Outside strings only spaces remain (doubled where a comment met whitespace); drop those next to punctuation
+    text = ''.join(out)
+    parts = re.split(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')', text)
+    for index in range(0, len(parts), 2):  # Even parts are outside strings
+        part = re.sub(r' ?([{};,]) ?', r'\1', re.sub(r'  +', ' ', parts[index]))
+        part = re.sub(r': ', ':', part)
+        parts[index] = part.replace(';}', '}')
+    return ''.join(parts).strip()
+
+
+JS_PUNCTUATION = set('{}()[];,:=<>!?&|*%^~')
+JS_JOIN_AFTER = set('{([,;=&|?:')  # A line ending in one of these always continues
+JS_JOIN_BEFORE = set('})],.')  # A line starting with one of these continues the previous
+JS_WORD = re.compile(r'[A-Za-z0-9_$\u0080-\uffff]+')
+REGEX_AFTER_WORDS = {'return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'new', 'delete',
+                     'void', 'throw', 'instanceof', 'yield', 'await'}
+
+
+def minify_js(source):
+    """
+    Drop comments, indentation, blank lines and spaces around punctuation.
+    Line breaks between statements are kept.
+    """
+    out = []  # Minified output so far
+    stack = []  # Open template literal expressions: brace depth inside each ${ }
+    i, length = 0, len(source)
+    pending_space = pending_newline = False
+
+    def last_significant():
+        for chunk in reversed(out):
+            stripped = chunk.rstrip()
+            if stripped:
+                return stripped
+        return ''
+
+    def emit(text):
+        nonlocal pending_space, pending_newline
+        previous = last_significant()
+        prev_char = previous[-1:] if previous else ''
+        if pending_newline and prev_char and prev_char not in JS_JOIN_AFTER and text[0] not in JS_JOIN_BEFORE:
+            out.append('\n')
+        elif (pending_space or pending_newline) and prev_char \
+                and prev_char not in JS_PUNCTUATION and text[0] not in JS_PUNCTUATION:
+            out.append(' ')
+        pending_space = pending_newline = False
+        out.append(text)
+
+    while i < length:
+        char = source[i]
+        if char == '\n':
+            pending_newline = True
+            i += 1
+        elif char.isspace():
+            pending_space = True
+            i += 1
+        elif source.startswith('//', i):
+            end = source.find('\n', i)
+            i = length if end == -1 else end
+        elif source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            if '\n' in source[i:end]:
+                pending_newline = True
+            else:
+                pending_space = True
+            i = length if end == -1 else end + 2
+        elif char in '"\'':
+            end = _string_end(source, i, char)
+            emit(source[i:end])
+            i = end
+        elif char == '`' or (char == '}' and stack and stack[-1] == 0):
+            # Template literal text, up to the closing backtick or the next ${
+            if char == '}':
+                stack.pop()
+            j = i + 1
+            while j < length:
+                if source[j] == '\\':
+                    j += 2
+                elif source[j] == '`':
+                    j += 1
+                    break
+                elif source.startswith('${', j):
+                    j += 2
+                    stack.append(0)
+                    break
+                else:
+                    j += 1
+            emit(source[i:j])
+            i = j
+        elif char == '/' and _regex_allowed(last_significant()):
+            end = _regex_end(source, i)
+            emit(source[i:end])
+            i = end
+        else:
+            if stack and char == '{':
+                stack[-1] += 1
+            elif stack and char == '}':
+                stack[-1] -= 1
+            match = JS_WORD.match(source, i)
+            token = match.group(0) if match else char
+            emit(token)
+            i += len(token)
+    return ''.join(out).strip() + '\n'
+
+
+def _string_end(source, start, quote):
+    i = start + 1
+    while i < len(source):
+        if source[i] == '\\':
+            i += 2
+        elif source[i] == quote or source[i] == '\n':
+            return i + 1
+        else:
+            i += 1
+    return len(source)
+
+
+def _regex_allowed(previous):
+    """Whether a / after `previous` (the output so far) starts a regex rather than a division"""
+    if not previous:
+        return True
+    if previous[-1] in '(,=:[!&|?{};+-*%<>~^':
+        return True
+    word = re.search(r'[A-Za-z_$][\w$]*$', previous)
+    return bool(word) and word.group(0) in REGEX_AFTER_WORDS
+
+
+def _regex_end(source, start):
+    i, in_class = start + 1, False
+    while i < len(source) and source[i] != '\n':
+        char = source[i]
+        if char == '\\':
+            i += 2
+            continue
+        if char == '[':
+            in_class = True
+        elif char == ']':
+            in_class = False
+        elif char == '/' and not in_class:
+            i += 1
+            while i < len(source) and (source[i].isalnum() or source[i] in '_$'):
+                i += 1  # Flags
+            return i
+        i += 1
+    return i
+
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+
+# Build
+
+def hashed_name(path, content):
+    root, extension = os.path.splitext(path)
+    return f"{root}.{hashlib.sha256(content).hexdigest()[:10]}{extension}"
+
+
+def build_assets(static_folder, output_dir, minify=True, echo=None):
+    """Build every asset under `static_folder`; returns the new manifest"""
+    output_root = os.path.join(static_folder, output_dir)
+    manifest = {}
+    for directory, subdirectories, files in os.walk(static_folder):
+        if os.path.abspath(directory) == os.path.abspath(output_root):
+            subdirectories[:] = []
+            continue
+        subdirectories[:] = [name for name in subdirectories
+                             if os.path.abspath(os.path.join(directory, name)) != os.path.abspath(output_root)]
+        for name in sorted(files):
+            extension = os.path.splitext(name)[1]
+            if extension not in ASSET_EXTENSIONS:
+                continue
+            source_path = os.path.join(directory, name)
+            relative = os.path.relpath(source_path, static_folder).replace(os.sep, '/')
+            with open(source_path, encoding='utf-8') as f:
+                source = f.read()
+            content = (MINIFIERS[extension](source) if minify else source).encode('utf-8')
+
+            target = f"{output_dir}/{hashed_name(relative, content)}"
+            target_path = os.path.join(static_folder, *target.split('/'))
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+            _write(target_path, content)
+            _write(target_path + '.gz', gzip.compress(content, compresslevel=9, mtime=0))
+            if brotli is not None:
+                _write(target_path + '.br', brotli.compress(content, quality=11))
+            manifest[relative] = target
+            if echo:
+                echo(f"{relative} -> {target} ({len(source.encode('utf-8'))} -> {len(content)} bytes)")
+
+    _write(os.path.join(output_root, MANIFEST_NAME),
+           (json.dumps(manifest, indent=2, sort_keys=True) + '\n').encode('utf-8'))
+    return manifest
+
+
+def _write(path, data):
+    # Write then rename, so a running server never serves a half-written file
+    temporary = f"{path}.tmp"
+    with open(temporary, 'wb') as f:
+        f.write(data)
+    os.replace(temporary, path)
+
+
+# Extension
+
+class Assets:
+    """Flask extension resolving hashed asset names and serving precompressed files"""
+
+    def __init__(self, app=None):
+        self._manifests = {}  # app -> (manifest mtime, manifest, hashed names)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ASSETS_OUTPUT_DIR', 'dist')  # Under the static folder
+        app.config.setdefault('ASSETS_MINIFY', True)
+        app.extensions['assets'] = self
+        app.add_template_global(self.asset_url, 'asset_url')
+        app.cli.add_command(assets_cli)
+        # Hashed files get the immutable treatment; everything else is served as before
+        app.view_functions['static'] = self.static_view
+
+    def _manifest_path(self, app):
+        return os.path.join(app.static_folder, app.config['ASSETS_OUTPUT_DIR'], MANIFEST_NAME)
+
+    def manifest(self, app=None):
+        """The current build's {source path: hashed path}; re-read only after a new build"""
+        app = app or current_app._get_current_object()
+        path = self._manifest_path(app)
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return {}
+        cached = self._manifests.get(app)
+        if cached is None or cached[0] != mtime:
+            with open(path, encoding='utf-8') as f:
+                manifest = json.load(f)
+            cached = self._manifests[app] = (mtime, manifest, frozenset(manifest.values()))
+        return cached[1]
+
+    def asset_url(self, filename, **values):
+        """url_for('static', filename=...) for the built, hashed copy when there is one"""
+        return url_for('static', filename=self.manifest().get(filename, filename), **values)
+
+    def static_view(self, filename):
+        app = current_app._get_current_object()
+        self.manifest(app)
+        cached = self._manifests.get(app)
+        if cached is None or filename not in cached[2]:
+            return app.send_static_file(filename)
+
+        directory, name = os.path.split(os.path.join(app.static_folder, *filename.split('/')))
+        for encoding, suffix in PRECOMPRESSED:
+            if request.accept_encodings[encoding] and os.path.exists(os.path.join(directory, name + suffix)):
+                response = send_from_directory(directory, name + suffix, max_age=31536000,
+                                               mimetype=mimetypes.guess_type(name)[0])
+                response.headers['Content-Encoding'] = encoding
+                break
+        else:
+            response = send_from_directory(directory, name, max_age=31536000)
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        response.vary.add('Accept-Encoding')
+        return response
+
+
+assets = Assets()
+
+
+@assets_cli.command("build")
+@click.option("--no-minify", is_flag=True, help="Hash and compress without minifying.")
+def build_command(no_minify):
+    """Minify, hash and precompress the CSS and JS assets."""
+    app = current_app._get_current_object()
+    manifest = build_assets(app.static_folder, app.config['ASSETS_OUTPUT_DIR'],
+                            minify=app.config['ASSETS_MINIFY'] and not no_minify, echo=click.echo)
+    if brotli is None:
+        click.echo("brotli is not installed; wrote gzip variants only.")
+    click.echo(f"Built {len(manifest)} asset(s).")
+
+
+@assets_cli.command("clean")
+def clean_command():
+    """Delete built files that the current manifest no longer uses."""
+    app = current_app._get_current_object()
+    output_root = os.path.join(app.static_folder, app.config['ASSETS_OUTPUT_DIR'])
+    keep = set()
+    for target in assets.manifest(app).values():
+        path = os.path.join(app.static_folder, *target.split('/'))
+        keep.update({path, path + '.gz', path + '.br'})
+    keep.add(os.path.join(output_root, MANIFEST_NAME))
+
+    removed = 0
+    for directory, _, files in os.walk(output_root):
+        for name in files:
+            path = os.path.join(directory, name)
+            if path not in keep:
+                os.remove(path)
+                removed += 1
+    click.echo(f"Removed {removed} stale file(s).")
@@ -0,0 +1,9 @@
+"""
+The `flask links` command group.
+
+It lives on its own so the modules adding commands to it (import, check,
+archive, similarity) don't have to import one another to get at it.
+"""
+from flask.cli import AppGroup
+
+links_cli = AppGroup("links", help="Bulk link operations.")
@@ -0,0 +1,125 @@
+"""
+Duplicate link detection and merging.
+
+Every link carries `url_hash`, the sha256 of its canonical URL (see
+pkg.urls.canonicalize_url), under a unique index on (user_id, url_hash). So
+"is this page already saved?" is one indexed lookup, and the database refuses
+a second copy even under concurrent requests.
+
+Deleted links keep their hash, so saving the same page again brings the old
+row back. Duplicates merged away by `flask links dedupe` are deactivated and
+have their hash cleared.
+"""
+from datetime import datetime
+
+from pkg.models import db, Link
+from pkg.search import search_index
+from pkg.similarity import similarity_index
+from pkg.stats import record_category_changed, record_link_removed
+from pkg.urls import canonical_url_hash
+
+
+def find_duplicate(user_id, url, exclude_id=None):
+    """The user's link (active or deleted) with the same canonical URL, if any"""
+    query = Link.query.filter_by(user_id=user_id, url_hash=canonical_url_hash(url))
+    if exclude_id is not None:
+        query = query.filter(Link.id != exclude_id)
+    return query.first()
+
+
+def existing_links(user_id, hashes):
+    """{url_hash: link} for the user's links (active or deleted) with any of `hashes`"""
+    found = {}
+    hashes = list(hashes)
+    for start in range(0, len(hashes), 500):
+        for link in Link.query.filter(Link.user_id == user_id, Link.url_hash.in_(hashes[start:start + 500])):
+            found[link.url_hash] = link
+    return found
+
+
+def existing_hashes(user_id, hashes):
+    """Which of `hashes` the user already has, using the (user_id, url_hash) index"""
+    found = set()
+    hashes = list(hashes)
+    for start in range(0, len(hashes), 500):
+        rows = db.session.query(Link.url_hash).filter(
+            Link.user_id == user_id, Link.url_hash.in_(hashes[start:start + 500])
+        )
+        found.update(row.url_hash for row in rows)
+    return found
+
+
+def _merge_into(keeper, duplicates):
+    """Fold duplicate links into `keeper`, then deactivate them (does not commit)"""
+    old_category = keeper.category
+    keywords = keeper.get_keywords_list()
+    for duplicate in duplicates:
+        for keyword in duplicate.get_keywords_list():
+            if keyword.lower() not in {existing.lower() for existing in keywords}:
+                keywords.append(keyword)
+        keeper.description = keeper.description or duplicate.description
+        keeper.category = keeper.category or duplicate.category
+        keeper.image_url = keeper.image_url or duplicate.image_url
+        if duplicate.created_at and (keeper.created_at is None or duplicate.created_at < keeper.created_at):
+            keeper.created_at = duplicate.created_at
+
+        duplicate.is_active = False
+        search_index.remove_link(duplicate)
+        similarity_index.remove_link(duplicate)
+        record_link_removed(duplicate.user_id, duplicate.category)
+
+    keeper.set_keywords_list(keywords)
+    record_category_changed(keeper.user_id, old_category, keeper.category)
+    search_index.index_link(keeper)
+    similarity_index.index_link(keeper)
+
+
+def merge_user_duplicates(user_id, dry_run=False):
+    """
+    Group a user's links by canonical URL, merge each group's active copies
+    into one keeper (active first, then oldest) and refresh every url_hash.
+    Returns (groups with duplicates, links merged away). Does not commit.
+    """
+    rows = (
+        db.session.query(Link.id, Link.url, Link.url_hash, Link.is_active, Link.created_at)
+        .filter(Link.user_id == user_id)
+        .all()
+    )
+    groups = {}
+    for row in rows:
+        groups.setdefault(canonical_url_hash(row.url), []).append(row)
+
+    hash_changes = {}  # link id -> new url_hash (None for non-keepers)
+    merges = []  # (keeper id, [active duplicate ids])
+    for new_hash, members in groups.items():
+        members.sort(key=lambda row: (not row.is_active, row.created_at or datetime.max, row.id))
+        keeper, others = members[0], members[1:]
+        if keeper.url_hash != new_hash:
+            hash_changes[keeper.id] = new_hash
+        for other in others:
+            if other.url_hash is not None:
+                hash_changes[other.id] = None
+        active = [other.id for other in others if other.is_active]
+        if active:
+            merges.append((keeper.id, active))
+
+    merged = sum(len(ids) for _, ids in merges)
+    if dry_run:
+        return len(merges), merged
+
+    # Clear every changing hash first so reassigning can't trip the unique index
+    changed_ids = list(hash_changes)
+    for start in range(0, len(changed_ids), 500):
+        Link.query.filter(Link.id.in_(changed_ids[start:start + 500])).update(
+            {'url_hash': None}, synchronize_session=False
+        )
+    new_hashes = [{'id': link_id, 'url_hash': value} for link_id, value in hash_changes.items() if value]
+    if new_hashes:
+        db.session.execute(db.update(Link), new_hashes)
+
+    for keeper_id, duplicate_ids in merges:
+        keeper = db.session.get(Link, keeper_id, populate_existing=True)
+        duplicates = Link.query.filter(Link.id.in_(duplicate_ids)).populate_existing().all()
+        _merge_into(keeper, duplicates)
+
+    return len(merges), merged
@@ -0,0 +1,178 @@
+"""
+Streaming link export (CSV, JSON lines, Netscape bookmark HTML).
+
+Rows are read with a server-side cursor (yield_per) as plain column tuples,
+formatted and flushed in ~64 KiB pieces, optionally through an incremental
+gzip compressor - so memory stays flat however many links a user has.
+
+With `since`, only links changed at or after that time are exported,
+including deleted ones (is_active = false) so incremental backups can apply
+deletions - those already moved to links_archive too (see pkg.archive).
+The files use the column names pkg.importer accepts, so an export can be
+imported again.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import datetime, timezone
+from html import escape
+
+from pkg.models import db, Link, LinkArchive
+
+FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'jsonl': ('application/x-ndjson; charset=utf-8', 'jsonl'),
+    'html': ('text/html; charset=utf-8', 'html'),
+}
+FIELDS = ('url', 'title', 'description', 'category', 'keywords', 'created_at', 'updated_at', 'is_active')
+YIELD_PER = 1000
+FLUSH_BYTES = 64 * 1024
+
+COLUMNS = (Link.url, Link.title, Link.description, Link.category, Link.keywords,
+           Link.created_at, Link.updated_at, Link.is_active)
+ARCHIVE_COLUMNS = (LinkArchive.url, LinkArchive.title, LinkArchive.description, LinkArchive.category,
+                   LinkArchive.keywords, LinkArchive.created_at, LinkArchive.updated_at, db.false())
+
+
+def parse_since(value):
+    """Accept ISO 8601 or Unix seconds; returns a naive UTC datetime or raises ValueError"""
+    value = (value or '').strip()
+    try:
+        return datetime.utcfromtimestamp(float(value))
+    except (ValueError, OverflowError, OSError):
+        pass
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def iter_link_rows(user_id, since=None, order_by_category=False):
+    """Yield one dict per link from a server-side cursor, never holding more than a batch"""
+    stmt = db.select(*COLUMNS).where(Link.user_id == user_id)
+    if since is not None:
+        stmt = stmt.where(Link.updated_at >= since)
+    else:
+        stmt = stmt.where(Link.is_active.is_(True))
+    if order_by_category:
+        stmt = stmt.order_by(Link.category, Link.id)
+    else:
+        stmt = stmt.order_by(Link.id)
+
+    result = db.session.execute(stmt.execution_options(yield_per=YIELD_PER))
+    for row in result:
+        yield dict(zip(FIELDS, row))
+
+    if since is not None:
+        # Archived links were all deleted; walks ix_links_archive_user_updated
+        stmt = (
+            db.select(*ARCHIVE_COLUMNS)
+            .where(LinkArchive.user_id == user_id, LinkArchive.updated_at >= since)
+            .order_by(LinkArchive.updated_at, LinkArchive.id)
+        )
+        for row in db.session.execute(stmt.execution_options(yield_per=YIELD_PER)):
+            yield dict(zip(FIELDS, row))
+
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+
+def _keywords(value):
+    return [keyword.strip() for keyword in (value or '').split(',') if keyword.strip()]
+
+
+# Formatters: each turns row dicts into text pieces
+
+def format_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(FIELDS)
+    for row in rows:
+        writer.writerow([
+            row['url'], row['title'], row['description'] or '', row['category'] or '',
+            ', '.join(_keywords(row['keywords'])), _isoformat(row['created_at']) or '',
+            _isoformat(row['updated_at']) or '', 'true' if row['is_active'] else 'false',
+        ])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def format_jsonl(rows):
+    for row in rows:
+        row['keywords'] = _keywords(row['keywords'])
+        row['created_at'] = _isoformat(row['created_at'])
+        row['updated_at'] = _isoformat(row['updated_at'])
+        row['is_active'] = bool(row['is_active'])
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+def _timestamp(value):
+    return str(int(value.replace(tzinfo=timezone.utc).timestamp())) if value else ''
+
+
+def format_html(rows):
+    """Netscape bookmark file, one folder per category (rows arrive grouped)"""
+    yield ('<!DOCTYPE NETSCAPE-Bookmark-file-1>\n'
+           '<META HTTP-EQUIV="Content-Type" CONTENT="text/html; charset=UTF-8">\n'
+           '<TITLE>Bookmarks</TITLE>\n<H1>Bookmarks</H1>\n<DL><p>\n')
+    open_folder = None
+    for row in rows:
+        category = row['category'] or None
+        if category != open_folder:
+            if open_folder is not None:
+                yield '    </DL><p>\n'
+            if category is not None:
+                yield f'    <DT><H3>{escape(category)}</H3>\n    <DL><p>\n'
+            open_folder = category
+        indent = '        ' if category is not None else '    '
+        tags = ','.join(_keywords(row['keywords']))
+        tags_attribute = f' TAGS="{escape(tags)}"' if tags else ''
+        yield (f'{indent}<DT><A HREF="{escape(row["url"])}" ADD_DATE="{_timestamp(row["created_at"])}" '
+               f'LAST_MODIFIED="{_timestamp(row["updated_at"])}"{tags_attribute}>{escape(row["title"])}</A>\n')
+        if row['description']:
+            yield f'{indent}<DD>{escape(row["description"])}\n'
+    if open_folder is not None:
+        yield '    </DL><p>\n'
+    yield '</DL><p>\n'
+
+
+FORMATTERS = {
+    'csv': format_csv,
+    'jsonl': format_jsonl,
+    'html': format_html,
+}
+
+
+def _buffered(pieces, flush_bytes=FLUSH_BYTES):
+    """Join small text pieces into ~flush_bytes chunks of UTF-8"""
+    parts, size = [], 0
+    for piece in pieces:
+        if not piece:
+            continue
+        parts.append(piece)
+        size += len(piece)
+        if size >= flush_bytes:
+            yield ''.join(parts).encode('utf-8')
+            parts, size = [], 0
+    if parts:
+        yield ''.join(parts).encode('utf-8')
+
+
+def _gzipped(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip container
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_links(user_id, fmt, since=None, gzip=False):
+    """Generator of response body bytes for an export"""
+    rows = iter_link_rows(user_id, since=since, order_by_category=(fmt == 'html'))
+    chunks = _buffered(FORMATTERS[fmt](rows))
+    return _gzipped(chunks) if gzip else chunks
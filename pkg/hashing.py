@@ -0,0 +1,72 @@
+"""
+Password hashing with a configurable method and cost.
+
+PASSWORD_HASH_METHOD takes any Werkzeug method string, e.g.
+"scrypt:32768:8:1" (n, r, p) or "pbkdf2:sha256:600000" (iterations); use
+benchmarks/hashing.py to pick one that suits the hardware. Stored hashes
+carry their own parameters, so changing the setting never locks anyone out:
+verify() reports hashes made with other parameters and the login route
+rehashes them with the current ones.
+"""
+import threading
+
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+DEFAULT_METHOD = 'scrypt:32768:8:1'  # Werkzeug 3's own default
+
+
+class PasswordHasher:
+    """Flask extension wrapping werkzeug.security with app-configured parameters"""
+
+    def __init__(self, app=None):
+        self._dummy_hashes = {}  # method -> hash of a throwaway password
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PASSWORD_HASH_METHOD', DEFAULT_METHOD)
+        app.config.setdefault('PASSWORD_SALT_LENGTH', 16)
+        app.extensions['password_hasher'] = self
+
+    @property
+    def method(self):
+        return current_app.config['PASSWORD_HASH_METHOD']
+
+    def hash(self, password, method=None):
+        return generate_password_hash(
+            password,
+            method=method or self.method,
+            salt_length=current_app.config['PASSWORD_SALT_LENGTH'],
+        )
+
+    def needs_rehash(self, stored_hash):
+        """True if `stored_hash` was made with other parameters than the configured ones"""
+        return stored_hash.split('$', 1)[0] != self._full_method(self.method)
+
+    def verify(self, stored_hash, password):
+        """
+        (matches, needs_rehash), from exactly one hash computation. With no
+        stored hash (unknown account) a dummy hash is checked instead, so the
+        response takes as long as for a real account.
+        """
+        if not stored_hash:
+            check_password_hash(self._dummy_hash(self.method), password)
+            return False, False
+        if not check_password_hash(stored_hash, password):
+            return False, False
+        return True, self.needs_rehash(stored_hash)
+
+    def _dummy_hash(self, method):
+        with self._lock:
+            if method not in self._dummy_hashes:
+                self._dummy_hashes[method] = self.hash('not-a-real-password', method)
+            return self._dummy_hashes[method]
+
+    def _full_method(self, method):
+        """The method string Werkzeug writes into hashes, e.g. pbkdf2 -> pbkdf2:sha256:600000"""
+        return self._dummy_hash(method).split('$', 1)[0]
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,311 @@
+"""
+Shared outbound HTTP client.
+
+Every outbound request (metadata fetching, the job worker, link checks) goes
+through one `requests.Session` created in `create_app`, so connections are
+kept alive and reused instead of paying a fresh TCP + TLS handshake per call.
+On top of the session the client adds:
+
+- keep-alive pools sized from config (HTTP_POOL_CONNECTIONS / HTTP_POOL_MAXSIZE)
+- a cap on concurrent requests per host (HTTP_PER_HOST_LIMIT)
+- a TTL cache for DNS lookups (HTTP_DNS_CACHE_TTL, 0 disables it), used by
+  this client's own connection classes only
+- a response size limit (HTTP_MAX_RESPONSE_BYTES)
+- retries with capped exponential backoff for idempotent methods
+  (HTTP_RETRIES), outside web requests only: a request handler gets one
+  attempt, and a retry-worthy failure is left for the job queue to retry
+- counters for requests, errors, bytes, latency and connection reuse
+"""
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import requests
+from flask import has_request_context
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+from urllib3.util import connection as urllib3_connection
+from urllib3.util.retry import Retry
+
+DEFAULT_USER_AGENT = (
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
+    'Chrome/91.0.4472.124 Safari/537.36 LinkSaverClient/1.0'
+)
+
+
+class ResponseTooLarge(requests.exceptions.RequestException):
+    """The response body exceeded the configured size limit"""
+
+
+class HostBusy(requests.exceptions.ConnectTimeout):
+    """Timed out waiting for a free per-host request slot"""
+
+
+class DNSCache:
+    """TTL cache in front of socket.getaddrinfo"""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def resolve(self, host, port, family=0):
+        key = (host, port, family)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self.hits += 1
+                return entry[1]
+        addresses = socket.getaddrinfo(host, port, family, socket.SOCK_STREAM)
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = (now + self.ttl, addresses)
+        return addresses
+
+    def forget(self, host, port, family=0):
+        with self._lock:
+            self._entries.pop((host, port, family), None)
+
+
+class _ClientConnectionMixin:
+    """
+    Opens sockets for an HttpClient: counts them and resolves through its
+    DNS cache. TLS still uses self.host, so SNI and certificate checks see
+    the hostname rather than the cached address.
+    """
+
+    client = None  # Set on the per-client subclasses made by ClientAdapter
+
+    def _new_conn(self):
+        self.client._count('new_connections')
+        dns_cache = self.client.dns_cache
+        host = self._dns_host.strip('[]')
+        try:
+            addresses = dns_cache.resolve(host, self.port) if dns_cache is not None else None
+        except socket.gaierror:
+            addresses = None
+        if not addresses:
+            return super()._new_conn()
+
+        error = None
+        for family, _, _, _, sockaddr in addresses:
+            try:
+                return urllib3_connection.create_connection(
+                    (sockaddr[0], self.port),
+                    self.timeout,
+                    source_address=self.source_address,
+                    socket_options=self.socket_options,
+                )
+            except socket.timeout as e:
+                error = ConnectTimeoutError(self, f"Connection to {self.host} timed out. "
+                                                  f"(connect timeout={self.timeout})")
+                error.__cause__ = e
+            except OSError as e:
+                error = NewConnectionError(self, f"Failed to establish a new connection: {e}")
+                error.__cause__ = e
+        # Every cached address failed; resolve afresh next time
+        dns_cache.forget(host, self.port)
+        raise error
+
+
+class ClientAdapter(HTTPAdapter):
+    """HTTPAdapter whose pools open their connections through `client`"""
+
+    def __init__(self, client, **kwargs):
+        self.client = client
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': self._bind(HTTPConnectionPool, HTTPConnection),
+            'https': self._bind(HTTPSConnectionPool, HTTPSConnection),
+        }
+
+    def _bind(self, pool_class, connection_class):
+        connection = type(connection_class.__name__, (_ClientConnectionMixin, connection_class),
+                          {'client': self.client})
+        return type(pool_class.__name__, (pool_class,), {'ConnectionCls': connection})
+
+
+class HttpClient:
+    """Flask extension owning the pooled outbound session"""
+
+    COUNTERS = ('requests', 'errors', 'bytes_received', 'new_connections', 'host_waits')
+
+    def __init__(self, app=None):
+        self.session = None
+        self.interactive_session = None
+        self.dns_cache = None
+        self.observers = []  # Callables(method, host, status, elapsed_s, bytes) run after every request
+        self._host_slots = {}
+        self._host_lock = threading.Lock()
+        self._counters = dict.fromkeys(self.COUNTERS, 0)
+        self._latency_total = 0.0
+        self._counter_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('HTTP_POOL_CONNECTIONS', 50)  # Distinct hosts with a kept-alive pool
+        app.config.setdefault('HTTP_POOL_MAXSIZE', 10)  # Kept-alive connections per host
+        app.config.setdefault('HTTP_PER_HOST_LIMIT', 4)  # Concurrent requests per host
+        app.config.setdefault('HTTP_TIMEOUT', 10)  # Seconds
+        app.config.setdefault('HTTP_MAX_RESPONSE_BYTES', 5 * 1024 * 1024)
+        app.config.setdefault('HTTP_RETRIES', 2)  # Outside web requests; handlers never retry
+        app.config.setdefault('HTTP_BACKOFF', 0.3)  # Seconds; doubles on each retry
+        app.config.setdefault('HTTP_BACKOFF_MAX', 2)  # Seconds; longest single sleep between retries
+        app.config.setdefault('HTTP_DNS_CACHE_TTL', 300)  # Seconds; 0 disables the DNS cache
+        app.config.setdefault('HTTP_USER_AGENT', DEFAULT_USER_AGENT)
+
+        self.config = {key: app.config[key] for key in app.config if key.startswith('HTTP_')}
+        self.session = self._build_session(self._retries())
+        self.interactive_session = self._build_session(0)
+        if self.config['HTTP_DNS_CACHE_TTL']:
+            self.dns_cache = DNSCache(self.config['HTTP_DNS_CACHE_TTL'])
+        app.extensions['http_client'] = self
+
+    def _retries(self):
+        # Retry-After is ignored: a server asking for a minute would hold a
+        # worker for a minute. Sleeps stay short and the job is retried later.
+        return Retry(
+            total=self.config['HTTP_RETRIES'],
+            backoff_factor=self.config['HTTP_BACKOFF'],
+            backoff_max=min(self.config['HTTP_BACKOFF_MAX'], self.config['HTTP_TIMEOUT']),
+            status_forcelist=(429, 502, 503, 504),
+            allowed_methods=frozenset({'GET', 'HEAD', 'OPTIONS'}),  # Idempotent only
+            raise_on_status=False,
+            respect_retry_after_header=False,
+        )
+
+    def _build_session(self, retries):
+        adapter = ClientAdapter(
+            self,
+            pool_connections=self.config['HTTP_POOL_CONNECTIONS'],
+            pool_maxsize=self.config['HTTP_POOL_MAXSIZE'],
+            max_retries=retries,
+        )
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers['User-Agent'] = self.config['HTTP_USER_AGENT']
+        return session
+
+    # Counters
+
+    def _count(self, name, amount=1):
+        with self._counter_lock:
+            self._counters[name] += amount
+
+    def _record(self, method, host, status, elapsed, received):
+        with self._counter_lock:
+            self._counters['requests'] += 1
+            self._counters['bytes_received'] += received
+            self._latency_total += elapsed
+            if status is None or status >= 500:
+                self._counters['errors'] += 1
+        for observer in self.observers:
+            observer(method, host, status, elapsed, received)
+
+    def stats(self):
+        """Counters for this process, plus derived averages"""
+        with self._counter_lock:
+            counters = dict(self._counters)
+            latency_total = self._latency_total
+        requests_made = counters['requests']
+        counters['avg_latency_ms'] = round(latency_total / requests_made * 1000, 2) if requests_made else 0.0
+        # Share of requests served over an already-open connection
+        counters['connection_reuse_ratio'] = (
+            round(max(requests_made - counters['new_connections'], 0) / requests_made, 4) if requests_made else 0.0
+        )
+        if self.dns_cache is not None:
+            counters['dns_cache_hits'] = self.dns_cache.hits
+            counters['dns_cache_misses'] = self.dns_cache.misses
+        return counters
+
+    # Per-host slots
+
+    def _slot(self, host):
+        with self._host_lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = self._host_slots[host] = threading.BoundedSemaphore(self.config['HTTP_PER_HOST_LIMIT'])
+            return slot
+
+    @contextmanager
+    def _host_slot(self, host, timeout):
+        slot = self._slot(host)
+        if not slot.acquire(blocking=False):
+            self._count('host_waits')
+            if not slot.acquire(timeout=timeout):
+                raise HostBusy(f"Too many concurrent requests to {host}")
+        try:
+            yield
+        finally:
+            slot.release()
+
+    # Requests
+
+    @contextmanager
+    def stream(self, method, url, retry=None, **kwargs):
+        """
+        Open a streamed request; the body is read by the caller inside the
+        `with` block, which also holds the per-host slot. Failures are
+        retried unless `retry` is false, which by default it is inside a
+        web request.
+        """
+        if retry is None:
+            retry = not has_request_context()
+        session = self.session if retry else self.interactive_session
+        host = (urlsplit(url).hostname or '').lower()
+        timeout = kwargs.setdefault('timeout', self.config['HTTP_TIMEOUT'])
+        kwargs['stream'] = True
+        started = time.perf_counter()
+        status = None
+        response = None
+        # Wait for a host slot no longer than we would wait to connect
+        slot_timeout = timeout[0] if isinstance(timeout, tuple) else timeout
+        with self._host_slot(host, slot_timeout):
+            try:
+                response = session.request(method, url, **kwargs)
+                status = response.status_code
+                with response:
+                    yield response
+            finally:
+                received = 0
+                if response is not None and response.raw is not None:
+                    received = response.raw.tell()
+                self._record(method, host, status, time.perf_counter() - started, received)
+
+    def request(self, method, url, max_bytes=None, **kwargs):
+        """Make a request and read the body, refusing bodies over `max_bytes`"""
+        max_bytes = max_bytes or self.config['HTTP_MAX_RESPONSE_BYTES']
+        with self.stream(method, url, **kwargs) as response:
+            declared = response.headers.get('Content-Length')
+            if declared and declared.isdigit() and int(declared) > max_bytes:
+                raise ResponseTooLarge(f"Response from {url} is {declared} bytes (limit {max_bytes})")
+            body = bytearray()
+            for chunk in response.iter_content(64 * 1024):
+                body.extend(chunk)
+                if len(body) > max_bytes:
+                    raise ResponseTooLarge(f"Response from {url} exceeded {max_bytes} bytes")
+            response._content = bytes(body)
+            return response
+
+    def get(self, url, **kwargs):
+        kwargs.setdefault('allow_redirects', True)
+        return self.request('GET', url, **kwargs)
+
+    def head(self, url, **kwargs):
+        kwargs.setdefault('allow_redirects', True)
+        return self.request('HEAD', url, **kwargs)
+
+
+http_client = HttpClient()
@@ -0,0 +1,489 @@
+"""
+Bulk bookmark import.
+
+Accepts Netscape bookmark HTML (what every browser exports), CSV and JSON
+lines. Files are parsed incrementally from a text stream - nothing holds the
+whole file or all of its rows in memory - and rows are written with one
+executemany INSERT per batch (IMPORT_BATCH_SIZE), committing after each.
+Folders become the link category and tags become keywords. Pages the user
+already has (same canonical URL, see pkg.duplicates) are skipped; pages they
+had deleted are brought back with the imported details, as adding them again
+by hand would.
+
+Stats, tags and the search index are written with each batch; a queued job
+fills in the similar-links index. Imported links are left unfetched;
+`flask jobs enqueue-enrichment` picks them up for preview images.
+"""
+import csv
+import io
+import json
+from datetime import datetime, timezone
+from html.parser import HTMLParser
+
+import click
+from flask import current_app
+
+from pkg.models import db, Link, User
+from pkg.cli import links_cli
+from pkg.jobs import enqueue
+from pkg.link_health import reset_health
+from pkg.metadata import MetadataError, prepare_url
+from pkg.search import search_index
+from pkg.stats import record_link_added
+from pkg.similarity import similarity_index
+from pkg.tags import attach_tags, split_keywords
+from pkg.duplicates import existing_links, merge_user_duplicates
+from pkg.urls import canonical_url_hash
+
+FORMATS = ('html', 'csv', 'jsonl')
+READ_CHUNK_SIZE = 64 * 1024
+MAX_REPORTED_ERRORS = 100
+
+# Accepted column/key names, first match wins
+FIELD_ALIASES = {
+    'url': ('url', 'href', 'link', 'address'),
+    'title': ('title', 'name'),
+    'description': ('description', 'note', 'notes', 'excerpt', 'comment'),
+    'category': ('category', 'folder', 'collection'),
+    'keywords': ('keywords', 'tags', 'tag'),
+    'created_at': ('created_at', 'created', 'add_date', 'time_added', 'date'),
+}
+
+
+class ImportRowError(ValueError):
+    """A single row could not be imported; the rest of the file continues"""
+
+
+class ImportResult:
+    """Running totals for one import, reported as progress and at the end"""
+
+    def __init__(self):
+        self.imported = 0
+        self.restored = 0  # Deleted links brought back; also counted in `imported`
+        self.duplicates = 0
+        self.failed = 0
+        self.errors = []  # [{'line': n, 'error': message}], capped at MAX_REPORTED_ERRORS
+
+    def add_error(self, line, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'error': message})
+
+    def to_dict(self):
+        return {'imported': self.imported, 'restored': self.restored, 'duplicates': self.duplicates,
+                'failed': self.failed, 'errors': self.errors}
+
+
+# Parsing
+
+def detect_format(filename, sample=''):
+    """Guess the format from the file name, falling back to the first bytes"""
+    name = (filename or '').lower()
+    if name.endswith(('.html', '.htm')):
+        return 'html'
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith(('.jsonl', '.ndjson', '.json')):
+        return 'jsonl'
+    sample = sample.lstrip()
+    if sample.startswith('<') or 'NETSCAPE-Bookmark-file' in sample[:200]:
+        return 'html'
+    if sample.startswith('{'):
+        return 'jsonl'
+    return 'csv'
+
+
+def _pick(record, field):
+    """Value for `field` from a dict keyed by any of its aliases (case-insensitive)"""
+    lowered = {str(key).strip().lower(): value for key, value in record.items() if key is not None}
+    for alias in FIELD_ALIASES[field]:
+        value = lowered.get(alias)
+        if value not in (None, ''):
+            return value
+    return None
+
+
+def _split_tags(value):
+    if not value:
+        return []
+    if isinstance(value, (list, tuple)):
+        return [str(tag).strip() for tag in value if str(tag).strip()]
+    separator = ',' if ',' in value else ('|' if '|' in value else ';' if ';' in value else ' ')
+    return [tag.strip() for tag in value.split(separator) if tag.strip()]
+
+
+def _parse_timestamp(value):
+    """Unix seconds (browser exports) or ISO 8601; anything else is ignored"""
+    if value in (None, ''):
+        return None
+    try:
+        return datetime.utcfromtimestamp(int(float(value)))
+    except (TypeError, ValueError, OverflowError, OSError):
+        pass
+    try:
+        parsed = datetime.fromisoformat(str(value).strip().replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _record_from_mapping(record):
+    """Normalise a CSV/JSON row to the import record shape"""
+    if not isinstance(record, dict):
+        raise ImportRowError('Row is not an object.')
+    category = _pick(record, 'category')
+    if isinstance(category, (list, tuple)):
+        category = category[-1] if category else None
+    return {
+        'url': _pick(record, 'url'),
+        'title': _pick(record, 'title'),
+        'description': _pick(record, 'description'),
+        'category': category,
+        'keywords': _split_tags(_pick(record, 'keywords')),
+        'created_at': _parse_timestamp(_pick(record, 'created_at')),
+    }
+
+
+class NetscapeBookmarkParser(HTMLParser):
+    """
+    Event-driven parser for Netscape bookmark files. Records are queued as
+    they complete, so the caller can drain them after every fed chunk.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.records = []  # (line, record) ready to be consumed
+        self._folders = []  # One entry per open <DL>; None for unnamed/toolbar folders
+        self._next_folder = None  # Name from the last <H3>, applied by the following <DL>
+        self._folder_title = None  # Text buffer while inside <H3>
+        self._toolbar = False
+        self._current = None  # (line, record) whose <A> text / <DD> is being read
+        self._in_anchor = False
+        self._in_description = False
+
+    def _flush_current(self):
+        if self._current is not None:
+            line, record = self._current
+            record['title'] = ''.join(record['title']).strip()
+            record['description'] = ''.join(record['description']).strip() or None
+            self.records.append((line, record))
+            self._current = None
+        self._in_description = False
+
+    def handle_starttag(self, tag, attrs):
+        attrs = {key.lower(): value for key, value in attrs}
+        if tag == 'h3':
+            self._flush_current()
+            self._folder_title = []
+            # Browser toolbar roots aren't meaningful categories
+            self._toolbar = 'personal_toolbar_folder' in attrs
+        elif tag == 'dl':
+            self._flush_current()
+            self._folders.append(self._next_folder)
+            self._next_folder = None
+        elif tag == 'a':
+            self._flush_current()
+            category = next((name for name in reversed(self._folders) if name), None)
+            self._current = (self.getpos()[0], {
+                'url': attrs.get('href'),
+                'title': [],
+                'description': [],
+                'category': category,
+                'keywords': _split_tags(attrs.get('tags')),
+                'created_at': _parse_timestamp(attrs.get('add_date')),
+            })
+            self._in_anchor = True
+        elif tag == 'dd':
+            self._in_description = self._current is not None
+        elif tag in ('dt', 'hr'):
+            self._flush_current()
+
+    def handle_endtag(self, tag):
+        if tag == 'h3' and self._folder_title is not None:
+            name = ''.join(self._folder_title).strip()
+            self._next_folder = None if self._toolbar else (name or None)
+            self._folder_title = None
+        elif tag == 'a':
+            self._in_anchor = False
+        elif tag == 'dl':
+            self._flush_current()
+            if self._folders:
+                self._folders.pop()
+
+    def handle_data(self, data):
+        if self._folder_title is not None:
+            self._folder_title.append(data)
+        elif self._in_anchor and self._current is not None:
+            self._current[1]['title'].append(data)
+        elif self._in_description and self._current is not None:
+            self._current[1]['description'].append(data)
+
+    def close(self):
+        super().close()
+        self._flush_current()
+
+
+def parse_netscape_html(stream):
+    parser = NetscapeBookmarkParser()
+    while True:
+        chunk = stream.read(READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        parser.feed(chunk)
+        yield from parser.records
+        parser.records.clear()
+    parser.close()
+    yield from parser.records
+
+
+def parse_csv(stream):
+    reader = csv.DictReader(stream)
+    for record in reader:
+        try:
+            yield reader.line_num, _record_from_mapping(record)
+        except ImportRowError as e:
+            yield reader.line_num, e
+
+
+def parse_jsonl(stream):
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield line_number, _record_from_mapping(json.loads(line))
+        except ValueError as e:  # Includes JSONDecodeError and ImportRowError
+            yield line_number, ImportRowError(f'Invalid JSON: {e}' if not isinstance(e, ImportRowError) else str(e))
+
+
+PARSERS = {
+    'html': parse_netscape_html,
+    'csv': parse_csv,
+    'jsonl': parse_jsonl,
+}
+
+
+def iter_records(stream, fmt):
+    """Yield (line, record) - or (line, ImportRowError) - from a text stream"""
+    if fmt not in PARSERS:
+        raise ValueError(f"Unsupported import format {fmt!r}")
+    return PARSERS[fmt](stream)
+
+
+def text_stream(binary_stream):
+    """Decode an uploaded/opened binary file lazily, tolerating a BOM and bad bytes"""
+    return io.TextIOWrapper(binary_stream, encoding='utf-8-sig', errors='replace', newline='')
+
+
+# Writing
+
+def _row_values(user_id, record, now):
+    """Validate a parsed record and turn it into an INSERT parameter set"""
+    try:
+        url = prepare_url(record.get('url'))
+    except MetadataError as e:
+        raise ImportRowError(e.message)
+
+    title = (record.get('title') or '').strip() or url
+    description = (record.get('description') or '').strip() or None
+    category = (record.get('category') or '').strip() or None
+    keywords = [str(keyword).strip() for keyword in record.get('keywords') or [] if str(keyword).strip()]
+    created_at = record.get('created_at') or now
+
+    return {
+        'user_id': user_id,
+        'title': title[:200],
+        'url': url,
+        'url_hash': canonical_url_hash(url),
+        'description': description,
+        'category': category[:50] if category else None,
+        'keywords': ', '.join(keywords) or None,
+        'created_at': created_at,
+        'updated_at': now,
+        'is_active': True,
+    }
+
+
+def _restore(link, row):
+    """Bring a deleted link back with an imported row's details, as add_link does"""
+    link.title = row['title']
+    link.url = row['url']
+    link.description = row['description']
+    link.category = row['category']
+    link.set_keywords_list(split_keywords(row['keywords']))
+    link.updated_at = row['updated_at']
+    link.is_active = True
+    reset_health(link)
+
+
+def _write_batch(user_id, rows):
+    """
+    Write one batch and commit: an executemany INSERT for pages new to the
+    user, the imported details for pages they had deleted, and the matching
+    stats, tag and search rows. Pages still saved are dropped.
+    Returns (written, restored); written includes the restored links.
+    """
+    existing = existing_links(user_id, [row['url_hash'] for row in rows])
+    restored = [link for link in existing.values() if not link.is_active]
+    new_rows = [row for row in rows if row['url_hash'] not in existing]
+    if not new_rows and not restored:
+        return 0, 0
+
+    by_hash = {row['url_hash']: row for row in rows}
+    for link in restored:
+        _restore(link, by_hash[link.url_hash])
+    db.session.flush()
+
+    inserted = []
+    if new_rows:
+        db.session.execute(db.insert(Link), new_rows)
+        # executemany gives no ids back on every backend; read the new rows back by their hashes
+        hashes = [row['url_hash'] for row in new_rows]
+        for start in range(0, len(hashes), 500):
+            inserted.extend(
+                db.session.query(Link.id, Link.user_id, Link.title, Link.description, Link.url, Link.keywords,
+                                 Link.is_active)
+                .filter(Link.user_id == user_id, Link.url_hash.in_(hashes[start:start + 500]))
+            )
+        attach_tags(user_id, [(row.id, row.keywords) for row in inserted if row.keywords])
+
+    search_index.index_links(inserted + restored)
+    similarity_index.index_links(restored)  # New rows are left to the queued index_similarity job
+    per_category = {}
+    for category in [row['category'] for row in new_rows] + [link.category for link in restored]:
+        per_category[category] = per_category.get(category, 0) + 1
+    for category, count in per_category.items():
+        record_link_added(user_id, category, count)
+    db.session.commit()
+    return len(new_rows) + len(restored), len(restored)
+
+
+def import_links(user_id, records, batch_size=None, progress=None):
+    """
+    Import parsed records for `user_id`, committing every `batch_size` rows.
+    `progress(result)` is called after each batch. Returns an ImportResult.
+    """
+    batch_size = batch_size or current_app.config['IMPORT_BATCH_SIZE']
+    result = ImportResult()
+    now = datetime.utcnow()
+    batch = []
+    seen = set()  # url_hash values already taken by this import
+
+    def flush(batch):
+        written, restored = _write_batch(user_id, batch)
+        result.imported += written
+        result.restored += restored
+        result.duplicates += len(batch) - written
+        if progress:
+            progress(result)
+
+    try:
+        for line, record in records:
+            if isinstance(record, Exception):
+                result.add_error(line, str(record))
+                continue
+            try:
+                row = _row_values(user_id, record, now)
+            except ImportRowError as e:
+                result.add_error(line, str(e))
+                continue
+            if row['url_hash'] in seen:
+                result.duplicates += 1
+                continue
+            seen.add(row['url_hash'])
+            batch.append(row)
+
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+
+        if batch:
+            flush(batch)
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        if result.imported:
+            # Batches committed before any failure stay imported (and searchable); this
+            # only queues their similarity signatures, in a transaction of its own
+            enqueue('index_similarity', {}, user_id=user_id)
+            db.session.commit()
+
+    return result
+
+
+def import_file(user_id, binary_stream, fmt=None, filename=None, progress=None):
+    """Import an open (seekable) binary file, detecting the format unless given"""
+    if fmt is None:
+        sample = binary_stream.read(512).decode('utf-8', errors='replace')
+        binary_stream.seek(0)
+        fmt = detect_format(filename, sample.lstrip('\ufeff'))
+    return import_links(user_id, iter_records(text_stream(binary_stream), fmt), progress=progress)
+
+
+class Importer:
+    """Flask extension registering the import configuration and CLI"""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('IMPORT_BATCH_SIZE', 1000)  # Rows per executemany + commit
+        app.extensions['importer'] = self
+        app.cli.add_command(links_cli)
+
+
+importer = Importer()
+
+
+@links_cli.command("import")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--user-id", type=int, required=True, help="Owner of the imported links.")
+@click.option("--format", "fmt", type=click.Choice(FORMATS), default=None,
+              help="File format (default: detected from the file).")
+def import_command(path, user_id, fmt):
+    """Import bookmarks from a Netscape HTML, CSV or JSON lines file."""
+    if db.session.get(User, user_id) is None:
+        raise click.ClickException(f"No user with id {user_id}.")
+
+    def report(result):
+        click.echo(f"  {result.imported} imported, {result.duplicates} duplicate(s), {result.failed} failed...")
+
+    with open(path, 'rb') as f:
+        result = import_file(user_id, f, fmt=fmt, filename=path, progress=report)
+
+    for error in result.errors:
+        click.echo(f"  line {error['line']}: {error['error']}", err=True)
+    if result.failed > len(result.errors):
+        click.echo(f"  ...and {result.failed - len(result.errors)} more error(s)", err=True)
+    click.echo(f"Imported {result.imported} link(s) ({result.restored} previously deleted), "
+               f"skipped {result.duplicates} duplicate(s), {result.failed} failed. "
+               f"Run `flask jobs enqueue-enrichment --user-id {user_id}` to fetch previews.")
+
+
+@links_cli.command("dedupe")
+@click.option("--user-id", type=int, default=None, help="Only this user's links.")
+@click.option("--dry-run", is_flag=True, help="Report duplicates without merging them.")
+def dedupe_command(user_id, dry_run):
+    """Find links saved more than once (same canonical URL) and merge them."""
+    if user_id is not None:
+        user_ids = [user_id]
+    else:
+        user_ids = [row.id for row in db.session.query(User.id).all()]
+
+    total_groups = total_merged = 0
+    for uid in user_ids:
+        groups, merged = merge_user_duplicates(uid, dry_run=dry_run)
+        if dry_run:
+            db.session.rollback()
+        else:
+            db.session.commit()  # One transaction per user
+        if merged:
+            click.echo(f"  user {uid}: {merged} duplicate(s) in {groups} group(s)")
+        total_groups += groups
+        total_merged += merged
+    verb = "Found" if dry_run else "Merged"
+    click.echo(f"{verb} {total_merged} duplicate link(s) in {total_groups} group(s) across {len(user_ids)} user(s).")
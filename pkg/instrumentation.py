@@ -0,0 +1,274 @@
+"""
+Per-request performance instrumentation.
+
+For every request this records how many SQL queries ran and how long they
+took (SQLAlchemy engine events), the time spent rendering templates (Flask's
+template signals) and in outbound HTTP calls (an http_client observer). The
+totals go out as a Server-Timing header, so the browser's network panel shows
+where a slow page spent its time. Requests slower than SLOW_REQUEST_MS are
+logged along with their slowest queries.
+
+The same measurements feed Prometheus histograms served at /metrics, next to
+the metadata cache and HTTP client counters. Metrics live in process memory:
+with several worker processes, each one reports its own and Prometheus sums
+them across scrape targets. /metrics is off unless configured: set
+METRICS_TOKEN to serve it behind "Authorization: Bearer <token>", or
+METRICS_PUBLIC = True to serve it to anyone (e.g. only reachable internally).
+"""
+import hmac
+import re
+import threading
+import time
+from bisect import bisect_left
+
+from flask import current_app, g, has_request_context, request, template_rendered, before_render_template
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Seconds; roughly doubling from 1 ms to 10 s
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+SLOW_QUERIES_LOGGED = 5
+INF_LABEL = 'le="+Inf"'
+
+
+class Histogram:
+    """Thread-safe Prometheus-style histogram with optional labels"""
+
+    def __init__(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def expose(self):
+        """Lines in the Prometheus text exposition format"""
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        for label_values, values in sorted(series.items()):
+            labels = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, label_values))
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{_join(labels, f"le={_le(bound)}")}}} {cumulative}')
+            lines.append(f"{self.name}_bucket{{{_join(labels, INF_LABEL)}}} {values[-1]}")
+            suffix = f"{{{labels}}}" if labels else ''
+            lines.append(f"{self.name}_sum{suffix} {values[-2]:.6f}")
+            lines.append(f"{self.name}_count{suffix} {values[-1]}")
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _le(bound):
+    return f'"{bound:g}"'
+
+
+def _join(labels, extra):
+    return f"{labels},{extra}" if labels else extra
+
+
+def _metric_name(key):
+    return re.sub(r'[^a-zA-Z0-9_]', '_', key)
+
+
+class RequestTimings:
+    """What one request spent its time on; lives on g"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_time = 0.0
+        self.slow_queries = []  # (seconds, statement)
+        self.template_time = 0.0
+        self.http_calls = 0
+        self.http_time = 0.0
+        self._render_starts = []
+
+
+def current_timings():
+    if not has_request_context():
+        return None
+    return g.get('_timings')
+
+
+class Instrumentation:
+    """Flask extension wiring the SQL, template and HTTP timers into each request"""
+
+    def __init__(self, app=None):
+        self.request_duration = Histogram(
+            'linksaver_request_duration_seconds', 'Time to handle a request.', ('endpoint', 'method', 'status'))
+        self.request_queries = Histogram(
+            'linksaver_request_queries', 'SQL queries run per request.', ('endpoint',), QUERY_COUNT_BUCKETS)
+        self.query_duration = Histogram('linksaver_sql_query_duration_seconds', 'Time per SQL query.')
+        self.template_duration = Histogram(
+            'linksaver_template_render_seconds', 'Time to render a template.', ('template',))
+        self.http_duration = Histogram(
+            'linksaver_outbound_http_duration_seconds', 'Time per outbound HTTP request.', ('method', 'status'))
+        self.histograms = (self.request_duration, self.request_queries, self.query_duration,
+                           self.template_duration, self.http_duration)
+        self._engine_hooked = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('INSTRUMENTATION_ENABLED', True)
+        app.config.setdefault('SERVER_TIMING_HEADER', True)
+        app.config.setdefault('SLOW_REQUEST_MS', 500)  # Requests slower than this are logged
+        app.config.setdefault('SLOW_QUERY_MS', 50)  # Queries slower than this are listed in that log
+        app.config.setdefault('METRICS_TOKEN', None)  # Serves /metrics, behind this bearer token
+        app.config.setdefault('METRICS_PUBLIC', False)  # Serves /metrics without a token
+        app.extensions['instrumentation'] = self
+        if not app.config['INSTRUMENTATION_ENABLED']:
+            return
+
+        if not self._engine_hooked:
+            # Every engine, whichever app created it
+            event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+            event.listen(Engine, 'handle_error', self._query_failed)
+            self._engine_hooked = True
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        if app.config['METRICS_TOKEN'] or app.config['METRICS_PUBLIC']:
+            app.add_url_rule('/metrics', 'metrics', self.metrics_view)
+
+        from pkg.http_client import http_client
+        if self._observe_http not in http_client.observers:
+            http_client.observers.append(self._observe_http)
+
+    # Hooks
+
+    def _start_request(self):
+        g._timings = RequestTimings()
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get('query_started')
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        self.query_duration.observe(elapsed)
+        timings = current_timings()
+        if timings is None:
+            return
+        timings.queries += 1
+        timings.sql_time += elapsed
+        if elapsed * 1000 >= current_app.config['SLOW_QUERY_MS']:
+            timings.slow_queries.append((elapsed, ' '.join(statement.split())[:500]))
+
+    def _query_failed(self, context):
+        starts = context.connection.info.get('query_started') if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+    def _before_render(self, app, template, context, **extra):
+        timings = current_timings()
+        if timings is not None:
+            timings._render_starts.append(time.perf_counter())
+
+    def _after_render(self, app, template, context, **extra):
+        timings = current_timings()
+        if timings is None or not timings._render_starts:
+            return
+        elapsed = time.perf_counter() - timings._render_starts.pop()
+        if not timings._render_starts:  # Nested renders are already inside the outer one
+            timings.template_time += elapsed
+        self.template_duration.observe(elapsed, template.name or 'string')
+
+    def _observe_http(self, method, host, status, elapsed, received):
+        self.http_duration.observe(elapsed, method, str(status) if status else 'error')
+        timings = current_timings()
+        if timings is not None:
+            timings.http_calls += 1
+            timings.http_time += elapsed
+
+    def _finish_request(self, response):
+        timings = g.pop('_timings', None)
+        if timings is None or request.endpoint == 'metrics':
+            return response
+        total = time.perf_counter() - timings.started
+        endpoint = request.endpoint or 'unmatched'
+
+        self.request_duration.observe(total, endpoint, request.method, str(response.status_code))
+        self.request_queries.observe(timings.queries, endpoint)
+
+        if current_app.config['SERVER_TIMING_HEADER']:
+            metrics = [f'db;dur={timings.sql_time * 1000:.1f};desc="{timings.queries} queries"']
+            if timings.template_time:
+                metrics.append(f'tpl;dur={timings.template_time * 1000:.1f}')
+            if timings.http_calls:
+                metrics.append(f'http;dur={timings.http_time * 1000:.1f};desc="{timings.http_calls} calls"')
+            # Streamed bodies (exports) are still being produced; this covers the view only
+            metrics.append(f'app;dur={total * 1000:.1f}')
+            response.headers.add('Server-Timing', ', '.join(metrics))
+
+        if total * 1000 >= current_app.config['SLOW_REQUEST_MS']:
+            slowest = sorted(timings.slow_queries, reverse=True)[:SLOW_QUERIES_LOGGED]
+            current_app.logger.warning(
+                f"Slow request {request.method} {request.full_path.rstrip('?')} ({endpoint}): "
+                f"{total * 1000:.0f} ms, {timings.queries} queries in {timings.sql_time * 1000:.0f} ms, "
+                f"templates {timings.template_time * 1000:.0f} ms, "
+                f"{timings.http_calls} HTTP calls in {timings.http_time * 1000:.0f} ms"
+                + ''.join(f"\n    {seconds * 1000:.0f} ms: {sql}" for seconds, sql in slowest)
+            )
+        return response
+
+    # Metrics endpoint
+
+    def metrics_view(self):
+        token = current_app.config['METRICS_TOKEN']
+        if token:
+            supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+            if not hmac.compare_digest(supplied.encode(), token.encode()):
+                return current_app.response_class('Unauthorized\n', status=401, mimetype='text/plain')
+        return current_app.response_class(
+            '\n'.join(self.exposition()) + '\n',
+            mimetype='text/plain',
+            headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'},
+        )
+
+    def exposition(self):
+        lines = []
+        for histogram in self.histograms:
+            lines.extend(histogram.expose())
+
+        from pkg.http_client import http_client
+        from pkg.metadata_cache import metadata_cache
+        for prefix, extension in (('linksaver_http_client', http_client),
+                                  ('linksaver_metadata_cache', metadata_cache)):
+            for key, value in sorted(extension.stats().items()):
+                if not isinstance(value, (int, float)) or isinstance(value, bool):
+                    continue
+                # Running totals are counters; averages, ratios and sizes are gauges
+                if key in extension.COUNTERS or key.endswith(('_hits', '_misses')) or key == 'lookups':
+                    name = f"{prefix}_{_metric_name(key)}_total"
+                    lines.append(f"# TYPE {name} counter")
+                else:
+                    name = f"{prefix}_{_metric_name(key)}"
+                    lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {value}")
+        return lines
+
+
+instrumentation = Instrumentation()
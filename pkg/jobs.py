@@ -0,0 +1,340 @@
+"""
+Database-backed background job queue.
+
+Web requests only enqueue rows in the ``jobs`` table; `flask jobs worker`
+claims them in batches and runs them on a bounded thread pool, so no request
+worker ever waits on a third-party site. The worker caps how many jobs per
+host run at once (JOBS_PER_HOST_LIMIT) so one slow or popular site can't take
+over the pool, and failed jobs are retried with a delay up to
+JOBS_MAX_ATTEMPTS times.
+
+Handlers are registered with @job_handler(kind). Each runs in its own thread
+with its own app context (and therefore its own database session).
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from pkg.models import db, Job, Link
+from pkg.http_client import http_client
+from pkg.metadata import MetadataError
+from pkg.metadata_cache import metadata_cache
+from pkg.search import search_index
+from pkg.stats import record_links_changed
+
+HANDLERS = {}
+
+jobs_cli = AppGroup("jobs", help="Run and manage background jobs.")
+
+
+class RetryableJobError(Exception):
+    """Raise from a handler to have the job retried later"""
+
+
+def job_handler(kind):
+    """Register the decorated function as the handler for jobs of `kind`"""
+    def decorator(func):
+        HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+def enqueue(kind, payload, user_id=None):
+    """Add a job to the session; it is queued when the caller commits"""
+    if kind not in HANDLERS:
+        raise ValueError(f"No handler registered for job kind {kind!r}")
+    job = Job(kind=kind, payload=payload, user_id=user_id, status='queued', run_after=datetime.utcnow())
+    db.session.add(job)
+    return job
+
+
+def job_host(job):
+    """Host a job will talk to, used for per-host concurrency limits"""
+    url = (job.payload or {}).get('url')
+    if not url:
+        return None
+    try:
+        return (urlsplit(url).hostname or '').lower() or None
+    except ValueError:
+        return None
+
+
+# Handlers
+
+@job_handler('fetch_metadata')
+def fetch_metadata_job(job):
+    """Fetch metadata for a URL (batch endpoint); result mirrors /fetch-metadata"""
+    try:
+        metadata = metadata_cache.get(job.payload['url'])
+    except MetadataError as e:
+        if e.status_code == 408:
+            raise RetryableJobError(e.message)
+        return {'error': e.message, 'status_code': e.status_code}
+    return {
+        'title': metadata['title'],
+        'description': metadata['description'],
+        'image_url': metadata['image_url'],
+    }
+
+
+@job_handler('enrich_link')
+def enrich_link_job(job):
+    """Fill in a saved link's preview image and missing description"""
+    link = db.session.get(Link, job.payload['link_id'])
+    if link is None or not link.is_active:
+        return {'skipped': True}
+
+    try:
+        metadata = metadata_cache.get(job.payload.get('url') or link.url)
+    except MetadataError as e:
+        if e.status_code == 408 and job.attempts < current_app.config['JOBS_MAX_ATTEMPTS']:
+            raise RetryableJobError(e.message)
+        link.fetch_status = 'failed'
+        link.fetched_at = datetime.utcnow()
+        db.session.commit()
+        return {'error': e.message, 'status_code': e.status_code}
+
+    link.image_url = metadata['image_url'] or None
+    if not link.description and metadata['description']:
+        from pkg.similarity import similarity_index  # pkg.similarity registers a job handler here
+        link.description = metadata['description']
+        search_index.index_link(link)
+        similarity_index.index_link(link)
+    link.fetch_status = 'ok'
+    link.fetched_at = datetime.utcnow()
+    record_links_changed([link.user_id])
+    db.session.commit()
+    return {'image_url': link.image_url}
+
+
+# Worker
+
+def claim_jobs(limit):
+    """Atomically mark up to `limit` due jobs as running; returns [(job_id, host)]"""
+    now = datetime.utcnow()
+    jobs = (
+        Job.query
+        .filter(Job.status == 'queued', Job.run_after <= now)
+        .order_by(Job.run_after, Job.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    claimed = []
+    for job in jobs:
+        job.status = 'running'
+        job.started_at = now
+        job.attempts = (job.attempts or 0) + 1
+        claimed.append((job.id, job_host(job)))
+    db.session.commit()
+    return claimed
+
+
+def requeue_stale_jobs():
+    """Put jobs left 'running' by a crashed worker back on the queue"""
+    cutoff = datetime.utcnow() - timedelta(seconds=current_app.config['JOBS_STALE_AFTER'])
+    count = (
+        Job.query
+        .filter(Job.status == 'running', Job.started_at < cutoff)
+        .update({'status': 'queued', 'run_after': datetime.utcnow()}, synchronize_session=False)
+    )
+    db.session.commit()
+    return count
+
+
+def run_job(app, job_id):
+    """Execute one claimed job in the current thread and record the outcome"""
+    with app.app_context():
+        job = db.session.get(Job, job_id)
+        handler = HANDLERS.get(job.kind)
+        try:
+            if handler is None:
+                raise ValueError(f"No handler registered for job kind {job.kind!r}")
+            result = handler(job)
+        except RetryableJobError as e:
+            db.session.rollback()
+            job = db.session.get(Job, job_id)
+            if job.attempts < app.config['JOBS_MAX_ATTEMPTS']:
+                job.status = 'queued'
+                job.run_after = datetime.utcnow() + timedelta(seconds=app.config['JOBS_RETRY_DELAY'] * job.attempts)
+            else:
+                job.status = 'failed'
+                job.finished_at = datetime.utcnow()
+            job.error = str(e)[:255]
+            db.session.commit()
+            return
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Job {job_id} ({job.kind}) failed: {str(e)}")
+            job = db.session.get(Job, job_id)
+            job.status = 'failed'
+            job.error = str(e)[:255]
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+            return
+
+        job.status = 'done'
+        job.result = result
+        job.error = None
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+
+
+class Worker:
+    """
+    Claims due jobs and runs them on a thread pool, never running more than
+    `per_host` jobs against the same host at once.
+    """
+
+    def __init__(self, app, concurrency, per_host, poll_interval):
+        self.app = app
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.poll_interval = poll_interval
+        self.pending = deque()  # Claimed jobs waiting for a host slot: (job_id, host)
+        self.in_flight = {}  # future -> host
+        self.host_counts = {}
+        self.stopping = threading.Event()
+
+    def _host_has_capacity(self, host):
+        return host is None or self.host_counts.get(host, 0) < self.per_host
+
+    def _submit_ready(self, executor):
+        for _ in range(len(self.pending)):
+            if len(self.in_flight) >= self.concurrency:
+                return
+            job_id, host = self.pending.popleft()
+            if not self._host_has_capacity(host):
+                self.pending.append((job_id, host))
+                continue
+            future = executor.submit(run_job, self.app, job_id)
+            self.in_flight[future] = host
+            if host is not None:
+                self.host_counts[host] = self.host_counts.get(host, 0) + 1
+
+    def _reap(self, futures):
+        for future in futures:
+            host = self.in_flight.pop(future)
+            if host is not None:
+                self.host_counts[host] -= 1
+                if not self.host_counts[host]:
+                    del self.host_counts[host]
+
+    def run(self, once=False):
+        with self.app.app_context():
+            requeued = requeue_stale_jobs()
+            if requeued:
+                self.app.logger.info(f"Requeued {requeued} stale job(s)")
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="job") as executor:
+            while not self.stopping.is_set():
+                # Keep a small backlog of claimed jobs so busy hosts don't starve the pool
+                wanted = self.concurrency * 2 - len(self.pending) - len(self.in_flight)
+                if wanted > 0:
+                    with self.app.app_context():
+                        self.pending.extend(claim_jobs(wanted))
+
+                self._submit_ready(executor)
+
+                if not self.in_flight:
+                    if once and not self.pending:
+                        break
+                    time.sleep(self.poll_interval)
+                    continue
+
+                done, _ = wait(list(self.in_flight), timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                self._reap(done)
+
+            wait(list(self.in_flight))
+            self._reap(list(self.in_flight))
+
+
+class JobQueue:
+    """Flask extension holding the job queue configuration and CLI"""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('JOBS_CONCURRENCY', 8)  # Worker threads
+        app.config.setdefault('JOBS_PER_HOST_LIMIT', 2)  # Concurrent jobs against one host
+        app.config.setdefault('JOBS_POLL_INTERVAL', 1.0)  # Seconds between queue polls when idle
+        app.config.setdefault('JOBS_MAX_ATTEMPTS', 3)
+        app.config.setdefault('JOBS_RETRY_DELAY', 30)  # Seconds, multiplied by the attempt number
+        app.config.setdefault('JOBS_STALE_AFTER', 300)  # Seconds before a 'running' job is presumed lost
+        app.extensions['job_queue'] = self
+        app.cli.add_command(jobs_cli)
+
+
+job_queue = JobQueue()
+
+
+@jobs_cli.command("worker")
+@click.option("--concurrency", type=int, default=None, help="Worker threads (default JOBS_CONCURRENCY).")
+@click.option("--per-host", type=int, default=None, help="Concurrent jobs per host (default JOBS_PER_HOST_LIMIT).")
+@click.option("--once", is_flag=True, help="Exit once the queue is empty.")
+def worker_command(concurrency, per_host, once):
+    """Process queued background jobs."""
+    app = current_app._get_current_object()
+    worker = Worker(
+        app,
+        concurrency=concurrency or app.config['JOBS_CONCURRENCY'],
+        per_host=per_host or app.config['JOBS_PER_HOST_LIMIT'],
+        poll_interval=app.config['JOBS_POLL_INTERVAL'],
+    )
+    click.echo(f"Job worker started ({worker.concurrency} threads, {worker.per_host} per host).")
+    try:
+        worker.run(once=once)
+    except KeyboardInterrupt:
+        worker.stopping.set()
+        click.echo("Stopping job worker.")
+    click.echo(f"Outbound HTTP: {http_client.stats()}")
+
+
+@jobs_cli.command("enqueue-enrichment")
+@click.option("--user-id", type=int, default=None, help="Only enqueue this user's links.")
+def enqueue_enrichment_command(user_id):
+    """Queue enrichment for links that have never been fetched."""
+    query = db.session.query(Link.id, Link.user_id, Link.url).filter(
+        Link.is_active.is_(True), Link.fetch_status.is_(None)
+    )
+    if user_id is not None:
+        query = query.filter(Link.user_id == user_id)
+
+    # Walk the links in id order, one short transaction per chunk
+    count, last_id = 0, 0
+    while True:
+        rows = query.filter(Link.id > last_id).order_by(Link.id).limit(1000).all()
+        if not rows:
+            break
+        for row in rows:
+            enqueue('enrich_link', {'link_id': row.id, 'url': row.url}, user_id=row.user_id)
+        db.session.query(Link).filter(Link.id.in_([row.id for row in rows])).update(
+            {'fetch_status': 'pending'}, synchronize_session=False
+        )
+        db.session.commit()
+        count += len(rows)
+        last_id = rows[-1].id
+    click.echo(f"Queued enrichment for {count} link(s).")
+
+
+@jobs_cli.command("purge")
+@click.option("--older-than-days", type=int, default=7, show_default=True)
+def purge_command(older_than_days):
+    """Delete finished jobs older than the given age."""
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    deleted = (
+        Job.query
+        .filter(Job.status.in_(['done', 'failed']), Job.finished_at < cutoff)
+        .delete(synchronize_session=False)
+    )
+    db.session.commit()
+    click.echo(f"Deleted {deleted} finished job(s).")
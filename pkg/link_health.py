@@ -0,0 +1,431 @@
+"""
+Dead-link checking.
+
+`flask links check` works through the active links that are due - never
+checked first, then the longest unchecked - and records on each one the HTTP
+status, where its redirects ended and when it was checked. Run it from cron,
+or leave it running with --every:
+
+    */30 * * * *  flask links check --limit 20000
+    flask links check --every 30
+
+Each URL gets a HEAD request, falling back to GET for servers that refuse or
+mishandle HEAD. Checks run on a thread pool through the shared HTTP client,
+never more than LINK_CHECK_PER_HOST at once against one host and no closer
+together than LINK_CHECK_HOST_INTERVAL, or the host's robots.txt
+Crawl-delay if that is longer. URLs robots.txt disallows are not requested.
+Links are claimed and written back in batches, so a run over hundreds of
+thousands of links only holds a window of them in memory, and it all happens
+in the CLI process, never in a web worker.
+
+A link is 'broken' as soon as it answers 404 or 410, or after
+LINK_CHECK_BROKEN_AFTER failed checks in a row (5xx, timeouts, DNS or TLS
+errors), so one bad minute on a site doesn't flag it. Login walls and bot
+blocks (401, 403, 429) and robots.txt exclusions leave it 'unknown'. A
+link's updated_at only moves when its health status changes, so routine
+checks don't churn the sync feed or the API's ETags.
+"""
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+
+import click
+import requests
+from flask import current_app
+from sqlalchemy import bindparam, or_
+
+from pkg.models import db, Link
+from pkg.http_client import http_client
+from pkg.cli import links_cli
+from pkg.metadata import MetadataError, REQUEST_HEADERS, prepare_url
+from pkg.lru import LRUCache
+from pkg.stats import record_links_changed
+
+HEALTH_STATUSES = ('ok', 'broken', 'unknown')
+GONE = (404, 410)  # Broken on the first check
+INCONCLUSIVE = (401, 403, 429)  # Login walls and bot blocking say nothing about the page
+# (exception types, error message, gone): request failures that end a check
+REQUEST_FAILURES = (
+    (requests.exceptions.Timeout, 'Timed out', False),
+    (requests.exceptions.SSLError, 'TLS error', False),
+    (requests.exceptions.ConnectionError, 'Could not connect', False),
+    (requests.exceptions.TooManyRedirects, 'Too many redirects', False),
+    ((requests.exceptions.InvalidURL, requests.exceptions.InvalidSchema), 'Invalid URL', True),
+)
+ROBOTS_AGENT = 'LinkSaverClient'  # The product token in HTTP_USER_AGENT
+ROBOTS_MAX_BYTES = 512 * 1024
+ROBOTS_CACHE_SIZE = 10000  # Origins whose robots.txt is kept for the rest of a run
+POLL_INTERVAL = 0.05  # Seconds; how often paced hosts are looked at again
+
+# What one check found; `allowed` is False when robots.txt ruled the URL out
+CheckOutcome = namedtuple('CheckOutcome', 'code final_url error gone allowed crawl_delay')
+
+
+class RobotsRules:
+    """robots.txt per origin, fetched on first use"""
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self._parsers = LRUCache(ROBOTS_CACHE_SIZE)
+
+    def for_url(self, parts):
+        origin = f"{parts.scheme}://{parts.netloc}"
+        parser = self._parsers.get(origin)
+        if parser is None:
+            parser = self._fetch(origin)
+            self._parsers.put(origin, parser)
+        return parser
+
+    def _fetch(self, origin):
+        parser = RobotFileParser(f"{origin}/robots.txt")
+        try:
+            response = http_client.get(f"{origin}/robots.txt", max_bytes=ROBOTS_MAX_BYTES, timeout=self.timeout)
+        except requests.exceptions.RequestException:
+            # Unreachable: nothing to honour, and the check itself will report the outage
+            parser.allow_all = True
+            return parser
+        if response.status_code >= 400:
+            parser.allow_all = True  # No robots.txt allows everything
+        else:
+            parser.parse(response.text.splitlines())
+        return parser
+
+
+def link_host(url):
+    """Host a check of `url` will talk to; None for URLs that can't be checked"""
+    try:
+        return urlsplit(prepare_url(url)).hostname.lower()
+    except (MetadataError, ValueError):
+        return None
+
+
+def check_url(url, robots, timeout):
+    """HEAD `url`, then GET if HEAD didn't get a good answer; returns a CheckOutcome and never raises"""
+    try:
+        url = prepare_url(url)
+    except MetadataError as e:
+        return CheckOutcome(None, None, e.message, True, True, None)
+    parts = urlsplit(url)
+    rules = robots.for_url(parts)
+    crawl_delay = rules.crawl_delay(ROBOTS_AGENT)
+    if not rules.can_fetch(ROBOTS_AGENT, url):
+        return CheckOutcome(None, None, 'Disallowed by robots.txt', False, False, crawl_delay)
+
+    code, final_url, error = None, None, None
+    for method in ('HEAD', 'GET'):
+        try:
+            # The body is never read: the status line and the redirect chain are all a check needs
+            with http_client.stream(method, url, headers=REQUEST_HEADERS, allow_redirects=True,
+                                    timeout=timeout) as response:
+                code, final_url, error = response.status_code, response.url, None
+        except Exception as e:
+            if code in GONE:
+                break  # HEAD already said 404/410; a GET that fails outright doesn't overturn it
+            for exceptions, message, gone in REQUEST_FAILURES:
+                if isinstance(e, exceptions):
+                    return CheckOutcome(None, None, message, gone, True, crawl_delay)
+            code, final_url, error = None, None, f"{type(e).__name__}: {str(e)}"[:255]
+        if code is not None and code < 400:
+            break
+        # Plenty of servers answer HEAD with 403/404/405/501 or a reset; GET is the real test
+    return CheckOutcome(code, final_url, error, code in GONE, True, crawl_delay)
+
+
+def health_values(row, outcome, broken_after, checked_at):
+    """Column values for a checked link (bind names for save_results)"""
+    failures = row.health_failures or 0
+    if not outcome.allowed or outcome.code in INCONCLUSIVE:
+        status = 'unknown'
+    elif outcome.code is not None and outcome.code < 400:
+        status, failures = 'ok', 0
+    else:
+        failures += 1
+        status = 'broken' if outcome.gone or failures >= broken_after else 'unknown'
+
+    final_url = outcome.final_url if outcome.final_url and outcome.final_url != row.url else None
+    return {
+        'b_id': row.id,
+        'user_id': row.user_id,
+        'b_status': status,
+        'b_code': outcome.code,
+        'b_final_url': final_url,
+        'b_error': outcome.error,
+        'b_failures': failures,
+        'b_checked_at': checked_at,
+        'changed': status != row.health_status,
+    }
+
+
+def claim_links(limit, cutoff, user_id=None):
+    """
+    Mark up to `limit` due links as being checked, least recently checked
+    first, and return them. Claimed links look freshly checked, so a second
+    checker running at the same time moves on to others.
+    """
+    query = (
+        db.session.query(Link.id, Link.user_id, Link.url, Link.health_status, Link.health_failures,
+                         Link.health_checked_at)
+        .filter(Link.is_active.is_(True),
+                or_(Link.health_checked_at.is_(None), Link.health_checked_at < cutoff))
+    )
+    if user_id is not None:
+        query = query.filter(Link.user_id == user_id)
+    # Walks ix_links_health_due; url_hash spreads never-checked links across hosts instead of
+    # handing over an import's worth of links to one site in a row
+    rows = (
+        query.order_by(Link.health_checked_at, Link.url_hash)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    if rows:
+        table = Link.__table__
+        db.session.execute(
+            table.update()
+            .where(table.c.id.in_([row.id for row in rows]))
+            .values(health_checked_at=datetime.utcnow(), updated_at=table.c.updated_at)
+        )
+    db.session.commit()
+    return rows
+
+
+def release_links(rows):
+    """Hand claimed but unchecked links back, as they were"""
+    if not rows:
+        return
+    table = Link.__table__
+    db.session.execute(
+        table.update()
+        .where(table.c.id == bindparam('b_id'))
+        .values(health_checked_at=bindparam('b_checked_at'), updated_at=table.c.updated_at),
+        [{'b_id': row.id, 'b_checked_at': row.health_checked_at} for row in rows],
+    )
+    db.session.commit()
+
+
+def save_results(results):
+    """Write a batch of health_values(); updated_at moves only for links whose status changed"""
+    table = Link.__table__
+    statement = table.update().where(table.c.id == bindparam('b_id')).values(
+        health_status=bindparam('b_status'),
+        health_code=bindparam('b_code'),
+        health_final_url=bindparam('b_final_url'),
+        health_error=bindparam('b_error'),
+        health_failures=bindparam('b_failures'),
+        health_checked_at=bindparam('b_checked_at'),
+    )
+    skip = ('changed', 'user_id')
+    changed = [{k: v for k, v in values.items() if k not in skip} for values in results if values['changed']]
+    unchanged = [{k: v for k, v in values.items() if k not in skip} for values in results if not values['changed']]
+    if unchanged:
+        db.session.execute(statement.values(updated_at=table.c.updated_at), unchanged)
+    if changed:
+        db.session.execute(statement.values(updated_at=bindparam('b_checked_at')), changed)
+        record_links_changed(values['user_id'] for values in results if values['changed'])
+    db.session.commit()
+
+
+def reset_health(link):
+    """Forget a link's check results (its URL changed); the next run checks it first"""
+    link.health_status = None
+    link.health_code = None
+    link.health_final_url = None
+    link.health_error = None
+    link.health_failures = 0
+    link.health_checked_at = None
+
+
+def broken_link_count(user_id):
+    return db.session.query(db.func.count(Link.id)).filter(
+        Link.user_id == user_id, Link.is_active.is_(True), Link.health_status == 'broken'
+    ).scalar()
+
+
+class LinkChecker:
+    """
+    Claims due links in batches and checks them on a thread pool, keeping
+    every host within its concurrency limit and request pacing. All database
+    work stays on the calling thread; the pool threads only make requests.
+    """
+
+    def __init__(self, app, concurrency, per_host, host_interval):
+        self.app = app
+        self.concurrency = concurrency
+        # Past the shared client's own per-host cap, checks would time out waiting for a slot
+        self.per_host = min(per_host, app.config['HTTP_PER_HOST_LIMIT'])
+        self.host_interval = host_interval
+        self.max_crawl_delay = app.config['LINK_CHECK_MAX_CRAWL_DELAY']
+        self.timeout = app.config['LINK_CHECK_TIMEOUT']
+        self.batch_size = app.config['LINK_CHECK_BATCH_SIZE']
+        self.broken_after = app.config['LINK_CHECK_BROKEN_AFTER']
+        self.window = max(self.batch_size * 4, concurrency * 2)  # Claimed links held at once
+        self.robots = RobotsRules(self.timeout)
+        self.pending = deque()  # Claimed links waiting for their host: (row, host)
+        self.in_flight = {}  # future -> (row, host)
+        self.host_counts = {}
+        self.host_ready_at = {}  # host -> monotonic time its next request may start
+        self.crawl_delays = {}  # host -> seconds asked for by its robots.txt
+        self.seen_hosts = set()  # Hosts whose robots.txt has been read
+        self.results = []
+        self.totals = dict.fromkeys(('checked',) + HEALTH_STATUSES, 0)
+        self.stopping = threading.Event()
+
+    def _host_is_free(self, host, now):
+        if host is None:
+            return True
+        # The first check of a host goes alone, so its robots.txt is only fetched once
+        limit = self.per_host if host in self.seen_hosts else 1
+        return self.host_counts.get(host, 0) < limit and self.host_ready_at.get(host, 0) <= now
+
+    def _submit_ready(self, executor):
+        now = time.monotonic()
+        for _ in range(len(self.pending)):
+            if len(self.in_flight) >= self.concurrency:
+                return
+            row, host = self.pending.popleft()
+            if not self._host_is_free(host, now):
+                self.pending.append((row, host))
+                continue
+            future = executor.submit(check_url, row.url, self.robots, self.timeout)
+            self.in_flight[future] = (row, host)
+            if host is not None:
+                self.host_counts[host] = self.host_counts.get(host, 0) + 1
+                self.host_ready_at[host] = now + max(self.host_interval, self.crawl_delays.get(host, 0))
+
+    def _reap(self, futures):
+        checked_at = datetime.utcnow()
+        for future in futures:
+            row, host = self.in_flight.pop(future)
+            if host is not None:
+                self.host_counts[host] -= 1
+                if not self.host_counts[host]:
+                    del self.host_counts[host]
+                self.seen_hosts.add(host)
+            try:
+                outcome = future.result()
+            except Exception as e:  # check_url catches everything it expects; don't let a surprise end the run
+                self.app.logger.error(f"Checking link {row.id} failed: {str(e)}")
+                outcome = CheckOutcome(None, None, str(e)[:255], False, True, None)
+            if host is not None and outcome.crawl_delay and host not in self.crawl_delays:
+                # Just learned it from the host's first check, which ran alone: hold the next one back
+                self.crawl_delays[host] = min(float(outcome.crawl_delay), self.max_crawl_delay)
+                self.host_ready_at[host] = max(self.host_ready_at.get(host, 0),
+                                               time.monotonic() + self.crawl_delays[host])
+
+            values = health_values(row, outcome, self.broken_after, checked_at)
+            self.results.append(values)
+            self.totals['checked'] += 1
+            self.totals[values['b_status']] += 1
+
+    def _flush(self):
+        if self.results:
+            save_results(self.results)
+            self.results = []
+
+    def run(self, limit=None, user_id=None, recheck_after=None, progress=None):
+        """Check due links until none are left (or `limit` were claimed); returns the totals"""
+        if recheck_after is None:
+            recheck_after = timedelta(days=self.app.config['LINK_CHECK_RECHECK_DAYS'])
+        cutoff = datetime.utcnow() - recheck_after
+        claimed = 0
+        exhausted = False
+        with self.app.app_context(), \
+                ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="linkcheck") as executor:
+            try:
+                while not self.stopping.is_set():
+                    if not exhausted and len(self.pending) + len(self.in_flight) + self.batch_size <= self.window:
+                        wanted = self.batch_size if limit is None else min(self.batch_size, limit - claimed)
+                        rows = claim_links(wanted, cutoff, user_id) if wanted > 0 else []
+                        claimed += len(rows)
+                        exhausted = len(rows) < wanted or wanted <= 0
+                        self.pending.extend((row, link_host(row.url)) for row in rows)
+
+                    self._submit_ready(executor)
+
+                    if len(self.results) >= self.batch_size:
+                        self._flush()
+                        if progress:
+                            progress(self.totals)
+
+                    if not self.in_flight:
+                        if exhausted and not self.pending:
+                            break
+                        time.sleep(POLL_INTERVAL)  # Everything left waits on host pacing
+                        continue
+
+                    done, _ = wait(list(self.in_flight), timeout=POLL_INTERVAL, return_when=FIRST_COMPLETED)
+                    self._reap(done)
+            finally:
+                # Done, stopped or interrupted: finish what is running and put back what never started
+                self._reap(wait(list(self.in_flight)).done)
+                self._flush()
+                release_links([row for row, _ in self.pending])
+                self.pending.clear()
+        return self.totals
+
+
+class LinkHealth:
+    """Flask extension holding the link checker configuration"""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('LINK_CHECK_CONCURRENCY', 32)  # Checker threads
+        app.config.setdefault('LINK_CHECK_PER_HOST', 2)  # Concurrent checks against one host
+        app.config.setdefault('LINK_CHECK_HOST_INTERVAL', 1.0)  # Seconds between requests to one host
+        app.config.setdefault('LINK_CHECK_MAX_CRAWL_DELAY', 30)  # Seconds; longer robots.txt Crawl-delays are capped
+        app.config.setdefault('LINK_CHECK_TIMEOUT', 10)  # Seconds
+        app.config.setdefault('LINK_CHECK_BATCH_SIZE', 500)  # Links claimed and written back at a time
+        app.config.setdefault('LINK_CHECK_RECHECK_DAYS', 7)  # Links checked more recently aren't due
+        app.config.setdefault('LINK_CHECK_BROKEN_AFTER', 2)  # Failed checks in a row before a link is broken
+        app.extensions['link_health'] = self
+
+
+link_health = LinkHealth()
+
+
+@links_cli.command("check")
+@click.option("--user-id", type=int, default=None, help="Only check this user's links.")
+@click.option("--limit", type=int, default=None, help="Check at most this many links per run.")
+@click.option("--recheck-days", type=float, default=None,
+              help="Links checked within this many days are skipped (default LINK_CHECK_RECHECK_DAYS).")
+@click.option("--concurrency", type=int, default=None, help="Checker threads (default LINK_CHECK_CONCURRENCY).")
+@click.option("--per-host", type=int, default=None, help="Concurrent checks per host (default LINK_CHECK_PER_HOST).")
+@click.option("--every", type=float, default=None, help="Keep running, starting a new run every this many minutes.")
+def check_command(user_id, limit, recheck_days, concurrency, per_host, every):
+    """Check saved links for dead pages and redirects."""
+    app = current_app._get_current_object()
+    recheck_after = timedelta(days=recheck_days) if recheck_days is not None else None
+
+    def report(totals):
+        click.echo(f"  {totals['checked']} checked: {totals['ok']} ok, {totals['broken']} broken, "
+                   f"{totals['unknown']} unknown...")
+
+    while True:
+        checker = LinkChecker(
+            app,
+            concurrency=concurrency or app.config['LINK_CHECK_CONCURRENCY'],
+            per_host=per_host or app.config['LINK_CHECK_PER_HOST'],
+            host_interval=app.config['LINK_CHECK_HOST_INTERVAL'],
+        )
+        started = time.perf_counter()
+        try:
+            totals = checker.run(limit=limit, user_id=user_id, recheck_after=recheck_after, progress=report)
+        except KeyboardInterrupt:
+            click.echo(f"Stopped after {checker.totals['checked']} link(s); unchecked ones were put back.")
+            return
+        elapsed = time.perf_counter() - started
+        click.echo(f"Checked {totals['checked']} link(s) in {elapsed:.1f}s: {totals['ok']} ok, "
+                   f"{totals['broken']} broken, {totals['unknown']} unknown.")
+        if every is None:
+            return
+        try:
+            time.sleep(max(every * 60 - elapsed, 0))
+        except KeyboardInterrupt:
+            return
@@ -0,0 +1,97 @@
+"""Fetching and parsing link metadata (title, description, preview image)"""
+from urllib.parse import urlsplit
+
+import requests
+from flask import current_app
+
+from pkg.extractor import DEFAULT_MAX_BYTES, extract_from_response
+from pkg.http_client import http_client
+
+# User-Agent comes from the shared client (HTTP_USER_AGENT)
+REQUEST_HEADERS = {
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9'
+}
+
+
+class MetadataError(Exception):
+    """A metadata fetch failed; carries the message and HTTP status for the client"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def prepare_url(url_to_fetch):
+    """Validate a user-supplied URL and default the scheme to https"""
+    url_to_fetch = (url_to_fetch or '').strip()
+    if not url_to_fetch:
+        raise MetadataError('URL is required.', 400)
+
+    # Basic scheme validation/addition
+    if not (url_to_fetch.startswith('http://') or url_to_fetch.startswith('https://')):
+        # Check if it looks like a domain before prepending http, to avoid http://my search term
+        if '.' not in url_to_fetch.split('/')[0] or ' ' in url_to_fetch:
+            raise MetadataError('Invalid URL format. Please provide a full URL like https://example.com', 400)
+        url_to_fetch = 'https://' + url_to_fetch  # Default to https
+
+    try:
+        parts = urlsplit(url_to_fetch)
+        parts.port  # Raises ValueError for a malformed port
+    except ValueError:
+        raise MetadataError('Invalid URL format. Please provide a full URL like https://example.com', 400)
+    if not parts.hostname:
+        raise MetadataError('Invalid URL format. Please provide a full URL like https://example.com', 400)
+    return url_to_fetch
+
+
+def _read_response(response, max_bytes):
+    """Turn a streamed response into the fetch_metadata result"""
+    result = {
+        'final_url': response.url,
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+        'not_modified': response.status_code == 304,
+    }
+    if result['not_modified']:
+        return result
+
+    response.raise_for_status()  # Raise HTTPError for bad responses (4xx or 5xx)
+
+    content_type = response.headers.get('content-type', '').lower()
+    if 'html' not in content_type:
+        raise MetadataError('URL does not point to an HTML page.', 400)
+
+    # Only <head> is parsed; the body is never read past it (or max_bytes)
+    result.update(extract_from_response(response, max_bytes=max_bytes))
+    return result
+
+
+def fetch_metadata(url_to_fetch, etag=None, last_modified=None):
+    """
+    Fetch `url_to_fetch` and return its metadata plus the response validators:
+    {'final_url', 'title', 'description', 'image_url', 'etag', 'last_modified',
+    'not_modified'}. When `etag`/`last_modified` are given the request is
+    conditional and a 304 comes back as not_modified=True with no metadata.
+    Raises MetadataError on failure.
+    """
+    headers = dict(REQUEST_HEADERS)
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+    max_bytes = current_app.config.get('METADATA_MAX_BYTES', DEFAULT_MAX_BYTES)
+
+    try:
+        # Pooled keep-alive connections, shared with the rest of the app
+        with http_client.stream('GET', url_to_fetch, headers=headers, allow_redirects=True) as response:
+            return _read_response(response, max_bytes)
+
+    except requests.exceptions.Timeout:
+        raise MetadataError('Fetching URL timed out.', 408)
+    except requests.exceptions.TooManyRedirects:
+        raise MetadataError('Too many redirects for the URL.', 400)
+    except requests.exceptions.RequestException as e:
+        current_app.logger.warning(f"RequestException fetching metadata for {url_to_fetch}: {str(e)}")
+        raise MetadataError('Could not fetch URL. Please check the address and try again.', 400)
@@ -0,0 +1,198 @@
+"""
+Two-tier cache for link metadata.
+
+Lookups go through a bounded in-process LRU first, then the shared
+``metadata_cache`` table, and only then out to the network. Entries are keyed
+by the normalized URL; a fetch that was redirected is also stored under the
+normalized final URL so every alias of a page shares one entry.
+
+Expired entries that carry an ETag or Last-Modified validator are revalidated
+with a conditional request, so an unchanged page costs a 304 instead of a full
+download and parse. Failures are cached for a short time so a dead URL pasted
+repeatedly doesn't keep tying up workers.
+"""
+import threading
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from pkg.lru import LRUCache
+from pkg.models import db, MetadataCacheEntry
+from pkg.metadata import MetadataError, fetch_metadata
+from pkg.urls import normalize_url, url_hash
+
+ENTRY_FIELDS = ('url', 'final_url', 'title', 'description', 'image_url', 'etag',
+                'last_modified', 'status_code', 'error', 'fetched_at', 'expires_at')
+
+metadata_cache_cli = AppGroup("metadata-cache", help="Inspect and maintain the metadata cache.")
+
+
+class MetadataCache:
+    """Flask extension fronting fetch_metadata with the LRU and shared tiers"""
+
+    COUNTERS = ('memory_hits', 'shared_hits', 'negative_hits', 'revalidated', 'misses', 'fetch_errors')
+
+    def __init__(self, app=None):
+        self._memory = None
+        self._counters = dict.fromkeys(self.COUNTERS, 0)
+        self._counter_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('METADATA_CACHE_TTL', 24 * 3600)  # Seconds a fetched page stays fresh
+        app.config.setdefault('METADATA_CACHE_NEGATIVE_TTL', 5 * 60)  # Seconds a failure is remembered
+        app.config.setdefault('METADATA_CACHE_SIZE', 1024)  # Entries kept in the in-process LRU
+        self._memory = LRUCache(app.config['METADATA_CACHE_SIZE'])
+        app.extensions['metadata_cache'] = self
+        app.cli.add_command(metadata_cache_cli)
+
+    # Counters
+
+    def _count(self, name):
+        with self._counter_lock:
+            self._counters[name] += 1
+
+    def stats(self):
+        """Hit/miss counters for this process plus the overall hit rate"""
+        with self._counter_lock:
+            counters = dict(self._counters)
+        lookups = sum(counters.values())
+        hits = counters['memory_hits'] + counters['shared_hits'] + counters['negative_hits']
+        counters['lookups'] = lookups
+        counters['hit_rate'] = round(hits / lookups, 4) if lookups else 0.0
+        counters['memory_entries'] = len(self._memory) if self._memory is not None else 0
+        return counters
+
+    # Tiers
+
+    def _load_shared(self, key):
+        row = db.session.get(MetadataCacheEntry, url_hash(key))
+        if row is None:
+            return None
+        return {field: getattr(row, field) for field in ENTRY_FIELDS}
+
+    def _store(self, keys, entry):
+        for key in keys:
+            self._memory.put(key, entry)
+        try:
+            for key in keys:
+                db.session.merge(MetadataCacheEntry(url_hash=url_hash(key), **dict(entry, url=key)))
+            db.session.commit()
+        except Exception as e:
+            # Losing a shared-tier write only costs a future refetch
+            db.session.rollback()
+            current_app.logger.warning(f"Could not store metadata cache entry for {keys[0]}: {str(e)}")
+
+    @staticmethod
+    def _result(entry):
+        if entry['status_code'] != 200:
+            raise MetadataError(entry['error'], entry['status_code'])
+        return {
+            'title': entry['title'] or '',
+            'description': entry['description'] or '',
+            'image_url': entry['image_url'] or '',
+            'final_url': entry['final_url'],
+        }
+
+    def _remember_failure(self, key, url, error):
+        now = datetime.utcnow()
+        entry = dict.fromkeys(ENTRY_FIELDS)
+        entry.update(url=url, status_code=error.status_code, error=error.message[:255], fetched_at=now,
+                     expires_at=now + timedelta(seconds=current_app.config['METADATA_CACHE_NEGATIVE_TTL']))
+        self._store([key], entry)
+
+    # Lookup
+
+    def get(self, url):
+        """
+        Return {'title', 'description', 'image_url', 'final_url'} for `url`,
+        from cache when possible. Raises MetadataError (possibly cached).
+        """
+        key = normalize_url(url)
+        now = datetime.utcnow()
+
+        entry = self._memory.get(key)
+        if entry is not None and entry['expires_at'] > now:
+            self._count('negative_hits' if entry['status_code'] != 200 else 'memory_hits')
+            return self._result(entry)
+
+        # Another worker may have refreshed the entry since it was copied into memory
+        shared = self._load_shared(key)
+        if shared is not None:
+            entry = shared
+            if entry['expires_at'] > now:
+                self._memory.put(key, entry)
+                self._count('negative_hits' if entry['status_code'] != 200 else 'shared_hits')
+                return self._result(entry)
+
+        # Stale successful entries are revalidated rather than refetched
+        validators = {}
+        if entry is not None and entry['status_code'] == 200:
+            validators = {'etag': entry['etag'], 'last_modified': entry['last_modified']}
+
+        try:
+            fetched = fetch_metadata(url, **validators)
+        except MetadataError as e:
+            self._count('fetch_errors')
+            self._remember_failure(key, url, e)
+            raise
+
+        ttl = timedelta(seconds=current_app.config['METADATA_CACHE_TTL'])
+        if fetched['not_modified'] and entry is not None:
+            self._count('revalidated')
+            entry = dict(entry, fetched_at=now, expires_at=now + ttl,
+                         etag=fetched['etag'] or entry['etag'],
+                         last_modified=fetched['last_modified'] or entry['last_modified'])
+        else:
+            self._count('misses')
+            entry = {
+                'url': url,
+                'final_url': fetched['final_url'],
+                'title': fetched.get('title', ''),
+                'description': fetched.get('description', ''),
+                'image_url': fetched.get('image_url', ''),
+                'etag': (fetched['etag'] or '')[:255] or None,
+                'last_modified': (fetched['last_modified'] or '')[:64] or None,
+                'status_code': 200,
+                'error': None,
+                'fetched_at': now,
+                'expires_at': now + ttl,
+            }
+
+        keys = [key]
+        final_key = normalize_url(entry['final_url'] or url)
+        if final_key != key:
+            keys.append(final_key)
+        self._store(keys, entry)
+        return self._result(entry)
+
+    def clear_memory(self):
+        self._memory.clear()
+
+
+metadata_cache = MetadataCache()
+
+
+@metadata_cache_cli.command("purge")
+def purge_command():
+    """Delete expired entries from the shared cache table."""
+    deleted = (
+        MetadataCacheEntry.query
+        .filter(MetadataCacheEntry.expires_at < datetime.utcnow())
+        .delete(synchronize_session=False)
+    )
+    db.session.commit()
+    click.echo(f"Purged {deleted} expired metadata cache entries.")
+
+
+@metadata_cache_cli.command("stats")
+def stats_command():
+    """Show shared cache table size and freshness."""
+    now = datetime.utcnow()
+    total = MetadataCacheEntry.query.count()
+    fresh = MetadataCacheEntry.query.filter(MetadataCacheEntry.expires_at >= now).count()
+    negative = MetadataCacheEntry.query.filter(MetadataCacheEntry.status_code != 200).count()
+    click.echo(f"entries={total} fresh={fresh} expired={total - fresh} negative={negative}")
@@ -1,6 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.ext.mutable import MutableDict
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from pkg.hashing import password_hasher
 
 db = SQLAlchemy()
 
@@ -21,19 +22,39 @@ class User(db.Model):
 
     @password.setter
     def password(self, plain_text_password):
-        self._password_hash = generate_password_hash(plain_text_password)
+        self._password_hash = password_hasher.hash(plain_text_password)
 
     def check_password(self, password):
-        return check_password_hash(self._password_hash, password)
+        return password_hasher.verify(self._password_hash, password)[0]
 
 
 
 class Link(db.Model):
     __tablename__ = 'links'
+    __table_args__ = (
+        # Full-text search index (MySQL only; SQLite uses the links_fts FTS5 table)
+        db.Index('ix_links_fulltext', 'title', 'description', 'url', 'keywords',
+                 mysql_prefix='FULLTEXT').ddl_if(dialect='mysql'),
+        # Duplicate detection: one indexed lookup per add/edit (see pkg.duplicates)
+        db.Index('ix_links_user_id_url_hash', 'user_id', 'url_hash', unique=True),
+        # Dashboard listing and keyset pagination: filter + ORDER BY created_at, id
+        db.Index('ix_links_user_active_created', 'user_id', 'is_active', 'created_at', 'id'),
+        # Category filter (same order) and per-category counts (GROUP BY category)
+        db.Index('ix_links_user_active_category', 'user_id', 'is_active', 'category', 'created_at', 'id'),
+        # API version checks: MAX(updated_at) and COUNT(*) per user from the index alone
+        db.Index('ix_links_user_updated', 'user_id', 'updated_at', 'id'),
+        # "Broken links" filter and count, in dashboard order
+        db.Index('ix_links_user_active_health', 'user_id', 'is_active', 'health_status', 'created_at', 'id'),
+        # Link checker: the least recently checked links first (see pkg.link_health)
+        db.Index('ix_links_health_due', 'is_active', 'health_checked_at', 'url_hash'),
+        # Archiver: deleted links past the retention period (see pkg.archive)
+        db.Index('ix_links_inactive_updated', 'is_active', 'updated_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     url = db.Column(db.Text, nullable=False)
+    url_hash = db.Column(db.String(64))  # sha256 of the canonical URL; NULL on merged duplicates
     description = db.Column(db.Text)
     category = db.Column(db.String(50))  # Added category field
     keywords = db.Column(db.Text)  # Store as comma-separated values
@@ -41,6 +62,19 @@ class Link(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     is_active = db.Column(db.Boolean, default=True)
+    # Filled in by the background enrichment worker (see pkg.jobs)
+    image_url = db.Column(db.Text)
+    fetched_at = db.Column(db.DateTime)
+    fetch_status = db.Column(db.String(20))  # pending | ok | failed
+    # Filled in by the link checker (see pkg.link_health); NULL status = never checked
+    health_status = db.Column(db.String(20))  # ok | broken | unknown
+    health_code = db.Column(db.Integer)  # Last HTTP status; NULL when no response came back
+    health_final_url = db.Column(db.Text)  # Where redirects ended, if somewhere else
+    health_error = db.Column(db.String(255))
+    health_failures = db.Column(db.Integer, nullable=False, default=0)  # Failed checks in a row
+    health_checked_at = db.Column(db.DateTime)
+    # MinHash of its words for "similar links" (see pkg.similarity); only that module reads it
+    similarity_signature = db.deferred(db.Column(db.LargeBinary))
     
     def get_keywords_list(self):
         """Get keywords as a list"""
@@ -49,29 +83,188 @@ class Link(db.Model):
         return [keyword.strip() for keyword in self.keywords.split(',') if keyword.strip()]
     
     def set_keywords_list(self, keywords_list):
-        """Set keywords from a list"""
+        """
+        Set keywords from a list. `keywords` stays as the display/search copy;
+        the normalized tags behind tag filtering are kept in sync with it.
+        """
         if keywords_list:
-            self.keywords = ', '.join([keyword.strip() for keyword in keywords_list if keyword.strip()])
+            self.keywords = ', '.join([keyword.strip() for keyword in keywords_list if keyword.strip()]) or None
         else:
             self.keywords = None
+        self.tags = Tag.for_names(self.user_id, self.get_keywords_list())
     
+    DICT_FIELDS = ('id', 'title', 'url', 'description', 'category', 'keywords', 'user_id', 'created_at',
+                   'updated_at', 'is_active', 'image_url', 'fetched_at', 'fetch_status', 'health_status',
+                   'health_code', 'health_final_url', 'health_error', 'health_checked_at')
+
+    def to_dict(self, fields=None):
+        """Convert link to dictionary; `fields` limits it to those keys (see DICT_FIELDS)"""
+        data = {}
+        for field in fields or self.DICT_FIELDS:
+            if field == 'keywords':
+                data[field] = self.get_keywords_list()
+            else:
+                value = getattr(self, field)
+                data[field] = value.isoformat() if isinstance(value, datetime) else value
+        return data
+    
+    def __repr__(self):
+        return f"<Link {self.title}>"
+
+# Link <-> Tag association; (tag_id, link_id) serves tag filters and facet counts
+link_tags = db.Table(
+    'link_tags',
+    db.Column('link_id', db.Integer, db.ForeignKey('links.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('tag_id', db.Integer, db.ForeignKey('tags.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_link_tags_tag_id_link_id', 'tag_id', 'link_id'),
+)
+
+# LSH bands of each link's similarity signature; links sharing a (user_id, band_key) are alike
+link_similarity_bands = db.Table(
+    'link_similarity_bands',
+    db.Column('user_id', db.Integer, primary_key=True),
+    db.Column('band_key', db.BigInteger, primary_key=True),
+    db.Column('link_id', db.Integer, db.ForeignKey('links.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_link_similarity_bands_link_id', 'link_id'),
+)
+
+class Tag(db.Model):
+    """A user's tag, stored once and normalized (lowercase, single spaces)"""
+    __tablename__ = 'tags'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'name', name='uq_tags_user_id_name'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    name = db.Column(db.String(50), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @staticmethod
+    def normalize(name):
+        return ' '.join((name or '').split()).lower()[:50]
+
+    @classmethod
+    def for_names(cls, user_id, names):
+        """Existing or newly added Tag rows for `names`, in order, without duplicates"""
+        wanted = []
+        for name in names:
+            normalized = cls.normalize(name)
+            if normalized and normalized not in wanted:
+                wanted.append(normalized)
+        if not wanted or user_id is None:
+            return []
+
+        with db.session.no_autoflush:
+            found = {tag.name: tag for tag in cls.query.filter(cls.user_id == user_id, cls.name.in_(wanted))}
+        for name in wanted:
+            if name not in found:
+                found[name] = cls(user_id=user_id, name=name)
+                db.session.add(found[name])
+        return [found[name] for name in wanted]
+
+    def __repr__(self):
+        return f"<Tag {self.name}>"
+
+class UserLinkStats(db.Model):
+    """Per-user link counters, maintained by the link routes (see pkg.stats)"""
+    __tablename__ = 'user_link_stats'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    total_links = db.Column(db.Integer, nullable=False, default=0)
+    # {category: active link count}; uncategorized links are counted under ''
+    category_counts = db.Column(MutableDict.as_mutable(db.JSON), nullable=False, default=dict)
+    version = db.Column(db.BigInteger, nullable=False, default=0)  # Bumped on every change to the user's links
+    sync_floor = db.Column(db.DateTime)  # Deletions up to here were purged from the archive (see pkg.archive)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<UserLinkStats user={self.user_id} total={self.total_links}>"
+
+class MetadataCacheEntry(db.Model):
+    """Shared tier of the link metadata cache (see pkg.metadata_cache)"""
+    __tablename__ = 'metadata_cache'
+
+    url_hash = db.Column(db.String(64), primary_key=True)  # sha256 of the normalized URL
+    url = db.Column(db.Text, nullable=False)
+    final_url = db.Column(db.Text)
+    title = db.Column(db.Text)
+    description = db.Column(db.Text)
+    image_url = db.Column(db.Text)
+    etag = db.Column(db.String(255))
+    last_modified = db.Column(db.String(64))
+    status_code = db.Column(db.Integer, nullable=False, default=200)  # Non-200 = cached failure
+    error = db.Column(db.String(255))
+    fetched_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<MetadataCacheEntry {self.url}>"
+
+class LinkArchive(db.Model):
+    """A deleted link moved out of the links table by `flask links archive` (see pkg.archive)"""
+    __tablename__ = 'links_archive'
+    __table_args__ = (
+        # Restores and incremental exports: one user's rows by deletion time
+        db.Index('ix_links_archive_user_updated', 'user_id', 'updated_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    link_id = db.Column(db.Integer, nullable=False, index=True)  # Its id in links; SQLite may hand it out again
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    title = db.Column(db.String(200), nullable=False)
+    url = db.Column(db.Text, nullable=False)
+    url_hash = db.Column(db.String(64))
+    description = db.Column(db.Text)
+    category = db.Column(db.String(50))
+    keywords = db.Column(db.Text)
+    image_url = db.Column(db.Text)
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)  # When it was deleted
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f"<LinkArchive {self.link_id} {self.title}>"
+
+class Job(db.Model):
+    """A unit of background work, claimed and run by `flask jobs worker`"""
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        db.Index('ix_jobs_status_run_after', 'status', 'run_after'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.JSON, nullable=False, default=dict)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued | running | done | failed
+    result = db.Column(db.JSON)
+    error = db.Column(db.String(255))
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    run_after = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
     def to_dict(self):
-        """Convert link to dictionary"""
+        """Convert job to dictionary"""
         return {
             'id': self.id,
-            'title': self.title,
-            'url': self.url,
-            'description': self.description,
-            'category': self.category,
-            'keywords': self.get_keywords_list(),
-            'user_id': self.user_id,
+            'kind': self.kind,
+            'status': self.status,
+            'result': self.result,
+            'error': self.error,
             'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'is_active': self.is_active
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
         }
-    
+
     def __repr__(self):
-        return f"<Link {self.title}>"
+        return f"<Job {self.id} {self.kind} {self.status}>"
 
 # Add the relationship back to User after both models are defined
-User.links = db.relationship('Link', backref='user', lazy=True, cascade='all, delete-orphan')
\ No newline at end of file
+User.links = db.relationship('Link', backref='user', lazy=True, cascade='all, delete-orphan')
+User.link_stats = db.relationship('UserLinkStats', uselist=False, lazy=True, cascade='all, delete-orphan')
+User.archived_links = db.relationship('LinkArchive', lazy='dynamic', cascade='all, delete-orphan')
+User.jobs = db.relationship('Job', lazy='dynamic', cascade='all, delete-orphan')
+User.tags = db.relationship('Tag', lazy='dynamic', cascade='all, delete-orphan')
+Link.tags = db.relationship('Tag', secondary=link_tags, lazy=True, order_by=Tag.name)
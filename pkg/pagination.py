@@ -0,0 +1,66 @@
+"""
+Keyset (cursor) pagination for link listings.
+
+Pages are ordered by (created_at DESC, id DESC) and the cursor is the sort key
+of the last row on the previous page, so fetching page N costs the same as
+fetching page 1 - there is no OFFSET to skip over.
+
+Rows from before the timestamps had defaults may have NULL there. SQLite and
+MySQL sort NULL below every date, so those rows come last, in id order; their
+cursors carry an empty timestamp.
+"""
+import base64
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+from pkg.models import Link
+
+DEFAULT_PER_PAGE = 30
+
+
+def encode_cursor(link, key='created_at'):
+    """Build an opaque cursor pointing just after `link` in `key` order"""
+    return cursor_at(getattr(link, key), link.id)
+
+
+def cursor_at(timestamp, link_id):
+    """Build an opaque cursor pointing just after the sort key (timestamp, link_id)"""
+    raw = f"{timestamp.isoformat() if timestamp is not None else ''}|{link_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor into (timestamp or None, id); raises ValueError if malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, link_id = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        return (datetime.fromisoformat(created_at) if created_at else None), int(link_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+
+def paginate_links(query, cursor=None, per_page=DEFAULT_PER_PAGE):
+    """
+    Fetch one page of `query` in newest-first order.
+    Returns (links, next_cursor); next_cursor is None on the last page.
+    """
+    if cursor:
+        created_at, link_id = decode_cursor(cursor)
+        if created_at is None:
+            query = query.filter(Link.created_at.is_(None), Link.id < link_id)
+        else:
+            query = query.filter(
+                or_(
+                    Link.created_at < created_at,
+                    and_(Link.created_at == created_at, Link.id < link_id),
+                    Link.created_at.is_(None),
+                )
+            )
+
+    # Fetch one extra row to know whether another page exists
+    links = query.order_by(Link.created_at.desc(), Link.id.desc()).limit(per_page + 1).all()
+    if len(links) > per_page:
+        links = links[:per_page]
+        return links, encode_cursor(links[-1])
+    return links, None
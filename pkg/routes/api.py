@@ -0,0 +1,268 @@
+"""
+Versioned JSON API used by dashboard.js.
+
+Listing responses carry an ETag built from the user's link "version" - the
+counter in their stats row, bumped by every write, plus the newest
+updated_at and the row count read from the (user_id, updated_at, id) index -
+and the request's own parameters. A matching If-None-Match gets a
+304 before any link rows are loaded. The same index drives /links/changes,
+the delta feed behind the dashboard's IndexedDB replica.
+"""
+import hashlib
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import Blueprint, request, jsonify, current_app, g
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import load_only
+
+from pkg.models import db, Link, UserLinkStats
+from pkg.search import search_index
+from pkg.pagination import paginate_links, encode_cursor, cursor_at, decode_cursor, DEFAULT_PER_PAGE
+from pkg.stats import get_link_stats
+from pkg.tags import filter_by_tag, tag_facets
+from pkg.link_health import HEALTH_STATUSES, broken_link_count
+from pkg.archive import archived_since
+from pkg.user_cache import load_current_user
+
+api_bp = Blueprint("api", __name__, url_prefix="/api/v1")
+
+MAX_PER_PAGE = 100
+MAX_CHANGES_PER_PAGE = 1000
+# How far back a finished sync's cursor points: changes stamped in the same
+# second as the last one sent, or committed late, are sent again next time
+CHANGES_OVERLAP = timedelta(seconds=60)
+# What the dashboard's local replica keeps for each link
+SYNC_FIELDS = ('id', 'title', 'url', 'description', 'category', 'keywords',
+               'created_at', 'updated_at', 'is_active', 'health_status', 'health_code', 'health_error')
+
+
+def api_login_required(f):
+    """Like login_required, but always answers 401 JSON instead of redirecting"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if load_current_user() is None:
+            return jsonify({'error': 'Authentication required.'}), 401
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+def links_version(user_id):
+    """Changes whenever one of the user's links is added, edited or removed"""
+    # updated_at alone misses a second write within the same second (MySQL DATETIME)
+    version = db.select(UserLinkStats.version).where(UserLinkStats.user_id == user_id).scalar_subquery()
+    latest, count, version = (
+        db.session.query(db.func.max(Link.updated_at), db.func.count(Link.id), version)
+        .filter(Link.user_id == user_id)
+        .one()
+    )
+    return f"{user_id}:{version if version is not None else '-'}:{latest.isoformat() if latest else '-'}:{count}"
+
+
+def request_etag(user_id):
+    """ETag for this request: the links version plus the normalized query string"""
+    args = '&'.join(f"{key}={value}" for key, value in sorted(request.args.items(multi=True)))
+    raw = f"{links_version(user_id)}|{request.path}|{args}"
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def not_modified(etag):
+    return etag in request.if_none_match
+
+
+def conditional_json(payload, etag):
+    response = jsonify(payload)
+    response.set_etag(etag)
+    # Clients may keep the body but must revalidate it (cheap thanks to the 304)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def _not_modified_response(etag):
+    response = current_app.response_class(status=304)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def parse_fields(raw):
+    """?fields=id,title,... -> tuple of known fields (None = all); raises ValueError"""
+    if not raw:
+        return None
+    fields = tuple(dict.fromkeys(field.strip() for field in raw.split(',') if field.strip()))
+    unknown = [field for field in fields if field not in Link.DICT_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+    return fields
+
+
+@api_bp.route("/links")
+@api_login_required
+def list_links():
+    """
+    The user's active links, newest first and keyset-paginated
+    (?cursor=), or ranked search results (?search=). Filters: ?category=,
+    ?tag=, ?health=broken. ?fields=id,title,url limits the columns loaded
+    and returned.
+    """
+    user = g.user
+    try:
+        fields = parse_fields(request.args.get('fields', ''))
+        per_page = min(int(request.args.get('limit') or current_app.config.get('LINKS_PER_PAGE', DEFAULT_PER_PAGE)),
+                       MAX_PER_PAGE)
+    except ValueError as e:
+        return jsonify({'error': str(e) or 'Invalid parameters.'}), 400
+    if per_page < 1:
+        return jsonify({'error': 'limit must be positive.'}), 400
+    selected_health = request.args.get('health', '').strip()
+    if selected_health and selected_health not in HEALTH_STATUSES:
+        return jsonify({'error': f"health must be one of: {', '.join(HEALTH_STATUSES)}."}), 400
+
+    etag = request_etag(user.id)
+    if not_modified(etag):
+        return _not_modified_response(etag)
+
+    search_term = request.args.get('search', '').strip()
+    selected_category = request.args.get('category', '').strip()
+    selected_tag = request.args.get('tag', '').strip()
+    cursor = request.args.get('cursor', '').strip() or None
+
+    query = Link.query.filter_by(user_id=user.id, is_active=True)
+    if selected_category:
+        query = query.filter(Link.category == selected_category)
+    if selected_tag:
+        query = filter_by_tag(query, user.id, selected_tag)
+    if selected_health:
+        query = query.filter(Link.health_status == selected_health)
+    if fields:
+        # id and created_at are always needed for the cursor
+        columns = {'id', 'created_at'} | set(fields)
+        query = query.options(load_only(*(getattr(Link, column) for column in columns)))
+
+    if search_term:
+        links = search_index.apply(query, user.id, search_term).all()
+        next_cursor = None
+    else:
+        try:
+            links, next_cursor = paginate_links(query, cursor=cursor, per_page=per_page)
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor.'}), 400
+
+    return conditional_json({
+        'links': [link.to_dict(fields) for link in links],
+        'next_cursor': next_cursor,
+        'count': len(links),
+    }, etag)
+
+
+@api_bp.route("/stats")
+@api_login_required
+def link_stats():
+    """Totals, per-category counts, broken links and the tag facets (?category= scopes the tags)"""
+    user = g.user
+    etag = request_etag(user.id)
+    if not_modified(etag):
+        return _not_modified_response(etag)
+
+    selected_category = request.args.get('category', '').strip()
+    stats, categories_for_filter = get_link_stats(user.id)
+    tags = tag_facets(user.id, category=selected_category or None)
+    return conditional_json({
+        'total_links': stats['total_links'],
+        'categories': stats['categories'],
+        'categories_for_filter': categories_for_filter,
+        'broken_links': broken_link_count(user.id),
+        'tags': [{'name': name, 'count': count} for name, count in tags],
+    }, etag)
+
+
+@api_bp.route("/links/changes")
+@api_login_required
+def link_changes():
+    """
+    Delta sync for the dashboard's offline replica. Without ?since= this
+    returns every active link; with it, every link created, edited or
+    soft-deleted after that cursor, oldest change first (deleted links come
+    back as {"id": ..., "is_active": false}). Keep following `cursor` while
+    `has_more` is true, then store it for the next sync. A cursor older than
+    a deletion that has since been archived or purged gets a 410: sync from
+    scratch. Part way through a sync started without since, the cursor also
+    carries when that sync began: deletions from before then can't be in the
+    replica, so only later ones count.
+
+    The cursor after the last page trails the newest change by up to
+    CHANGES_OVERLAP, so the next sync may repeat a few changes; apply them
+    by id and skip any the replica already has.
+    """
+    user = g.user
+    since = request.args.get('since', '').strip() or None
+    started = None  # When the fresh sync this page belongs to began, if it does
+    try:
+        limit = min(int(request.args.get('limit') or MAX_CHANGES_PER_PAGE), MAX_CHANGES_PER_PAGE)
+        if since and '.' in since:
+            since, started = since.split('.', 1)
+            started = decode_cursor(started)[0]
+        since_key = decode_cursor(since) if since else None
+    except ValueError as e:
+        return jsonify({'error': str(e) or 'Invalid parameters.'}), 400
+    if limit < 1:
+        return jsonify({'error': 'limit must be positive.'}), 400
+    if since_key is None:
+        started = datetime.utcnow() - CHANGES_OVERLAP  # Allow for deletions still committing
+
+    # Walks ix_links_user_updated in (updated_at, id) order
+    query = Link.query.filter(Link.user_id == user.id).options(
+        load_only(*(getattr(Link, field) for field in SYNC_FIELDS))
+    )
+    if since_key:
+        updated_at, link_id = since_key
+        checked = since_key
+        if started is not None and (updated_at is None or updated_at < started):
+            checked = (started, 0)
+        if archived_since(user.id, *checked):
+            return jsonify({'error': 'Cursor too old; sync again without since.'}), 410
+        if updated_at is None:
+            # NULL sorts first: the rest of the NULLs, then everything dated
+            query = query.filter(or_(
+                Link.updated_at.isnot(None),
+                and_(Link.updated_at.is_(None), Link.id > link_id),
+            ))
+        else:
+            query = query.filter(or_(
+                Link.updated_at > updated_at,
+                and_(Link.updated_at == updated_at, Link.id > link_id),
+            ))
+    else:
+        query = query.filter(Link.is_active.is_(True))  # A fresh replica has nothing to delete
+
+    links = query.order_by(Link.updated_at, Link.id).limit(limit + 1).all()
+    has_more = len(links) > limit
+    links = links[:limit]
+
+    changes = [
+        link.to_dict(SYNC_FIELDS) if link.is_active else {'id': link.id, 'is_active': False}
+        for link in links
+    ]
+    if has_more:
+        cursor = encode_cursor(links[-1], key='updated_at')
+        if started is not None:
+            cursor += '.' + cursor_at(started, 0)
+    else:
+        key = since_key
+        if links:
+            # Recent changes aren't settled: another one may still commit with an older updated_at
+            settled = datetime.utcnow() - CHANGES_OVERLAP
+            last = links[-1]
+            recent = last.updated_at is not None and last.updated_at > settled
+            key = (settled, 0) if recent else (last.updated_at, last.id)
+        if started is not None and (key is None or key[0] is None or key[0] < started):
+            # A fresh replica is complete up to when its sync began; older deletions never reach it
+            key = (started, 0)
+        cursor = cursor_at(*key) if key else None
+    response = jsonify({
+        'changes': changes,
+        'cursor': cursor,
+        'has_more': has_more,
+    })
+    response.headers['Cache-Control'] = 'no-store'
+    return response
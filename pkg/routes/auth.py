@@ -1,16 +1,20 @@
-from flask import Blueprint, request, redirect, url_for, flash, session
+from flask import Blueprint, request, redirect, url_for, flash, session, jsonify
 from functools import wraps
-from pkg.models import db, User
+from pkg.models import db, User, UserLinkStats
+from pkg.user_cache import load_current_user
+from pkg.hashing import password_hasher
 from sqlalchemy.exc import IntegrityError
 import re 
 
 auth_bp = Blueprint("auth", __name__, url_prefix="/auth")
 
 def login_required(f):
-    """Decorator to require login"""
+    """Decorator to require an active, logged-in user; the route finds it on g.user"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
+        if load_current_user() is None:
+            if request.is_json or request.accept_mimetypes.best == 'application/json':
+                return jsonify({'error': 'Authentication required.'}), 401
             flash('Please log in to access this page.', 'error')
             return redirect(url_for('main.index_page'))
         return f(*args, **kwargs)
@@ -44,12 +48,10 @@ def signup():
         new_user.password = password  # This will hash the password via the property setter
         
         db.session.add(new_user)
+        db.session.flush()
+        db.session.add(UserLinkStats(user_id=new_user.id, total_links=0, category_counts={}))
         db.session.commit()
-        
-        # Add debug print to verify password hashing
-        print(f"User created - Email: {email}")
-        print(f"Password hash stored: {new_user._password_hash}")
-        
+
         flash('Account created successfully.', 'success')
         return redirect(url_for('main.index_page', show_login='true'))
         
@@ -69,29 +71,25 @@ def login():
     email = request.form.get('email', '').strip().lower()
     password = request.form.get('password', '')
 
-    print(f"Login attempt - Email: {email}, Password: {password}")
-
     if not email or not password:
         flash('Email and password are required.', 'error')
         return redirect(url_for('main.index_page'))
 
     user = User.query.filter_by(email=email).first()
-    print(f"User found: {user}")
 
-    if user:
-        print(f"Stored password hash: {user._password_hash}")
-        print(f"Password check result: {user.check_password(password)}")
-        
-        # Additional debug: try to verify the hash manually
-        from werkzeug.security import check_password_hash
-        manual_check = check_password_hash(user._password_hash, password)
-        print(f"Manual password check: {manual_check}")
+    # One hash computation per attempt; unknown emails check a dummy hash so they take just as long
+    password_ok, needs_rehash = password_hasher.verify(user._password_hash if user else None, password)
 
-    if user and user.check_password(password):
+    if password_ok:
         if not user.is_active:
             flash('Your account is inactive. Please contact support.', 'error')
             return redirect(url_for('main.index_page'))
 
+        if needs_rehash:
+            # Stored with outdated parameters; the plain password is only around now
+            user.password = password
+            db.session.commit()
+
         session['user_id'] = user.id
         session['user_name'] = user.name
         flash('Login successful! Welcome back.', 'success')
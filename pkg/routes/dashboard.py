@@ -1,10 +1,21 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify, current_app
-from pkg.models import db, User, Link
+from datetime import datetime
+
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app, Response, stream_with_context, g
+from pkg.models import db, Link, Job
 from pkg.routes.auth import login_required
-from sqlalchemy import or_
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin
+from pkg.search import search_index
+from pkg.pagination import paginate_links, DEFAULT_PER_PAGE
+from pkg.tags import filter_by_tag, tag_facets
+from pkg.duplicates import find_duplicate
+from pkg.urls import canonical_url_hash
+from pkg.stats import get_link_stats, record_link_added, record_link_removed, record_category_changed
+from pkg.metadata import MetadataError, prepare_url
+from pkg.metadata_cache import metadata_cache
+from pkg.jobs import enqueue
+from pkg.importer import FORMATS, import_file
+from pkg.link_health import HEALTH_STATUSES, broken_link_count, reset_health
+from pkg.similarity import similarity_index
+from pkg import exporter
 
 dashboard_bp = Blueprint("dashboard", __name__, url_prefix="/dashboard")
 
@@ -13,15 +24,15 @@ dashboard_bp = Blueprint("dashboard", __name__, url_prefix="/dashboard")
 @login_required
 def index():
     """Dashboard main page - displays links, handles search and filter"""
-    # Get current user from session
-    user = User.query.get(session['user_id'])
-    if not user or not user.is_active:
-        flash('Please log in to access your dashboard.', 'error')
-        return redirect(url_for('main.index_page'))
+    user = g.user
     
     # Get search and filter parameters
     search_term = request.args.get('search', '').strip()
     selected_category = request.args.get('category', '').strip()
+    selected_tag = request.args.get('tag', '').strip()
+    selected_health = request.args.get('health', '').strip()
+    if selected_health not in HEALTH_STATUSES:
+        selected_health = ''
     
     # Build query for user's links
     query = Link.query.filter_by(user_id=user.id, is_active=True)
@@ -29,48 +40,29 @@ def index():
     # Apply category filter
     if selected_category:
         query = query.filter(Link.category == selected_category)
+
+    # Apply tag filter (exact tag match through link_tags)
+    if selected_tag:
+        query = filter_by_tag(query, user.id, selected_tag)
+
+    # Apply link health filter (e.g. only broken links)
+    if selected_health:
+        query = query.filter(Link.health_status == selected_health)
     
-    # Apply search filter
+    # Search results are ranked (best match first) and capped; plain listings
+    # are paged newest-first and the rest loaded on scroll through /api/v1/links
     if search_term:
-        search_filter = or_(
-            Link.title.ilike(f'%{search_term}%'),
-            Link.description.ilike(f'%{search_term}%'),
-            Link.url.ilike(f'%{search_term}%'),
-            Link.keywords.ilike(f'%{search_term}%')
-        )
-        query = query.filter(search_filter)
-    
-    # Get filtered links
-    links = query.order_by(Link.created_at.desc()).all()
-    
-    # Get unique categories for filter dropdown
-    categories_query = (
-        db.session.query(Link.category)
-        .filter_by(user_id=user.id, is_active=True)
-        .distinct()
-        .all()
-    )
-    categories_for_filter = sorted([cat[0] for cat in categories_query if cat[0]])
-    
-    # Calculate stats
-    total_links_count = Link.query.filter_by(user_id=user.id, is_active=True).count()
-    
-    category_stats = (
-        db.session.query(Link.category, db.func.count(Link.id))
-        .filter_by(user_id=user.id, is_active=True)
-        .group_by(Link.category)
-        .all()
-    )
-    
-    categories_stats_dict = {
-        cat_name or 'Uncategorized': count 
-        for cat_name, count in category_stats
-    }
+        links = search_index.apply(query, user.id, search_term).all()
+        next_cursor = None
+    else:
+        per_page = current_app.config.get('LINKS_PER_PAGE', DEFAULT_PER_PAGE)
+        links, next_cursor = paginate_links(query, per_page=per_page)
     
-    stats = {
-        'total_links': total_links_count,
-        'categories': categories_stats_dict
-    }
+    # Totals, per-category counts and filter options: one primary-key lookup
+    stats, categories_for_filter = get_link_stats(user.id)
+    # Most used tags (within the selected category) with their link counts
+    tags_for_filter = tag_facets(user.id, category=selected_category or None)
+    broken_links = broken_link_count(user.id)
 
     # Categories for modal dropdown (existing + default options)
     default_categories = ["work", "personal", "learning", "entertainment", "news", "shopping", "other"]
@@ -80,10 +72,15 @@ def index():
         "users/dashboard.html", 
         user=user, 
         links=links, 
+        next_cursor=next_cursor,
         categories_for_filter=categories_for_filter,
         stats=stats,
         search_term=search_term,
         selected_category=selected_category,
+        tags_for_filter=tags_for_filter,
+        selected_tag=selected_tag,
+        selected_health=selected_health,
+        broken_links=broken_links,
         modal_form_categories=modal_form_categories
     )
 
@@ -92,10 +89,7 @@ def index():
 @login_required
 def add_link():
     """Add a new link"""
-    user = User.query.get(session['user_id'])
-    if not user or not user.is_active:
-        flash('Please log in to add links.', 'error')
-        return redirect(url_for('main.index_page'))
+    user = g.user
         
     try:
         # Get form data
@@ -110,24 +104,48 @@ def add_link():
             flash('Title and URL are required.', 'error')
             return redirect(url_for('dashboard.index'))
 
-        # Create new link
-        new_link = Link(
-            title=title,
-            url=url,
-            description=description if description else None,
-            category=category if category else None,
-            user_id=user.id
-        )
+        # Same page already saved (tracking parameters etc. ignored)?
+        existing = find_duplicate(user.id, url)
+        if existing is not None and existing.is_active:
+            flash(f'You already saved this link as "{existing.title}".', 'info')
+            return redirect(url_for('dashboard.index'))
+
+        if existing is not None:
+            # Previously deleted: bring the old row back with the new details
+            new_link = existing
+            new_link.title = title
+            new_link.url = url
+            new_link.description = description if description else None
+            new_link.category = category if category else None
+            new_link.is_active = True
+            new_link.fetch_status = 'pending'
+            reset_health(new_link)  # Whatever it was when deleted, check it again soon
+        else:
+            # Create new link
+            new_link = Link(
+                title=title,
+                url=url,
+                url_hash=canonical_url_hash(url),
+                description=description if description else None,
+                category=category if category else None,
+                user_id=user.id,
+                fetch_status='pending'
+            )
         
         # Process keywords
-        if keywords_str:
-            keywords_list = [k.strip() for k in keywords_str.split(',') if k.strip()]
-            new_link.set_keywords_list(keywords_list)
+        keywords_list = [k.strip() for k in keywords_str.split(',') if k.strip()]
+        new_link.set_keywords_list(keywords_list)
         
         # Save to database
         db.session.add(new_link)
+        db.session.flush()  # Assigns new_link.id for the search index
+        search_index.index_link(new_link)
+        similarity_index.index_link(new_link)
+        record_link_added(user.id, new_link.category)
+        # Preview image and missing description are filled in by the job worker
+        enqueue('enrich_link', {'link_id': new_link.id, 'url': new_link.url}, user_id=user.id)
         db.session.commit()
-        flash('Link added successfully!', 'success')
+        flash('Link restored successfully!' if existing is not None else 'Link added successfully!', 'success')
         
     except Exception as e:
         db.session.rollback()
@@ -140,10 +158,7 @@ def add_link():
 @login_required
 def edit_link(link_id):
     """Edit an existing link"""
-    user = User.query.get(session['user_id'])
-    if not user or not user.is_active:
-        flash('Please log in to edit links.', 'error')
-        return redirect(url_for('main.index_page'))
+    user = g.user
         
     # Get the link (ensure it belongs to current user)
     link = Link.query.filter_by(id=link_id, user_id=user.id, is_active=True).first_or_404()
@@ -162,6 +177,17 @@ def edit_link(link_id):
             return redirect(url_for('dashboard.index'))
 
         # Update link properties
+        old_category = link.category
+        url_changed = link.url != url
+        if url_changed:
+            duplicate = find_duplicate(user.id, url, exclude_id=link.id)
+            if duplicate is not None and duplicate.is_active:
+                flash(f'Another saved link already points there: "{duplicate.title}".', 'error')
+                return redirect(url_for('dashboard.index'))
+            if duplicate is not None:
+                duplicate.url_hash = None  # A deleted copy gives up the URL
+                db.session.flush()
+            link.url_hash = canonical_url_hash(url)
         link.title = title
         link.url = url
         link.description = description if description else None
@@ -173,6 +199,13 @@ def edit_link(link_id):
             link.set_keywords_list(keywords_list)
         
         # Save changes
+        search_index.index_link(link)
+        similarity_index.index_link(link)
+        record_category_changed(user.id, old_category, link.category)
+        if url_changed:
+            link.fetch_status = 'pending'
+            reset_health(link)
+            enqueue('enrich_link', {'link_id': link.id, 'url': link.url}, user_id=user.id)
         db.session.commit()
         flash('Link updated successfully!', 'success')
         
@@ -187,10 +220,7 @@ def edit_link(link_id):
 @login_required
 def delete_link(link_id):
     """Delete a link (soft delete)"""
-    user = User.query.get(session['user_id'])
-    if not user or not user.is_active:
-        flash('Please log in to delete links.', 'error')
-        return redirect(url_for('main.index_page'))
+    user = g.user
         
     # Get the link (ensure it belongs to current user)
     link = Link.query.filter_by(id=link_id, user_id=user.id, is_active=True).first_or_404()
@@ -198,6 +228,9 @@ def delete_link(link_id):
     try:
         # Soft delete (set is_active to False)
         link.is_active = False
+        search_index.remove_link(link)
+        similarity_index.remove_link(link)
+        record_link_removed(user.id, link.category)
         db.session.commit()
         flash('Link deleted successfully.', 'success')
         
@@ -207,119 +240,204 @@ def delete_link(link_id):
     
     return redirect(url_for('dashboard.index'))
 
+@dashboard_bp.route("/import", methods=['POST'])
+@login_required
+def import_bookmarks():
+    """
+    Bulk import bookmarks from an uploaded file (field "file"): Netscape HTML
+    export, CSV or JSON lines. The optional "format" field skips detection.
+    Answers JSON when asked for it, otherwise flashes a summary.
+    """
+    user = g.user
+
+    wants_json = request.accept_mimetypes.best_match(['text/html', 'application/json']) == 'application/json'
+    upload = request.files.get('file')
+    fmt = request.form.get('format', '').strip().lower() or None
+
+    error = None
+    if not upload or not upload.filename:
+        error = 'Please choose a bookmarks file to import.'
+    elif fmt is not None and fmt not in FORMATS:
+        error = f'Unsupported format. Use one of: {", ".join(FORMATS)}.'
+    if error:
+        if wants_json:
+            return jsonify({'error': error}), 400
+        flash(error, 'error')
+        return redirect(url_for('dashboard.index'))
+
+    try:
+        result = import_file(user.id, upload.stream, fmt=fmt, filename=upload.filename)
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Import failed for user {user.id}: {str(e)}")
+        if wants_json:
+            return jsonify({'error': 'Import failed. Please check the file and try again.'}), 500
+        flash('Import failed. Please check the file and try again.', 'error')
+        return redirect(url_for('dashboard.index'))
+
+    if wants_json:
+        return jsonify(result.to_dict()), 200
+
+    message = f'Imported {result.imported} link(s).'
+    if result.restored:
+        message += f' {result.restored} of them had been deleted and are back.'
+    if result.duplicates:
+        message += f' Skipped {result.duplicates} you already had.'
+    flash(message, 'success')
+    if result.failed:
+        first = '; '.join(f"line {e['line']}: {e['error']}" for e in result.errors[:3])
+        flash(f'{result.failed} row(s) could not be imported ({first}).', 'error')
+    return redirect(url_for('dashboard.index'))
+
+
+@dashboard_bp.route("/export")
+@login_required
+def export_links():
+    """
+    Download the user's links (?format=csv|jsonl|html). The body is streamed
+    from a server-side cursor and gzip-compressed when the client accepts it.
+    ?since=<ISO 8601 or Unix time> exports only links changed since then,
+    deletions included; X-Export-Started-At is the value to pass next time.
+    """
+    user = g.user
+
+    fmt = request.args.get('format', 'csv').strip().lower()
+    if fmt not in exporter.FORMATS:
+        return jsonify({'error': f'Unsupported format. Use one of: {", ".join(exporter.FORMATS)}.'}), 400
+
+    since = None
+    if request.args.get('since', '').strip():
+        try:
+            since = exporter.parse_since(request.args['since'])
+        except ValueError:
+            return jsonify({'error': 'Invalid "since" timestamp. Use ISO 8601 or Unix seconds.'}), 400
+    if since is not None and fmt == 'html':
+        return jsonify({'error': 'Incremental exports are only available as csv or jsonl.'}), 400
+
+    started_at = datetime.utcnow()
+    gzip = 'gzip' in request.accept_encodings
+    mimetype, extension = exporter.FORMATS[fmt]
+    body = exporter.export_links(user.id, fmt, since=since, gzip=gzip)
+
+    response = Response(stream_with_context(body), mimetype=mimetype)
+    response.headers['Content-Disposition'] = (
+        f'attachment; filename="linksaver-{started_at:%Y%m%d-%H%M%S}.{extension}"'
+    )
+    response.headers['X-Export-Started-At'] = started_at.isoformat() + 'Z'
+    response.headers['Cache-Control'] = 'no-store'
+    response.vary.add('Accept-Encoding')
+    if gzip:
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
 @dashboard_bp.route("/fetch-metadata", methods=['POST'])
 @login_required
 def fetch_metadata_for_url():
     """
     Fetches metadata (title, description, image) for a given URL.
-    Accepts a JSON payload with a "url" key.
+    Accepts a JSON payload with a "url" key. Served from the metadata cache
+    when possible.
     """
-    user = User.query.get(session['user_id'])
-    if not user or not user.is_active:
-        return jsonify({'error': 'Authentication required.'}), 401
+    user = g.user
 
-    data = request.get_json()
+    data = request.get_json(silent=True) or {}
     url_to_fetch = data.get('url')
 
-    if not url_to_fetch:
-        return jsonify({'error': 'URL is required.'}), 400
-
     try:
-        # Basic scheme validation/addition
-        if not (url_to_fetch.startswith('http://') or url_to_fetch.startswith('https://')):
-            # Check if it looks like a domain before prepending http, to avoid http://my search term
-            if '.' not in url_to_fetch.split('/')[0] or ' ' in url_to_fetch:
-                 return jsonify({'error': 'Invalid URL format. Please provide a full URL like https://example.com'}), 400
-            url_to_fetch = 'https://' + url_to_fetch # Default to https
-        
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36 LinkSaverClient/1.0',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.9'
-        }
-        # Using a session for potential cookie handling and connection pooling if multiple requests were made
-        with requests.Session() as s:
-            response = s.get(url_to_fetch, headers=headers, timeout=10, allow_redirects=True)
-        
-        response.raise_for_status() # Raise HTTPError for bad responses (4xx or 5xx)
+        url_to_fetch = prepare_url(url_to_fetch)
+        metadata = metadata_cache.get(url_to_fetch)
+        return jsonify({
+            'title': metadata['title'],
+            'description': metadata['description'],
+            'image_url': metadata['image_url']
+        }), 200
 
-        content_type = response.headers.get('content-type', '').lower()
-        if 'html' not in content_type:
-            return jsonify({'error': 'URL does not point to an HTML page.'}), 400
+    except MetadataError as e:
+        return jsonify({'error': e.message}), e.status_code
+    except Exception as e:
+        current_app.logger.error(f"Unexpected error fetching metadata for {url_to_fetch}: {str(e)}")
+        return jsonify({'error': 'An unexpected error occurred while parsing metadata.'}), 500
 
-        soup = BeautifulSoup(response.content, 'lxml') # Use lxml; fall back to 'html.parser' if lxml not installed
 
-        metadata = {
-            'title': '',
-            'description': '',
-            'image_url': ''
-        }
+@dashboard_bp.route("/links/suggest", methods=['POST'])
+@login_required
+def suggest_for_link():
+    """
+    Similar saved links plus a suggested category and keywords for what is
+    being typed into the link modal. Accepts a JSON payload with any of
+    "url", "title", "description", "keywords" and, when editing, "link_id".
+    """
+    user = g.user
 
-        # Fetch Title (Order: <title>, og:title, twitter:title)
-        if soup.title and soup.title.string:
-            metadata['title'] = soup.title.string.strip()
-        
-        if not metadata['title']:
-            og_title = soup.find('meta', property='og:title')
-            if og_title and og_title.get('content'):
-                metadata['title'] = og_title['content'].strip()
-        
-        if not metadata['title']:
-            twitter_title = soup.find('meta', attrs={'name': 'twitter:title'})
-            if twitter_title and twitter_title.get('content'):
-                metadata['title'] = twitter_title['content'].strip()
-
-        # Fetch Description (Order: meta description, og:description, twitter:description)
-        meta_description = soup.find('meta', attrs={'name': 'description'})
-        if meta_description and meta_description.get('content'):
-            metadata['description'] = meta_description['content'].strip()
-        
-        if not metadata['description']:
-            og_description = soup.find('meta', property='og:description')
-            if og_description and og_description.get('content'):
-                metadata['description'] = og_description['content'].strip()
-        
-        if not metadata['description']:
-            twitter_description = soup.find('meta', attrs={'name': 'twitter:description'})
-            if twitter_description and twitter_description.get('content'):
-                metadata['description'] = twitter_description['content'].strip()
-        
-        # Fetch Image URL (Order: og:image, twitter:image, apple-touch-icon, icon)
-        image_url_found = None
-        og_image = soup.find('meta', property='og:image')
-        if og_image and og_image.get('content'):
-            image_url_found = og_image['content']
-        
-        if not image_url_found:
-            twitter_image = soup.find('meta', attrs={'name': 'twitter:image'})
-            if twitter_image and twitter_image.get('content'):
-                image_url_found = twitter_image['content']
-        
-        if not image_url_found:
-            # Check for apple-touch-icon (often higher quality than favicon)
-            apple_icon = soup.find('link', rel='apple-touch-icon')
-            if apple_icon and apple_icon.get('href'):
-                image_url_found = apple_icon['href']
-        
-        if not image_url_found:
-            # Fallback to generic icon
-            icon_link = soup.find('link', rel='icon')
-            if icon_link and icon_link.get('href'):
-                image_url_found = icon_link['href']
-
-        if image_url_found:
-            # Resolve relative URL to absolute using the final URL after redirects
-            metadata['image_url'] = urljoin(response.url, image_url_found.strip())
-
-        return jsonify(metadata), 200
-
-    except requests.exceptions.Timeout:
-        return jsonify({'error': 'Fetching URL timed out.'}), 408
-    except requests.exceptions.TooManyRedirects:
-        return jsonify({'error': 'Too many redirects for the URL.'}), 400
-    except requests.exceptions.RequestException as e:
-        current_app.logger.warning(f"RequestException fetching metadata for {url_to_fetch}: {str(e)}")
-        return jsonify({'error': f'Could not fetch URL. Please check the address and try again.'}), 400
+    data = request.get_json(silent=True) or {}
+    fields = {}
+    for name in ('url', 'title', 'description', 'keywords'):
+        value = data.get(name)
+        fields[name] = value.strip()[:2000] if isinstance(value, str) else None
+    link_id = data.get('link_id')
+    if link_id is not None and not isinstance(link_id, int):
+        return jsonify({'error': 'link_id must be an integer.'}), 400
+
+    return jsonify(similarity_index.suggest(user.id, exclude_id=link_id, **fields)), 200
+
+
+@dashboard_bp.route("/fetch-metadata/batch", methods=['POST'])
+@login_required
+def fetch_metadata_batch():
+    """
+    Queue metadata fetches for several URLs at once.
+    Accepts a JSON payload with a "urls" list and returns one job ID per URL;
+    poll dashboard.job_status for the results.
+    """
+    user = g.user
+
+    data = request.get_json(silent=True) or {}
+    urls = data.get('urls')
+    max_urls = current_app.config.get('METADATA_BATCH_MAX_URLS', 50)
+
+    if not isinstance(urls, list) or not urls:
+        return jsonify({'error': 'A non-empty "urls" list is required.'}), 400
+    if len(urls) > max_urls:
+        return jsonify({'error': f'At most {max_urls} URLs can be fetched per batch.'}), 400
+
+    entries, queued = [], []
+    for raw_url in urls:
+        try:
+            url_to_fetch = prepare_url(raw_url if isinstance(raw_url, str) else '')
+        except MetadataError as e:
+            entries.append({'url': raw_url, 'job_id': None, 'error': e.message})
+            continue
+        job = enqueue('fetch_metadata', {'url': url_to_fetch}, user_id=user.id)
+        entries.append({'url': raw_url, 'job_id': None})
+        queued.append((entries[-1], job))
+
+    try:
+        db.session.commit()
     except Exception as e:
-        current_app.logger.error(f"Unexpected error fetching metadata for {url_to_fetch}: {str(e)}")
-        return jsonify({'error': 'An unexpected error occurred while parsing metadata.'}), 500
\ No newline at end of file
+        db.session.rollback()
+        current_app.logger.error(f"Could not queue metadata batch: {str(e)}")
+        return jsonify({'error': 'Could not queue the batch. Please try again.'}), 500
+
+    for entry, job in queued:
+        entry['job_id'] = job.id
+    return jsonify({'jobs': entries}), 202
+
+
+@dashboard_bp.route("/jobs")
+@login_required
+def job_status():
+    """Status and results of the current user's background jobs (?ids=1,2,3)"""
+    user = g.user
+
+    try:
+        job_ids = [int(job_id) for job_id in request.args.get('ids', '').split(',') if job_id.strip()]
+    except ValueError:
+        return jsonify({'error': 'Job IDs must be integers.'}), 400
+    if not job_ids:
+        return jsonify({'error': 'At least one job ID is required.'}), 400
+    if len(job_ids) > 100:
+        return jsonify({'error': 'At most 100 jobs can be polled at once.'}), 400
+
+    jobs = Job.query.filter(Job.id.in_(job_ids), Job.user_id == user.id).all()
+    return jsonify({'jobs': [job.to_dict() for job in jobs]}), 200
@@ -0,0 +1,426 @@
+"""
+Full-text search over a user's links.
+
+The search index is pluggable so every environment gets an indexed lookup
+instead of a leading-wildcard ILIKE scan:
+
+- ``mysql``  - InnoDB FULLTEXT index on links(title, description, url, keywords)
+- ``sqlite`` - FTS5 virtual table ``links_fts`` kept in sync by the routes
+- ``memory`` - per-process inverted index, used when neither is available
+
+All backends support ranked results, prefix matching and multi-term AND
+queries. The backend only narrows and orders the query; the caller's filters
+(user, is_active, category) still apply, so a stale index entry can never
+surface a link the user shouldn't see.
+"""
+import re
+import threading
+import time
+from bisect import bisect_left
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import case, text
+from sqlalchemy.dialects.mysql import match
+from sqlalchemy.engine import make_url
+
+from pkg.models import db, Link
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+MAX_QUERY_TERMS = 8
+
+search_cli = AppGroup("search", help="Manage the link search index.")
+
+
+def tokenize(value):
+    """Split text into lowercase search tokens"""
+    if not value:
+        return []
+    return [token.lower() for token in TOKEN_RE.findall(value)]
+
+
+def parse_query(search_term):
+    """Turn a raw search box value into a de-duplicated list of AND terms"""
+    terms = []
+    for token in tokenize(search_term):
+        if token not in terms:
+            terms.append(token)
+    return terms[:MAX_QUERY_TERMS]
+
+
+class SearchBackend:
+    """Interface every search backend implements"""
+
+    name = None
+
+    def apply(self, query, user_id, terms, limit):
+        """Restrict `query` to links matching all `terms`, best match first"""
+        raise NotImplementedError
+
+    def index_link(self, link):
+        """Add or refresh a link in the index (call after flush, before commit)"""
+
+    def index_links(self, links):
+        """index_link for many links at once (an import batch)"""
+        for link in links:
+            self.index_link(link)
+
+    def remove_link(self, link):
+        """Drop a link from the index"""
+
+    def reindex_user(self, user_id):
+        """Refresh every indexed link belonging to one user"""
+
+    def rebuild(self):
+        """Rebuild the whole index from the links table"""
+
+
+class MySQLFulltextBackend(SearchBackend):
+    """InnoDB FULLTEXT search; the index is maintained by MySQL itself"""
+
+    name = "mysql"
+
+    def apply(self, query, user_id, terms, limit):
+        # Boolean mode: "+term*" makes every term required and prefix-matched
+        against = " ".join(f"+{term}*" for term in terms)
+        score = match(Link.title, Link.description, Link.url, Link.keywords,
+                      against=against).in_boolean_mode()
+        return query.filter(score).order_by(score.desc(), Link.created_at.desc()).limit(limit)
+
+
+class SQLiteFTSBackend(SearchBackend):
+    """SQLite FTS5 search against the ``links_fts`` virtual table"""
+
+    name = "sqlite"
+
+    # Column weights for bm25(): title, description, url, keywords
+    WEIGHTS = "10.0, 2.0, 1.0, 5.0"
+
+    def apply(self, query, user_id, terms, limit):
+        # Quoted terms with a trailing * are prefix queries; juxtaposition is AND
+        fts_query = " ".join(f'"{term}"*' for term in terms)
+        fts = (
+            text(
+                f"SELECT rowid AS link_id, bm25(links_fts, {self.WEIGHTS}) AS score "
+                "FROM links_fts WHERE links_fts MATCH :fts_query AND user_id = :fts_user_id"
+            )
+            .bindparams(fts_query=fts_query, fts_user_id=user_id)
+            .columns(link_id=db.Integer, score=db.Float)
+            .subquery("fts")
+        )
+        # bm25() is negative; the more negative the better the match
+        return (
+            query.join(fts, fts.c.link_id == Link.id)
+            .order_by(fts.c.score, Link.created_at.desc())
+            .limit(limit)
+        )
+
+    def index_link(self, link):
+        self.remove_link(link)
+        if link.is_active:
+            db.session.execute(
+                text(
+                    "INSERT INTO links_fts (rowid, user_id, title, description, url, keywords) "
+                    "VALUES (:id, :user_id, :title, :description, :url, :keywords)"
+                ),
+                {
+                    'id': link.id,
+                    'user_id': link.user_id,
+                    'title': link.title,
+                    'description': link.description or '',
+                    'url': link.url,
+                    'keywords': link.keywords or '',
+                },
+            )
+
+    def index_links(self, links):
+        if not links:
+            return
+        db.session.execute(text("DELETE FROM links_fts WHERE rowid = :id"), [{'id': link.id} for link in links])
+        rows = [
+            {
+                'id': link.id,
+                'user_id': link.user_id,
+                'title': link.title,
+                'description': link.description or '',
+                'url': link.url,
+                'keywords': link.keywords or '',
+            }
+            for link in links if link.is_active
+        ]
+        if rows:
+            db.session.execute(
+                text(
+                    "INSERT INTO links_fts (rowid, user_id, title, description, url, keywords) "
+                    "VALUES (:id, :user_id, :title, :description, :url, :keywords)"
+                ),
+                rows,
+            )
+
+    def remove_link(self, link):
+        db.session.execute(text("DELETE FROM links_fts WHERE rowid = :id"), {'id': link.id})
+
+    def reindex_user(self, user_id):
+        db.session.execute(text("DELETE FROM links_fts WHERE user_id = :user_id"), {'user_id': user_id})
+        db.session.execute(
+            text(
+                "INSERT INTO links_fts (rowid, user_id, title, description, url, keywords) "
+                "SELECT id, user_id, title, COALESCE(description, ''), url, COALESCE(keywords, '') "
+                "FROM links WHERE user_id = :user_id AND is_active = 1"
+            ),
+            {'user_id': user_id},
+        )
+
+    def rebuild(self):
+        db.session.execute(text("DELETE FROM links_fts"))
+        db.session.execute(
+            text(
+                "INSERT INTO links_fts (rowid, user_id, title, description, url, keywords) "
+                "SELECT id, user_id, title, COALESCE(description, ''), url, COALESCE(keywords, '') "
+                "FROM links WHERE is_active = 1"
+            )
+        )
+
+
+class _UserIndex:
+    """Inverted index for a single user's links"""
+
+    # Field weights used for ranking
+    FIELDS = (('title', 3), ('keywords', 2), ('description', 1), ('url', 1))
+
+    def __init__(self):
+        self.postings = {}  # token -> {link_id: weight}
+        self.documents = {}  # link_id -> set of tokens
+        self.sorted_tokens = []
+        self.dirty = False
+        self.loaded_at = time.monotonic()
+
+    def add(self, link_id, fields):
+        self.remove(link_id)
+        weights = {}
+        for field, weight in self.FIELDS:
+            for token in tokenize(fields.get(field)):
+                weights[token] = weights.get(token, 0) + weight
+        for token, weight in weights.items():
+            self.postings.setdefault(token, {})[link_id] = weight
+        self.documents[link_id] = set(weights)
+        self.dirty = True
+
+    def remove(self, link_id):
+        for token in self.documents.pop(link_id, ()):
+            posting = self.postings.get(token)
+            if posting is not None:
+                posting.pop(link_id, None)
+                if not posting:
+                    del self.postings[token]
+        self.dirty = True
+
+    def _tokens_with_prefix(self, prefix):
+        if self.dirty:
+            self.sorted_tokens = sorted(self.postings)
+            self.dirty = False
+        position = bisect_left(self.sorted_tokens, prefix)
+        while position < len(self.sorted_tokens) and self.sorted_tokens[position].startswith(prefix):
+            yield self.sorted_tokens[position]
+            position += 1
+
+    def search(self, terms, limit=None):
+        """Ids of links matching every term, best first (all of them unless `limit`)"""
+        scores = None
+        for term in terms:
+            term_scores = {}
+            for token in self._tokens_with_prefix(term):
+                # Exact matches rank above prefix matches
+                boost = 2 if token == term else 1
+                for link_id, weight in self.postings[token].items():
+                    term_scores[link_id] = max(term_scores.get(link_id, 0), weight * boost)
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {link_id: score + term_scores[link_id]
+                          for link_id, score in scores.items() if link_id in term_scores}
+            if not scores:
+                return []
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], -item[0]))
+        return [link_id for link_id, _ in ranked[:limit]]  # [:None] keeps them all
+
+
+class InMemoryBackend(SearchBackend):
+    """
+    Process-local inverted index, loaded lazily per user.
+
+    Each worker process holds its own copy, so entries are reloaded after
+    SEARCH_MEMORY_TTL seconds to pick up writes made by other workers.
+    """
+
+    name = "memory"
+
+    FILTER_CHUNK = 500  # Ranked ids checked against the caller's filters per query
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._users = {}
+        self._lock = threading.Lock()
+
+    def _fields(self, link):
+        return {
+            'title': link.title,
+            'description': link.description,
+            'url': link.url,
+            'keywords': link.keywords,
+        }
+
+    def _load_user(self, user_id):
+        index = _UserIndex()
+        rows = (
+            db.session.query(Link.id, Link.title, Link.description, Link.url, Link.keywords)
+            .filter_by(user_id=user_id, is_active=True)
+            .yield_per(1000)
+        )
+        for row in rows:
+            index.add(row.id, row._asdict())
+        return index
+
+    def _user_index(self, user_id):
+        with self._lock:
+            index = self._users.get(user_id)
+            if index is not None and time.monotonic() - index.loaded_at < self.ttl:
+                return index
+        index = self._load_user(user_id)
+        with self._lock:
+            self._users[user_id] = index
+        return index
+
+    def apply(self, query, user_id, terms, limit):
+        index = self._user_index(user_id)
+        with self._lock:
+            ranked = index.search(terms)
+        # The caller's filters (category, tag, health) come first, the limit after them: walk
+        # the ranking a chunk at a time until `limit` matches pass the filters
+        link_ids = []
+        for start in range(0, len(ranked), self.FILTER_CHUNK):
+            chunk = ranked[start:start + self.FILTER_CHUNK]
+            passing = {row.id for row in query.with_entities(Link.id).filter(Link.id.in_(chunk))}
+            link_ids.extend(link_id for link_id in chunk if link_id in passing)
+            if len(link_ids) >= limit:
+                break
+        link_ids = link_ids[:limit]
+        if not link_ids:
+            return query.filter(db.false())
+        rank = case({link_id: position for position, link_id in enumerate(link_ids)}, value=Link.id)
+        return query.filter(Link.id.in_(link_ids)).order_by(rank).limit(limit)
+
+    def index_link(self, link):
+        with self._lock:
+            index = self._users.get(link.user_id)
+            if index is None:
+                return  # Loaded from the database on first search
+            if link.is_active:
+                index.add(link.id, self._fields(link))
+            else:
+                index.remove(link.id)
+
+    def remove_link(self, link):
+        with self._lock:
+            index = self._users.get(link.user_id)
+            if index is not None:
+                index.remove(link.id)
+
+    def reindex_user(self, user_id):
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def rebuild(self):
+        with self._lock:
+            self._users.clear()
+
+
+def sqlite_has_fts5(app):
+    """Check whether the configured SQLite build ships FTS5 and links_fts exists"""
+    with app.app_context():
+        try:
+            db.session.execute(text("SELECT rowid FROM links_fts LIMIT 0"))
+            return True
+        except Exception:
+            db.session.rollback()
+            return False
+
+
+class SearchIndex:
+    """Flask extension that picks and fronts the configured search backend"""
+
+    def __init__(self, app=None):
+        self._backends = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SEARCH_BACKEND', 'auto')  # auto | mysql | sqlite | memory
+        app.config.setdefault('SEARCH_RESULT_LIMIT', 200)
+        app.config.setdefault('SEARCH_MEMORY_TTL', 300)
+        app.extensions['search_index'] = self
+        app.cli.add_command(search_cli)
+
+    def _create_backend(self, app):
+        choice = app.config['SEARCH_BACKEND']
+        if choice == 'auto':
+            dialect = make_url(app.config['SQLALCHEMY_DATABASE_URI']).get_backend_name()
+            if dialect == 'mysql':
+                choice = 'mysql'
+            elif dialect == 'sqlite' and sqlite_has_fts5(app):
+                choice = 'sqlite'
+            else:
+                choice = 'memory'
+
+        if choice == 'mysql':
+            return MySQLFulltextBackend()
+        if choice == 'sqlite':
+            return SQLiteFTSBackend()
+        if choice == 'memory':
+            return InMemoryBackend(ttl=app.config['SEARCH_MEMORY_TTL'])
+        raise ValueError(f"Unknown SEARCH_BACKEND: {choice}")
+
+    @property
+    def backend(self):
+        app = current_app._get_current_object()
+        backend = self._backends.get(app)
+        if backend is None:
+            backend = self._backends[app] = self._create_backend(app)
+        return backend
+
+    def apply(self, query, user_id, search_term, limit=None):
+        """Filter `query` to links matching `search_term`, ranked best first"""
+        terms = parse_query(search_term)
+        if not terms:
+            return query.order_by(Link.created_at.desc())
+        if limit is None:
+            limit = current_app.config['SEARCH_RESULT_LIMIT']
+        return self.backend.apply(query, user_id, terms, limit)
+
+    def index_link(self, link):
+        self.backend.index_link(link)
+
+    def index_links(self, links):
+        self.backend.index_links(links)
+
+    def remove_link(self, link):
+        self.backend.remove_link(link)
+
+    def reindex_user(self, user_id):
+        self.backend.reindex_user(user_id)
+
+    def rebuild(self):
+        self.backend.rebuild()
+
+
+search_index = SearchIndex()
+
+
+@search_cli.command("rebuild")
+def rebuild_command():
+    """Rebuild the search index from the links table."""
+    backend = search_index.backend
+    search_index.rebuild()
+    db.session.commit()
+    click.echo(f"Rebuilt {backend.name} search index.")
@@ -0,0 +1,277 @@
+"""
+"Similar pages you already saved" for the add-link modal.
+
+Every link gets a MinHash signature over its words - title, description,
+keywords and URL path - plus its host, so two links with largely the same
+words get largely the same signature. The signature is cut into LSH bands
+and each band's hash goes into link_similarity_bands under (user_id,
+band_key). Finding a page's neighbours is then one indexed lookup: the
+links sharing the most band keys with it, joined to their rows. Candidates
+are ranked by the estimated Jaccard similarity of the full signatures, and
+their categories and keywords, weighted by that similarity, become the
+suggestions for the new link.
+
+The index is kept up to date where the search index is: the link routes,
+dedupe and restore. Imports and links from before the index existed are
+indexed in the background ('index_similarity' jobs, or
+`flask links similarity-index`). Changing NUM_HASHES, BANDS or SEED makes
+every stored signature meaningless: run `flask links similarity-index
+--rebuild` afterwards.
+"""
+import random
+from array import array
+from hashlib import blake2b
+from urllib.parse import urlsplit
+
+import click
+from flask import current_app
+
+from pkg.models import db, Link, link_similarity_bands
+from pkg.cli import links_cli
+from pkg.jobs import job_handler
+from pkg.search import tokenize
+from pkg.tags import split_keywords
+
+NUM_HASHES = 32
+BANDS = 16  # Of NUM_HASHES // BANDS rows: pages from about 25% alike tend to share a band
+SEED = 20261018
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_DESCRIPTION_TOKENS = 60  # Long descriptions would drown out the title
+STOPWORDS = frozenset(
+    'a about all an and are as at be but by can do for from has have how if in into is it its my not of on or '
+    'our so than that the this to was we were what when why will with you your '
+    'www com org net html htm php index amp'.split()
+)
+ROWS = NUM_HASHES // BANDS
+
+_random = random.Random(SEED)
+_PERMUTATIONS = [(_random.randrange(1, MERSENNE_PRIME), _random.randrange(0, MERSENNE_PRIME))
+                 for _ in range(NUM_HASHES)]
+
+
+def link_features(title=None, description=None, keywords=None, url=None):
+    """The set of words (and the host) a link's signature is built from"""
+    words = tokenize(title) + tokenize(description)[:MAX_DESCRIPTION_TOKENS]
+    for keyword in split_keywords(keywords):
+        words.extend(tokenize(keyword))
+    features = set()
+    if url:
+        try:
+            parts = urlsplit(url if '//' in url else f"//{url}")
+            host = (parts.hostname or '').removeprefix('www.')
+        except ValueError:
+            parts, host = None, ''
+        if host:
+            features.add(f"host:{host}")
+        if parts is not None:
+            words.extend(tokenize(parts.path.replace('_', ' ')))
+    for word in words:
+        if len(word) > 1 and word not in STOPWORDS and not word.isdigit():
+            features.add(word)
+    return features
+
+
+def minhash(features):
+    """NUM_HASHES-value MinHash signature of a feature set, or None for an empty one"""
+    if not features:
+        return None
+    signature = [MERSENNE_PRIME] * NUM_HASHES
+    for feature in features:
+        value = int.from_bytes(blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'big')
+        signature = [min(current, (a * value + b) % MERSENNE_PRIME)
+                     for current, (a, b) in zip(signature, _PERMUTATIONS)]
+    return array('I', (value & 0xFFFFFFFF for value in signature))
+
+
+def pack(signature):
+    return signature.tobytes() if signature is not None else None
+
+
+def unpack(data):
+    if not data:
+        return None
+    signature = array('I')
+    signature.frombytes(data)
+    return signature if len(signature) == NUM_HASHES else None  # Older layout: not comparable
+
+
+def band_keys(signature):
+    """One signed 64-bit key per band; equal keys mean the band's values all match"""
+    keys = []
+    for band in range(BANDS):
+        values = signature[band * ROWS:(band + 1) * ROWS]
+        digest = blake2b(band.to_bytes(2, 'big') + values.tobytes(), digest_size=8).digest()
+        keys.append(int.from_bytes(digest, 'big', signed=True))
+    return keys
+
+
+def estimate_similarity(first, second):
+    """Estimated Jaccard similarity: the share of signature values that match"""
+    return sum(1 for a, b in zip(first, second) if a == b) / NUM_HASHES
+
+
+def link_signature(link):
+    return minhash(link_features(link.title, link.description, link.keywords, link.url))
+
+
+class SimilarityIndex:
+    """Flask extension maintaining the LSH bands and answering similarity lookups"""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SIMILAR_LINKS_LIMIT', 5)  # Similar links shown in the add-link modal
+        app.config.setdefault('SIMILARITY_CANDIDATES', 50)  # Band matches ranked per lookup
+        app.config.setdefault('SIMILARITY_MIN', 0.2)  # Estimated Jaccard below this isn't "similar"
+        app.config.setdefault('SIMILARITY_NEAR_DUPLICATE', 0.85)  # At or above this, flagged as a near duplicate
+        app.config.setdefault('SIMILARITY_BATCH_SIZE', 500)  # Links indexed per transaction by the backfill
+        app.extensions['similarity_index'] = self
+
+    # Maintenance (none of these commit)
+
+    def index_links(self, links):
+        """(Re)compute signatures and bands for links that have ids; inactive ones are dropped"""
+        if not links:
+            return
+        self.remove_links([link.id for link in links])
+        rows = []
+        for link in links:
+            signature = link_signature(link)
+            link.similarity_signature = pack(signature)
+            if signature is not None and link.is_active:
+                rows.extend({'user_id': link.user_id, 'band_key': key, 'link_id': link.id}
+                            for key in set(band_keys(signature)))
+        if rows:
+            db.session.execute(link_similarity_bands.insert(), rows)
+
+    def index_link(self, link):
+        self.index_links([link])
+
+    def remove_links(self, link_ids):
+        if link_ids:
+            db.session.execute(link_similarity_bands.delete().where(link_similarity_bands.c.link_id.in_(link_ids)))
+
+    def remove_link(self, link):
+        self.remove_links([link.id])
+
+    # Lookups
+
+    def similar(self, user_id, title=None, description=None, keywords=None, url=None, exclude_id=None, limit=None):
+        """
+        The user's active links most like the given fields, best first, as
+        [(similarity, row)] with rows carrying id, title, url, category and
+        keywords. One query: band matches counted on the index, then joined.
+        """
+        config = current_app.config
+        signature = minhash(link_features(title, description, keywords, url))
+        if signature is None:
+            return []
+
+        bands = link_similarity_bands
+        matches = (
+            db.select(bands.c.link_id, db.func.count().label('shared'))
+            .where(bands.c.user_id == user_id, bands.c.band_key.in_(set(band_keys(signature))))
+            .group_by(bands.c.link_id)
+            .order_by(db.desc('shared'))
+            .limit(config['SIMILARITY_CANDIDATES'])
+            .subquery()
+        )
+        query = (
+            db.session.query(Link.id, Link.title, Link.url, Link.category, Link.keywords,
+                             Link.similarity_signature)
+            .join(matches, matches.c.link_id == Link.id)
+            .filter(Link.is_active.is_(True))
+        )
+        if exclude_id is not None:
+            query = query.filter(Link.id != exclude_id)
+
+        ranked = []
+        for row in query:
+            stored = unpack(row.similarity_signature)
+            if stored is None:
+                continue
+            similarity = estimate_similarity(signature, stored)
+            if similarity >= config['SIMILARITY_MIN']:
+                ranked.append((similarity, row))
+        ranked.sort(key=lambda pair: (-pair[0], -pair[1].id))
+        return ranked[:limit or config['SIMILAR_LINKS_LIMIT']]
+
+    def suggest(self, user_id, title=None, description=None, keywords=None, url=None, exclude_id=None):
+        """Similar links plus a category and keywords voted for by them, weighted by similarity"""
+        config = current_app.config
+        ranked = self.similar(user_id, title, description, keywords, url, exclude_id,
+                              limit=config['SIMILARITY_CANDIDATES'])
+
+        category_votes, keyword_votes, spelling = {}, {}, {}
+        typed = {keyword.lower() for keyword in split_keywords(keywords)}
+        for similarity, row in ranked:
+            if row.category:
+                category_votes[row.category] = category_votes.get(row.category, 0) + similarity
+            for keyword in split_keywords(row.keywords):
+                key = keyword.lower()
+                if key not in typed:
+                    keyword_votes[key] = keyword_votes.get(key, 0) + similarity
+                    spelling.setdefault(key, keyword)
+
+        near_duplicate = config['SIMILARITY_NEAR_DUPLICATE']
+        return {
+            'similar': [
+                {
+                    'id': row.id,
+                    'title': row.title,
+                    'url': row.url,
+                    'category': row.category,
+                    'similarity': round(similarity, 2),
+                    'near_duplicate': similarity >= near_duplicate,
+                }
+                for similarity, row in ranked[:config['SIMILAR_LINKS_LIMIT']]
+            ],
+            'category': max(category_votes, key=category_votes.get) if category_votes else None,
+            'keywords': [spelling[key] for key in sorted(keyword_votes, key=keyword_votes.get, reverse=True)[:5]],
+        }
+
+
+similarity_index = SimilarityIndex()
+
+
+def index_missing(user_id=None, rebuild=False, batch_size=None, progress=None):
+    """
+    Index active links that have no signature yet (every active link with
+    `rebuild`), in id order, committing per batch. Returns how many.
+    """
+    batch_size = batch_size or current_app.config['SIMILARITY_BATCH_SIZE']
+    query = Link.query.filter(Link.is_active.is_(True))
+    if user_id is not None:
+        query = query.filter(Link.user_id == user_id)
+    if not rebuild:
+        query = query.filter(Link.similarity_signature.is_(None))
+
+    count, last_id = 0, 0
+    while True:
+        links = query.filter(Link.id > last_id).order_by(Link.id).limit(batch_size).all()
+        if not links:
+            break
+        similarity_index.index_links(links)
+        db.session.commit()
+        count += len(links)
+        last_id = links[-1].id
+        if progress:
+            progress(count)
+    return count
+
+
+@job_handler('index_similarity')
+def index_similarity_job(job):
+    """Index a user's links that have no similarity signature yet (queued after imports)"""
+    return {'indexed': index_missing(job.user_id)}
+
+
+@links_cli.command("similarity-index")
+@click.option("--user-id", type=int, default=None, help="Only this user's links.")
+@click.option("--rebuild", is_flag=True, help="Recompute every signature, not just missing ones.")
+def similarity_index_command(user_id, rebuild):
+    """Build the similar-links index for links that aren't in it yet."""
+    count = index_missing(user_id, rebuild=rebuild, progress=lambda total: click.echo(f"  {total} indexed..."))
+    click.echo(f"Indexed {count} link(s).")
@@ -1,12 +1,29 @@
 "use strict";
 
+// Dashboard filters, as named in the page URL and the API query string
+const FILTER_KEYS = ["search", "category", "tag", "health"];
+
 class LinkSaver {
   constructor() {
     this.currentLinkDataForModal = null; // Store data of the link being viewed/edited
     this.metadataFetchController = null; // For aborting previous fetch requests
+    this.suggestController = null; // Aborts a superseded similar-links request
+    this.editingLinkId = null; // Left out of its own similar links
     this.initializeEventListeners();
     this.autoDismissServerFlashMessages();
-    this.initLazyLoadObserver(); // For potential future image previews or heavy content
+    this.isLoadingNextPage = false;
+    this.filterController = null; // Aborts a superseded search/filter request
+    this.filters = {
+      search: appConfig.searchTerm || "",
+      category: appConfig.selectedCategory || "",
+      tag: appConfig.selectedTag || "",
+      health: appConfig.selectedHealth || "",
+    };
+    this.initLazyLoadObserver(); // Infinite scroll: loads the next page of links
+    this.initializeFiltering(); // Search and filters through the JSON API
+    this.replica = null; // Local IndexedDB copy of the links, once synced
+    this.localResults = null; // Current local query results, paged into the grid
+    this.initializeReplica(); // Instant search from the local copy
     this.initializeMetadataFetching(); // For URL input blur
     this.initializeUserOverrideListeners(); // For title/description inputs
   }
@@ -74,6 +91,13 @@ class LinkSaver {
         const linkCard = e.target.closest(".link-card");
         if (!linkCard) return;
 
+        const tagLink = e.target.closest("a.keyword-tag");
+        if (tagLink) {
+          e.preventDefault();
+          this.applyFilters({ ...this.filters, tag: tagLink.dataset.tag });
+          return;
+        }
+
         this.currentLinkDataForModal = {
           id: linkCard.dataset.id,
           url: linkCard.dataset.url,
@@ -99,13 +123,6 @@ class LinkSaver {
       });
     }
 
-    // Category filter auto-submit
-    document
-      .getElementById("categoryFilter")
-      ?.addEventListener("change", (e) => {
-        e.target.closest("form").submit();
-      });
-
     // Details Modal action buttons
     document
       .getElementById("openLinkBtn")
@@ -141,6 +158,12 @@ class LinkSaver {
       linkUrlInput.addEventListener("blur", (e) => this.handleUrlInputBlur(e));
       this.addMetadataFetchIndicator(linkUrlInput); // Add visual indicator
     }
+    // The URL's own blur asks once metadata is in
+    ["linkTitle", "linkKeywords"].forEach((id) => {
+      document
+        .getElementById(id)
+        ?.addEventListener("change", () => this.suggestForLink());
+    });
   }
 
   addMetadataFetchIndicator(urlInput) {
@@ -242,6 +265,7 @@ class LinkSaver {
           "error"
         );
         this.resetMetadataPreview(); // Hide preview on error
+        this.suggestForLink(); // The URL alone is still worth asking about
         return;
       }
 
@@ -265,6 +289,7 @@ class LinkSaver {
       }
 
       this.updateMetadataPreview(metadata);
+      this.suggestForLink();
 
       if (metadata.title || metadata.description || metadata.image_url) {
         this.showJsNotification("Metadata auto-filled.", "info");
@@ -282,6 +307,7 @@ class LinkSaver {
         console.log("Metadata fetch aborted by user action.");
       } else {
         console.error("Error fetching metadata:", error);
+        this.suggestForLink(); // The URL alone is still worth asking about
         this.showJsNotification(
           "Client-side error fetching metadata. Check console.",
           "error"
@@ -308,6 +334,12 @@ class LinkSaver {
           descriptionField.dataset.autoFilled = "false";
         });
       }
+      const categoryField = linkForm.querySelector("#linkCategoryModal");
+      if (categoryField) {
+        categoryField.addEventListener("change", () => {
+          categoryField.dataset.autoFilled = "false";
+        });
+      }
     }
   }
 
@@ -379,6 +411,113 @@ class LinkSaver {
     }
   }
 
+  // Similar saved links, plus a category and keywords they suggest
+  async suggestForLink() {
+    const linkForm = document.getElementById("linkForm");
+    const value = (selector) => linkForm.querySelector(selector)?.value.trim() || "";
+    const fields = {
+      url: value("#linkUrl"),
+      title: value("#linkTitle"),
+      description: value("#linkDescription"),
+      keywords: value("#linkKeywords"),
+      link_id: this.editingLinkId,
+    };
+    if (!fields.url && !fields.title) {
+      this.resetSuggestions();
+      return;
+    }
+
+    if (this.suggestController) this.suggestController.abort();
+    const controller = (this.suggestController = new AbortController());
+    try {
+      const response = await fetch(appConfig.suggestLinkUrl, {
+        method: "POST",
+        headers: {
+          "Content-Type": "application/json",
+          "X-CSRFToken": value('input[name="csrf_token"]'),
+        },
+        body: JSON.stringify(fields),
+        signal: controller.signal,
+      });
+      if (!response.ok) throw new Error(`Suggestions failed: ${response.status}`);
+      this.renderSuggestions(await response.json());
+    } catch (error) {
+      // Suggestions are a nicety; the form works the same without them
+      if (error.name !== "AbortError") console.warn(error);
+    } finally {
+      if (this.suggestController === controller) this.suggestController = null;
+    }
+  }
+
+  renderSuggestions(data) {
+    const container = document.getElementById("linkSuggestions");
+    const list = document.getElementById("similarLinksList");
+    const keywordBox = document.getElementById("suggestedKeywords");
+    if (!container || !list || !keywordBox) return;
+
+    list.innerHTML = data.similar
+      .map(
+        (link) => `
+        <li>
+          <a href="${this.escapeHtml(link.url)}" target="_blank" rel="noopener noreferrer">${this.escapeHtml(
+          link.title
+        )}</a>
+          ${link.near_duplicate ? '<span class="near-duplicate">Near duplicate</span>' : ""}
+          ${
+            link.category
+              ? `<span class="similar-link-category">${this.escapeHtml(
+                  this.formatCategory(link.category)
+                )}</span>`
+              : ""
+          }
+        </li>`
+      )
+      .join("");
+
+    // Fill in the category unless the user picked one
+    const categoryField = document.getElementById("linkCategoryModal");
+    if (
+      data.category &&
+      categoryField &&
+      (!categoryField.value || categoryField.dataset.autoFilled === "true") &&
+      [...categoryField.options].some((option) => option.value === data.category)
+    ) {
+      categoryField.value = data.category;
+      categoryField.dataset.autoFilled = "true";
+    }
+
+    keywordBox.innerHTML = data.keywords.length
+      ? `<span class="form-help">Suggested keywords:</span> ${data.keywords
+          .map(
+            (keyword) =>
+              `<button type="button" class="tag-facet keyword-suggestion" data-keyword="${this.escapeHtml(
+                keyword
+              )}">+ ${this.escapeHtml(keyword)}</button>`
+          )
+          .join("")}`
+      : "";
+    keywordBox.querySelectorAll(".keyword-suggestion").forEach((button) => {
+      button.addEventListener("click", () => {
+        const keywordsField = document.getElementById("linkKeywords");
+        const current = keywordsField.value.trim();
+        keywordsField.value = current
+          ? `${current.replace(/,\s*$/, "")}, ${button.dataset.keyword}`
+          : button.dataset.keyword;
+        button.remove();
+      });
+    });
+
+    keywordBox.hidden = !data.keywords.length;
+    list.hidden = !data.similar.length;
+    container.hidden = !data.similar.length && !data.keywords.length;
+  }
+
+  resetSuggestions() {
+    if (this.suggestController) this.suggestController.abort();
+    const container = document.getElementById("linkSuggestions");
+    if (container) container.hidden = true;
+  }
+
   handleLinkSaverFormSubmit(event) {
     if (!this.validateLinkSaverForm(event.target)) {
       event.preventDefault(); // Stop form submission if client-side validation fails
@@ -468,7 +607,10 @@ class LinkSaver {
     const descriptionField = linkForm.querySelector("#linkDescription");
     if (titleField) titleField.dataset.autoFilled = "true"; // Allow autofill on first try for new link
     if (descriptionField) descriptionField.dataset.autoFilled = "true"; // Allow autofill
+    document.getElementById("linkCategoryModal").dataset.autoFilled = "true";
 
+    this.editingLinkId = null;
+    this.resetSuggestions();
     this.resetMetadataPreview();
     document.getElementById("linkUrl").focus(); // Focus on first field
     this.openModal("linkModal");
@@ -499,7 +641,10 @@ class LinkSaver {
     // User might want to re-trigger autofill by clearing URL and blurring again
     if (titleField) titleField.dataset.autoFilled = "false";
     if (descriptionField) descriptionField.dataset.autoFilled = "false";
+    document.getElementById("linkCategoryModal").dataset.autoFilled = "false";
 
+    this.editingLinkId = this.currentLinkDataForModal.id;
+    this.resetSuggestions();
     this.resetMetadataPreview(); // Also reset preview for edit modal
     document.getElementById("linkUrl").focus(); // Focus on first field
     this.openModal("linkModal");
@@ -638,7 +783,13 @@ class LinkSaver {
   escapeHtml(text) {
     if (text === null || typeof text === "undefined") return "";
     return String(text).replace(/[&<>"']/g, (match) => {
-      const S = { "&": "&", "<": "<", ">": ">", '"': '"', "'": "'" };
+      const S = {
+        "&": "&amp;",
+        "<": "&lt;",
+        ">": "&gt;",
+        '"': "&quot;",
+        "'": "&#39;",
+      };
       return S[match];
     });
   }
@@ -696,7 +847,384 @@ class LinkSaver {
   }
 
   initLazyLoadObserver() {
-    // Placeholder for future lazy loading implementation if needed
+    const sentinel = document.getElementById("linksSentinel");
+    if (!sentinel || !("IntersectionObserver" in window)) return;
+
+    // Start fetching a little before the user actually reaches the bottom
+    this.linksObserver = new IntersectionObserver(
+      (entries) => {
+        if (entries.some((entry) => entry.isIntersecting)) {
+          this.loadNextLinksPage();
+        }
+      },
+      { rootMargin: "600px 0px" }
+    );
+    this.linksObserver.observe(sentinel);
+  }
+
+  // Search and filtering
+
+  initializeFiltering() {
+    const form = document.getElementById("filterSearchForm");
+    if (!form || !window.fetch || !window.history?.pushState) return; // Plain form posts still work
+
+    form.addEventListener("submit", (e) => {
+      e.preventDefault();
+      this.applyFilters({
+        ...this.filters,
+        search: document.getElementById("searchInput").value.trim(),
+      });
+    });
+
+    // Search as you type once the local copy can answer without a round trip
+    document.getElementById("searchInput")?.addEventListener("input", (e) => {
+      if (!this.replica?.ready) return;
+      this.applyFilters({ ...this.filters, search: e.target.value.trim() }, { history: "replace" });
+    });
+
+    document
+      .getElementById("categoryFilter")
+      ?.addEventListener("change", (e) => {
+        this.applyFilters({ ...this.filters, category: e.target.value });
+      });
+
+    document
+      .getElementById("healthFilter")
+      ?.addEventListener("change", (e) => {
+        this.applyFilters({ ...this.filters, health: e.target.value });
+      });
+
+    document
+      .getElementById("clearFiltersBtn")
+      ?.addEventListener("click", (e) => {
+        e.preventDefault();
+        this.applyFilters(Object.fromEntries(FILTER_KEYS.map((key) => [key, ""])));
+      });
+
+    document.getElementById("tagFacets")?.addEventListener("click", (e) => {
+      const facet = e.target.closest("a.tag-facet");
+      if (!facet) return;
+      e.preventDefault();
+      const tag = facet.dataset.tag === this.filters.tag ? "" : facet.dataset.tag;
+      this.applyFilters({ ...this.filters, tag: tag });
+    });
+
+    window.addEventListener("popstate", () => {
+      const params = new URLSearchParams(window.location.search);
+      this.applyFilters(
+        Object.fromEntries(FILTER_KEYS.map((key) => [key, params.get(key) || ""])),
+        { history: "none" }
+      );
+    });
+  }
+
+  linksQueryParams(filters) {
+    const params = new URLSearchParams({ fields: appConfig.linkFields });
+    for (const key of FILTER_KEYS) {
+      if (filters[key]) params.set(key, filters[key]);
+    }
+    return params;
+  }
+
+  // history: "push" a new entry, "replace" the current one (typing) or "none" (popstate)
+  async applyFilters(filters, { history = "push" } = {}) {
+    const typing = history === "replace";
+    this.filters = filters;
+    this.syncFilterControls({ keepSearchInput: typing }); // Don't fight the caret while typing
+
+    if (history !== "none") {
+      const pageParams = new URLSearchParams();
+      for (const key of FILTER_KEYS) {
+        if (filters[key]) pageParams.set(key, filters[key]);
+      }
+      const query = pageParams.toString();
+      const url = `${appConfig.dashboardUrl}${query ? `?${query}` : ""}`;
+      if (typing) window.history.replaceState(null, "", url);
+      else window.history.pushState(null, "", url);
+    }
+
+    this.filterController?.abort();
+    if (this.replica?.ready) {
+      this.renderLocalResults();
+      return;
+    }
+    this.localResults = null;
+
+    this.filterController = new AbortController();
+    const signal = this.filterController.signal;
+
+    const statsParams = new URLSearchParams();
+    if (filters.category) statsParams.set("category", filters.category);
+
+    try {
+      // Unchanged results come back as 304s and are served from the browser cache
+      const [linksResponse, statsResponse] = await Promise.all([
+        fetch(`${appConfig.apiLinksUrl}?${this.linksQueryParams(filters)}`, {
+          headers: { Accept: "application/json" },
+          signal,
+        }),
+        fetch(`${appConfig.apiStatsUrl}?${statsParams}`, {
+          headers: { Accept: "application/json" },
+          signal,
+        }),
+      ]);
+      const page = await linksResponse.json();
+      if (!linksResponse.ok) {
+        this.showJsNotification(
+          `Could not load links: ${page.error || linksResponse.statusText}`,
+          "error"
+        );
+        return;
+      }
+      this.renderLinksPage(page);
+      if (statsResponse.ok) {
+        const stats = await statsResponse.json();
+        this.renderTagFacets(stats.tags);
+        this.renderBrokenCount(stats.broken_links);
+      }
+    } catch (error) {
+      if (error.name === "AbortError") return;
+      console.error("Error filtering links:", error);
+      this.showJsNotification("Could not load links.", "error");
+    }
+  }
+
+  syncFilterControls({ keepSearchInput = false } = {}) {
+    const searchInput = document.getElementById("searchInput");
+    if (searchInput && !keepSearchInput) searchInput.value = this.filters.search;
+    const categoryFilter = document.getElementById("categoryFilter");
+    if (categoryFilter) categoryFilter.value = this.filters.category;
+    const tagInput = document.getElementById("tagFilterInput");
+    if (tagInput) {
+      tagInput.value = this.filters.tag;
+      tagInput.disabled = !this.filters.tag;
+    }
+    const healthFilter = document.getElementById("healthFilter");
+    if (healthFilter) healthFilter.value = this.filters.health;
+    const clearBtn = document.getElementById("clearFiltersBtn");
+    if (clearBtn) clearBtn.hidden = !this.hasFilters();
+  }
+
+  hasFilters() {
+    return FILTER_KEYS.some((key) => this.filters[key]);
+  }
+
+  renderLinksPage(page) {
+    const linksGrid = document.getElementById("linksGrid");
+    const sentinel = document.getElementById("linksSentinel");
+    const emptyState = document.getElementById("emptyState");
+    if (!linksGrid) return;
+
+    linksGrid.innerHTML = this.renderLinkCards(page.links);
+    linksGrid.hidden = page.links.length === 0;
+    if (sentinel) {
+      sentinel.dataset.nextCursor = page.next_cursor || "";
+      // Re-observe so a sentinel that is already on screen fires again
+      this.linksObserver?.unobserve(sentinel);
+      this.linksObserver?.observe(sentinel);
+    }
+
+    if (emptyState) {
+      const filtered = this.hasFilters();
+      emptyState.hidden = page.links.length > 0;
+      document.getElementById("emptyStateFiltered").hidden = !filtered;
+      document.getElementById("emptyStateIntro").hidden = filtered;
+    }
+  }
+
+  // Local replica
+
+  async initializeReplica() {
+    if (!window.indexedDB || !window.LinkReplica || !appConfig.apiChangesUrl) return;
+
+    const replica = new LinkReplica(appConfig.userId, appConfig.apiChangesUrl);
+    try {
+      await replica.open();
+      await replica.load();
+      if (replica.ready) this.replica = replica; // Answer from the stored copy right away
+      await replica.sync();
+      this.replica = replica;
+    } catch (error) {
+      // Private browsing, quota or offline on the first visit: keep using the API
+      console.warn("Local link copy unavailable:", error);
+      if (!replica.ready) return;
+      this.replica = replica;
+    }
+
+    replica.startBackgroundSync(appConfig.syncIntervalMs, () => {
+      if (this.localResults) this.renderLocalResults({ keepRendered: true });
+    });
+
+    document.querySelector(".logout-btn")?.addEventListener("click", async (e) => {
+      e.preventDefault();
+      await LinkReplica.destroy(appConfig.userId); // Don't leave the links behind on a shared machine
+      window.location.href = e.currentTarget.href;
+    });
+  }
+
+  // keepRendered: after a background sync, re-render as many cards as are on screen
+  renderLocalResults({ keepRendered = false } = {}) {
+    const linksGrid = document.getElementById("linksGrid");
+    const shown = keepRendered && linksGrid ? linksGrid.children.length : 0;
+    const pageSize = Math.max(shown, appConfig.linksPerPage);
+
+    this.localResults = this.replica.query(this.filters);
+    const links = this.localResults.slice(0, pageSize);
+    this.renderLinksPage({
+      links: links,
+      next_cursor: this.localResults.length > pageSize ? `local:${pageSize}` : null,
+    });
+    this.renderTagFacets(this.replica.tagFacets(this.filters.category));
+    this.renderBrokenCount(this.replica.query({ health: "broken" }).length);
+  }
+
+  renderBrokenCount(count) {
+    const brokenLinks = document.getElementById("brokenLinks");
+    if (brokenLinks && Number.isInteger(count)) brokenLinks.textContent = count;
+  }
+
+  renderTagFacets(tags) {
+    const nav = document.getElementById("tagFacets");
+    if (!nav) return;
+    nav.innerHTML = (tags || [])
+      .map((tag) => {
+        const active = tag.name === this.filters.tag;
+        return `<a href="${appConfig.dashboardUrl}?tag=${encodeURIComponent(tag.name)}"
+                   class="tag-facet${active ? " active" : ""}"
+                   data-tag="${this.escapeHtml(tag.name)}"
+                   ${active ? 'aria-current="true"' : ""}>
+                  ${this.escapeHtml(tag.name)} <span class="tag-count">${tag.count}</span>
+                </a>`;
+      })
+      .join("");
+    nav.hidden = !tags || tags.length === 0;
+  }
+
+  truncate(text, length) {
+    if (!text || text.length <= length) return text || "";
+    return `${text.slice(0, length - 3).replace(/\s+\S*$/, "")}...`;
+  }
+
+  formatDate(isoString) {
+    if (!isoString) return { iso: "", label: "" };
+    const date = new Date(`${isoString}Z`); // Stored as naive UTC
+    return {
+      iso: date.toISOString().slice(0, 10),
+      label: date.toLocaleDateString("en-US", {
+        month: "short",
+        day: "2-digit",
+        year: "numeric",
+        timeZone: "UTC",
+      }),
+    };
+  }
+
+  // Mirrors templates/users/_link_cards.html
+  renderLinkCards(links) {
+    return links
+      .map((link) => {
+        const keywords = link.keywords || [];
+        const date = this.formatDate(link.created_at);
+        const title = this.escapeHtml(link.title);
+        const category = link.category
+          ? link.category.charAt(0).toUpperCase() + link.category.slice(1).toLowerCase()
+          : "";
+        return `
+<article class="link-card" tabindex="0" aria-labelledby="link-title-${link.id}"
+     data-id="${link.id}"
+     data-url="${this.escapeHtml(link.url)}"
+     data-title="${title}"
+     data-description="${this.escapeHtml(link.description)}"
+     data-category="${this.escapeHtml(link.category)}"
+     data-keywords="${this.escapeHtml(keywords.join(","))}">
+    <div class="link-header">
+        <div>
+            <h3 class="link-title" id="link-title-${link.id}">${title}</h3>
+            <div class="link-url" title="${this.escapeHtml(link.url)}">${this.escapeHtml(this.truncate(link.url, 60))}</div>
+        </div>
+        <div class="link-actions">
+            <button type="button" class="action-btn edit-btn" aria-label="Edit ${title}">Edit</button>
+            <button type="button" class="action-btn delete-btn" aria-label="Delete ${title}">Delete</button>
+        </div>
+    </div>
+    ${link.description ? `<div class="link-description">${this.escapeHtml(this.truncate(link.description, 120))}</div>` : ""}
+    <div class="link-meta">
+        ${
+          link.health_status === "broken"
+            ? `<span class="link-health-broken" title="${this.escapeHtml(
+                link.health_code ? `HTTP ${link.health_code}` : link.health_error || ""
+              )}">Broken</span>`
+            : ""
+        }
+        ${category ? `<span class="link-category">${this.escapeHtml(category)}</span>` : ""}
+        ${
+          keywords.length
+            ? `<div class="link-keywords" aria-label="Keywords">
+            ${keywords
+              .slice(0, 3)
+              .map(
+                (keyword) =>
+                  `<a class="keyword-tag" href="${appConfig.dashboardUrl}?tag=${encodeURIComponent(keyword)}" data-tag="${this.escapeHtml(keyword)}">${this.escapeHtml(keyword)}</a>`
+              )
+              .join("")}
+            ${keywords.length > 3 ? '<span class="keyword-tag" aria-label="more keywords">...</span>' : ""}
+        </div>`
+            : ""
+        }
+        <time class="link-date" datetime="${date.iso}">${date.label}</time>
+    </div>
+</article>`;
+      })
+      .join("");
+  }
+
+  async loadNextLinksPage() {
+    const sentinel = document.getElementById("linksSentinel");
+    const linksGrid = document.getElementById("linksGrid");
+    if (!sentinel || !linksGrid || this.isLoadingNextPage) return;
+
+    const cursor = sentinel.dataset.nextCursor;
+    if (!cursor) return;
+
+    if (cursor.startsWith("local:") && this.localResults) {
+      const offset = parseInt(cursor.slice(6), 10);
+      const end = offset + appConfig.linksPerPage;
+      linksGrid.insertAdjacentHTML("beforeend", this.renderLinkCards(this.localResults.slice(offset, end)));
+      sentinel.dataset.nextCursor = this.localResults.length > end ? `local:${end}` : "";
+      return;
+    }
+
+    this.isLoadingNextPage = true;
+    sentinel.classList.add("loading");
+
+    const filters = this.filters;
+    try {
+      const params = this.linksQueryParams(filters);
+      params.set("cursor", cursor);
+      const response = await fetch(`${appConfig.apiLinksUrl}?${params}`, {
+        headers: { Accept: "application/json" },
+      });
+      const page = await response.json();
+      if (filters !== this.filters) return; // Filters changed while loading
+
+      if (!response.ok) {
+        this.showJsNotification(
+          `Could not load more links: ${page.error || response.statusText}`,
+          "error"
+        );
+        return;
+      }
+
+      // Grid click delegation picks the new cards up as-is
+      linksGrid.insertAdjacentHTML("beforeend", this.renderLinkCards(page.links));
+      sentinel.dataset.nextCursor = page.next_cursor || "";
+    } catch (error) {
+      console.error("Error loading more links:", error);
+      this.showJsNotification("Could not load more links.", "error");
+    } finally {
+      this.isLoadingNextPage = false;
+      sentinel.classList.remove("loading");
+    }
   }
 }
 
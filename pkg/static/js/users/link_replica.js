@@ -0,0 +1,283 @@
+"use strict";
+
+// Local copy of the user's links in IndexedDB, kept current through
+// /api/v1/links/changes, with an in-memory inverted index so search and
+// filtering on the dashboard need no round trip (and keep working offline).
+class LinkReplica {
+  static DB_VERSION = 2; // 2: links carry health_status
+
+  static databaseName(userId) {
+    return `linksaver-links-${userId}`;
+  }
+
+  // Forget the replica, e.g. on logout; never rejects
+  static destroy(userId) {
+    return new Promise((resolve) => {
+      if (!window.indexedDB) return resolve();
+      const request = indexedDB.deleteDatabase(LinkReplica.databaseName(userId));
+      request.onsuccess = request.onerror = request.onblocked = () => resolve();
+    });
+  }
+
+  // Lowercased words and numbers; matches the fields the server search covers
+  static tokenize(text) {
+    return (text || "").toLowerCase().split(/[^\p{L}\p{N}]+/u).filter(Boolean);
+  }
+
+  // Same rules as Tag.normalize in pkg/models.py
+  static normalizeTag(name) {
+    return (name || "").split(/\s+/).filter(Boolean).join(" ").toLowerCase().slice(0, 50);
+  }
+
+  constructor(userId, changesUrl) {
+    this.userId = userId;
+    this.changesUrl = changesUrl;
+    this.db = null;
+    this.cursor = null; // Last position in the server's change feed
+    this.links = new Map(); // id -> link
+    this.postings = new Map(); // term -> Set of link ids
+    this.sortedTerms = null; // Sorted postings keys for prefix lookups, rebuilt lazily
+    this.ready = false;
+    this.syncing = null;
+    this.syncTimer = null;
+  }
+
+  // Database access
+
+  open() {
+    return new Promise((resolve, reject) => {
+      const request = indexedDB.open(LinkReplica.databaseName(this.userId), LinkReplica.DB_VERSION);
+      request.onupgradeneeded = () => {
+        const db = request.result;
+        // Older copies lack fields added since: drop them and sync afresh
+        for (const name of [...db.objectStoreNames]) db.deleteObjectStore(name);
+        db.createObjectStore("links", { keyPath: "id" });
+        db.createObjectStore("meta", { keyPath: "key" });
+      };
+      request.onsuccess = () => {
+        this.db = request.result;
+        // Another tab upgrading the schema: step aside
+        this.db.onversionchange = () => this.db.close();
+        resolve(this);
+      };
+      request.onerror = () => reject(request.error);
+      request.onblocked = () => reject(new Error("IndexedDB is blocked by another tab"));
+    });
+  }
+
+  transaction(mode, callback) {
+    return new Promise((resolve, reject) => {
+      const tx = this.db.transaction(["links", "meta"], mode);
+      const result = callback(tx.objectStore("links"), tx.objectStore("meta"));
+      tx.oncomplete = () => resolve(result);
+      tx.onerror = tx.onabort = () => reject(tx.error);
+    });
+  }
+
+  async load() {
+    const requests = await this.transaction("readonly", (links, meta) => ({
+      links: links.getAll(),
+      cursor: meta.get("cursor"),
+      complete: meta.get("complete"),
+    }));
+    this.cursor = requests.cursor.result?.value || null;
+    for (const link of requests.links.result) {
+      this.addToMemory(link);
+    }
+    // Stale is fine (a sync follows), half of a first sync is not
+    this.ready = Boolean(requests.complete.result);
+    return this;
+  }
+
+  async reset() {
+    await this.transaction("readwrite", (links, meta) => {
+      links.clear();
+      meta.clear();
+    });
+    this.cursor = null;
+    this.links.clear();
+    this.postings.clear();
+    this.sortedTerms = null;
+    this.ready = false;
+  }
+
+  // Syncing
+
+  // Pull every change since the stored cursor; resolves to the number applied
+  sync() {
+    if (!this.syncing) {
+      this.syncing = this.pullChanges().finally(() => {
+        this.syncing = null;
+      });
+    }
+    return this.syncing;
+  }
+
+  async pullChanges() {
+    let applied = 0;
+    let hasMore = true;
+    while (hasMore) {
+      const params = new URLSearchParams();
+      if (this.cursor) params.set("since", this.cursor);
+      const response = await fetch(`${this.changesUrl}?${params}`, {
+        headers: { Accept: "application/json" },
+        cache: "no-store",
+      });
+      if ((response.status === 400 || response.status === 410) && this.cursor) {
+        // Cursor from an older server format, or older than the server keeps deletions for: start over
+        await this.reset();
+        continue;
+      }
+      if (!response.ok) throw new Error(`Sync failed: ${response.status}`);
+
+      const page = await response.json();
+      hasMore = page.has_more;
+      applied += await this.applyChanges(page.changes, page.cursor, !hasMore);
+    }
+    this.ready = true;
+    return applied;
+  }
+
+  // The feed repeats its most recent changes on the next sync; those the
+  // replica already has are skipped. Resolves to the number applied
+  async applyChanges(changes, cursor, complete) {
+    changes = changes.filter((change) => !this.hasChange(change));
+    // Stored first, so memory never runs ahead of what survives a reload
+    await this.transaction("readwrite", (links, meta) => {
+      for (const change of changes) {
+        if (change.is_active) links.put(change);
+        else links.delete(change.id);
+      }
+      if (cursor) meta.put({ key: "cursor", value: cursor });
+      if (complete) meta.put({ key: "complete", value: true });
+    });
+    for (const change of changes) {
+      this.removeFromMemory(change.id);
+      if (change.is_active) this.addToMemory(change);
+    }
+    this.cursor = cursor || this.cursor;
+    return changes.length;
+  }
+
+  // Compares every field: two edits in the same second share updated_at
+  hasChange(change) {
+    const stored = this.links.get(change.id);
+    if (!change.is_active) return !stored;
+    return Boolean(stored) && Object.keys(change).every(
+      (key) => JSON.stringify(stored[key]) === JSON.stringify(change[key]),
+    );
+  }
+
+  // Syncs every `intervalMs`, when the tab becomes visible and when the
+  // browser comes back online; `onChange` runs after a sync that changed something
+  startBackgroundSync(intervalMs, onChange) {
+    const run = async () => {
+      if (document.hidden || !navigator.onLine) return;
+      try {
+        if ((await this.sync()) > 0) onChange();
+      } catch (error) {
+        console.warn("Background link sync failed:", error);
+      }
+    };
+    this.syncTimer = setInterval(run, intervalMs);
+    document.addEventListener("visibilitychange", run);
+    window.addEventListener("online", run);
+  }
+
+  // Inverted index
+
+  indexedText(link) {
+    return [link.title, link.description, link.url, link.category, (link.keywords || []).join(" ")].join(" ");
+  }
+
+  addToMemory(link) {
+    this.links.set(link.id, link);
+    for (const term of new Set(LinkReplica.tokenize(this.indexedText(link)))) {
+      let ids = this.postings.get(term);
+      if (!ids) {
+        ids = new Set();
+        this.postings.set(term, ids);
+        this.sortedTerms = null;
+      }
+      ids.add(link.id);
+    }
+  }
+
+  removeFromMemory(linkId) {
+    const link = this.links.get(linkId);
+    if (!link) return;
+    this.links.delete(linkId);
+    for (const term of new Set(LinkReplica.tokenize(this.indexedText(link)))) {
+      const ids = this.postings.get(term);
+      if (!ids) continue;
+      ids.delete(linkId);
+      if (ids.size === 0) {
+        this.postings.delete(term);
+        this.sortedTerms = null;
+      }
+    }
+  }
+
+  // Ids of links with a term starting with `prefix`
+  idsForPrefix(prefix) {
+    if (!this.sortedTerms) this.sortedTerms = [...this.postings.keys()].sort();
+    const terms = this.sortedTerms;
+    let low = 0;
+    let high = terms.length;
+    while (low < high) {
+      const middle = (low + high) >>> 1;
+      if (terms[middle] < prefix) low = middle + 1;
+      else high = middle;
+    }
+    const ids = new Set();
+    for (let i = low; i < terms.length && terms[i].startsWith(prefix); i++) {
+      for (const id of this.postings.get(terms[i])) ids.add(id);
+    }
+    return ids;
+  }
+
+  // Queries
+
+  // Links matching every search word (as a prefix) and the filters, newest first
+  query({ search = "", category = "", tag = "", health = "" } = {}) {
+    let candidates = null;
+    // Longest words first: they usually match the fewest links
+    const words = [...new Set(LinkReplica.tokenize(search))].sort((a, b) => b.length - a.length);
+    for (const word of words) {
+      const ids = this.idsForPrefix(word);
+      candidates = candidates ? new Set([...candidates].filter((id) => ids.has(id))) : ids;
+      if (candidates.size === 0) break;
+    }
+
+    const wantedTag = tag ? LinkReplica.normalizeTag(tag) : "";
+    const results = [];
+    for (const id of candidates || this.links.keys()) {
+      const link = this.links.get(id);
+      if (category && link.category !== category) continue;
+      if (health && link.health_status !== health) continue;
+      if (wantedTag && !(link.keywords || []).some((k) => LinkReplica.normalizeTag(k) === wantedTag)) continue;
+      results.push(link);
+    }
+    // ISO timestamps sort correctly as strings
+    return results.sort((a, b) =>
+      a.created_at === b.created_at ? b.id - a.id : a.created_at < b.created_at ? 1 : -1
+    );
+  }
+
+  // [{name, count}] over active links, most used first, like pkg.tags.tag_facets
+  tagFacets(category = "", limit = 30) {
+    const counts = new Map();
+    for (const link of this.links.values()) {
+      if (category && link.category !== category) continue;
+      for (const name of new Set((link.keywords || []).map(LinkReplica.normalizeTag))) {
+        if (name) counts.set(name, (counts.get(name) || 0) + 1);
+      }
+    }
+    return [...counts]
+      .sort((a, b) => b[1] - a[1] || (a[0] < b[0] ? -1 : 1))
+      .slice(0, limit)
+      .map(([name, count]) => ({ name, count }));
+  }
+}
+
+window.LinkReplica = LinkReplica;
@@ -0,0 +1,168 @@
+"""
+Materialized per-user link statistics.
+
+The dashboard used to recompute totals and per-category counts with three
+aggregate queries on every page view. Instead, one UserLinkStats row per user
+is adjusted inside the same transaction as each add/edit/delete, so reading the
+stats is a single primary-key lookup. `flask stats rebuild` repairs any drift.
+
+The row's `version` goes up with every change to the user's links, counted
+or not (edits, health and preview updates too); the API builds its ETags
+from it, so they change even when updated_at can't tell two writes apart.
+"""
+import click
+from flask.cli import AppGroup
+
+from pkg.models import db, Link, User, UserLinkStats
+
+UNCATEGORIZED = ''
+
+stats_cli = AppGroup("stats", help="Maintain the materialized link statistics.")
+
+
+def _category_key(category):
+    return category or UNCATEGORIZED
+
+
+def _count_links(user_id):
+    """Aggregate a user's active links straight from the links table"""
+    rows = (
+        db.session.query(Link.category, db.func.count(Link.id))
+        .filter_by(user_id=user_id, is_active=True)
+        .group_by(Link.category)
+        .all()
+    )
+    counts = {}
+    for category, count in rows:
+        key = _category_key(category)
+        counts[key] = counts.get(key, 0) + count
+    return counts
+
+
+def rebuild_user_stats(user_id):
+    """Recompute a user's stats row from scratch (does not commit)"""
+    counts = _count_links(user_id)
+    stats = db.session.get(UserLinkStats, user_id, with_for_update=True, populate_existing=True)
+    if stats is None:
+        stats = UserLinkStats(user_id=user_id)
+        db.session.add(stats)
+    stats.category_counts = counts
+    stats.total_links = sum(counts.values())
+    stats.version = (stats.version or 0) + 1
+    return stats
+
+
+def _adjust(user_id, deltas):
+    """
+    Apply {category_key: delta} to a user's stats under a row lock and bump
+    its version. Call after the link change has been flushed: if the row is
+    missing it is rebuilt from the links table, which already reflects the change.
+    """
+    stats = db.session.get(UserLinkStats, user_id, with_for_update=True, populate_existing=True)
+    if stats is None:
+        return rebuild_user_stats(user_id)
+
+    stats.version = (stats.version or 0) + 1
+
+    counts = stats.category_counts
+    for key, delta in deltas.items():
+        if not delta:
+            continue
+        new_count = counts.get(key, 0) + delta
+        if new_count > 0:
+            counts[key] = new_count
+        else:
+            counts.pop(key, None)
+        stats.total_links = max((stats.total_links or 0) + delta, 0)
+    return stats
+
+
+def record_link_added(user_id, category, count=1):
+    return _adjust(user_id, {_category_key(category): count})
+
+
+def record_link_removed(user_id, category, count=1):
+    return _adjust(user_id, {_category_key(category): -count})
+
+
+def record_category_changed(user_id, old_category, new_category):
+    """Record an edited link; counts only move if its category changed"""
+    old_key, new_key = _category_key(old_category), _category_key(new_category)
+    if old_key == new_key:
+        return _adjust(user_id, {})
+    return _adjust(user_id, {old_key: -1, new_key: 1})
+
+
+def record_links_changed(user_ids):
+    """
+    Bump the version of users whose links changed outside the link routes
+    (bulk writes: health checks, preview fetching). Users without a stats
+    row yet are skipped; theirs starts from scratch when it is built.
+    """
+    user_ids = sorted(set(user_ids))  # Same lock order in every writer
+    if user_ids:
+        table = UserLinkStats.__table__
+        db.session.execute(
+            table.update()
+            .where(table.c.user_id.in_(user_ids))
+            .values(version=table.c.version + 1, updated_at=table.c.updated_at)
+        )
+
+
+def raise_sync_floor(user_id, floor):
+    """
+    Record that the user's deletions up to `floor` are gone for good, so sync
+    cursors at or before it have to start over (does not commit)
+    """
+    stats = db.session.get(UserLinkStats, user_id, with_for_update=True, populate_existing=True)
+    if stats is None:
+        stats = rebuild_user_stats(user_id)
+    if stats.sync_floor is None or stats.sync_floor < floor:
+        stats.sync_floor = floor
+    return stats
+
+
+def get_link_stats(user_id):
+    """
+    Return (stats, categories_for_filter) for the dashboard with one
+    primary-key lookup. Users without a stats row get one built on demand.
+    """
+    stats = db.session.get(UserLinkStats, user_id)
+    if stats is None:
+        stats = rebuild_user_stats(user_id)
+        db.session.commit()
+
+    counts = stats.category_counts or {}
+    categories = {key or 'Uncategorized': count for key, count in counts.items()}
+    categories_for_filter = sorted(key for key in counts if key)
+    return {'total_links': stats.total_links, 'categories': categories}, categories_for_filter
+
+
+class LinkStats:
+    """Flask extension for the materialized stats; registers `flask stats`"""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['link_stats'] = self
+        app.cli.add_command(stats_cli)
+
+
+link_stats = LinkStats()
+
+
+@stats_cli.command("rebuild")
+@click.option("--user-id", type=int, default=None, help="Only rebuild this user's stats.")
+def rebuild_command(user_id):
+    """Recompute link statistics from the links table."""
+    if user_id is not None:
+        user_ids = [user_id]
+    else:
+        user_ids = [row.id for row in db.session.query(User.id).all()]
+
+    for uid in user_ids:
+        rebuild_user_stats(uid)
+        db.session.commit()  # One short transaction per user
+    click.echo(f"Rebuilt link stats for {len(user_ids)} user(s).")
@@ -0,0 +1,162 @@
+"""
+Normalized tag storage.
+
+`Link.keywords` remains the comma-separated display and full-text copy, while
+`tags` / `link_tags` hold one normalized row per tag and per (link, tag) pair.
+Tag filters and the per-tag counts on the dashboard are indexed joins on
+link_tags(tag_id, link_id), so "java" no longer matches "javascript".
+"""
+import click
+from flask.cli import AppGroup
+
+from pkg.models import db, Link, Tag, User, link_tags
+from pkg.stats import record_links_changed
+
+TAG_FACET_LIMIT = 30
+
+tags_cli = AppGroup("tags", help="Maintain the normalized tag tables.")
+
+
+def split_keywords(keywords):
+    return [keyword.strip() for keyword in (keywords or '').split(',') if keyword.strip()]
+
+
+def filter_by_tag(query, user_id, tag_name):
+    """Restrict a Link query to links carrying `tag_name` (exact, case-insensitive)"""
+    tag_id = (
+        db.session.query(Tag.id)
+        .filter(Tag.user_id == user_id, Tag.name == Tag.normalize(tag_name))
+        .scalar()
+    )
+    if tag_id is None:
+        return query.filter(db.false())
+    return query.join(link_tags, link_tags.c.link_id == Link.id).filter(link_tags.c.tag_id == tag_id)
+
+
+def tag_facets(user_id, category=None, limit=TAG_FACET_LIMIT):
+    """[(tag name, active link count)], most used first"""
+    link_count = db.func.count(link_tags.c.link_id)
+    query = (
+        db.session.query(Tag.name, link_count)
+        .join(link_tags, link_tags.c.tag_id == Tag.id)
+        .join(Link, Link.id == link_tags.c.link_id)
+        .filter(Tag.user_id == user_id, Link.is_active.is_(True))
+    )
+    if category:
+        query = query.filter(Link.category == category)
+    return query.group_by(Tag.id, Tag.name).order_by(link_count.desc(), Tag.name).limit(limit).all()
+
+
+def attach_tags(user_id, rows):
+    """
+    Bulk version of Link.set_keywords_list for rows written without the ORM
+    (the importer): `rows` is [(link_id, keywords text)]. Missing tags and the
+    association rows are inserted with executemany. Does not commit.
+    """
+    names_by_link = {}
+    for link_id, keywords in rows:
+        names = []
+        for keyword in split_keywords(keywords):
+            name = Tag.normalize(keyword)
+            if name and name not in names:
+                names.append(name)
+        if names:
+            names_by_link[link_id] = names
+    if not names_by_link:
+        return 0
+
+    wanted = {name for names in names_by_link.values() for name in names}
+    tag_ids = _tag_ids(user_id, wanted)
+    missing = wanted - tag_ids.keys()
+    if missing:
+        db.session.execute(db.insert(Tag), [{'user_id': user_id, 'name': name} for name in sorted(missing)])
+        tag_ids.update(_tag_ids(user_id, missing))
+
+    pairs = [
+        {'link_id': link_id, 'tag_id': tag_ids[name]}
+        for link_id, names in names_by_link.items()
+        for name in names
+    ]
+    db.session.execute(link_tags.insert(), pairs)
+    return len(pairs)
+
+
+def _tag_ids(user_id, names):
+    found = {}
+    names = list(names)
+    for start in range(0, len(names), 500):  # Keep IN lists to a sane size
+        rows = db.session.query(Tag.name, Tag.id).filter(
+            Tag.user_id == user_id, Tag.name.in_(names[start:start + 500])
+        )
+        found.update(dict(rows))
+    return found
+
+
+def rebuild_user_tags(user_id, chunk_size=1000):
+    """Recreate a user's link_tags rows from Link.keywords and drop unused tags"""
+    user_links = db.select(Link.id).where(Link.user_id == user_id).scalar_subquery()
+    db.session.execute(link_tags.delete().where(link_tags.c.link_id.in_(user_links)))
+
+    last_id = 0
+    while True:
+        rows = (
+            db.session.query(Link.id, Link.keywords)
+            .filter(Link.user_id == user_id, Link.id > last_id, Link.keywords.isnot(None))
+            .order_by(Link.id)
+            .limit(chunk_size)
+            .all()
+        )
+        if not rows:
+            break
+        attach_tags(user_id, rows)
+        last_id = rows[-1].id
+
+    record_links_changed([user_id])  # Tag facets may have changed
+    return prune_unused_tags(user_id)
+
+
+def prune_unused_tags(user_id=None):
+    """Delete tags no longer attached to any link; returns how many went"""
+    used = db.select(link_tags.c.tag_id).distinct()
+    query = Tag.query.filter(Tag.id.not_in(used))
+    if user_id is not None:
+        query = query.filter(Tag.user_id == user_id)
+    return query.delete(synchronize_session=False)
+
+
+class Tagging:
+    """Flask extension for the tag tables; registers `flask tags`"""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['tagging'] = self
+        app.cli.add_command(tags_cli)
+
+
+tagging = Tagging()
+
+
+@tags_cli.command("rebuild")
+@click.option("--user-id", type=int, default=None, help="Only rebuild this user's tags.")
+def rebuild_command(user_id):
+    """Recreate tag associations from the links' keywords."""
+    if user_id is not None:
+        user_ids = [user_id]
+    else:
+        user_ids = [row.id for row in db.session.query(User.id).all()]
+
+    for uid in user_ids:
+        rebuild_user_tags(uid)
+        db.session.commit()  # One transaction per user
+    click.echo(f"Rebuilt tags for {len(user_ids)} user(s).")
+
+
+@tags_cli.command("prune")
+def prune_command():
+    """Delete tags that are no longer used by any link."""
+    deleted = prune_unused_tags()
+    db.session.commit()
+    click.echo(f"Deleted {deleted} unused tag(s).")
@@ -0,0 +1,87 @@
+"""URL helpers shared by the metadata fetcher, its cache and duplicate detection"""
+import hashlib
+import re
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+SCHEME_RE = re.compile(r'^[a-z][a-z0-9+.-]*://', re.IGNORECASE)
+
+# Query parameters that only identify a campaign or click, never the page
+TRACKING_PARAMS = frozenset({
+    'fbclid', 'gclid', 'gclsrc', 'dclid', 'gbraid', 'wbraid', 'msclkid', 'yclid', 'twclid',
+    'igshid', 'mc_cid', 'mc_eid', '_hsenc', '_hsmi', 'mkt_tok', 'oly_anon_id', 'oly_enc_id',
+    'vero_id', 'wickedid', 'ref_src', 'ref_url', '_ga', '_gl',
+})
+TRACKING_PREFIXES = ('utm_', 'pk_', 'hsa_')
+
+
+def normalize_url(url):
+    """
+    Normalize a URL for use as a cache key: lowercase scheme and host, drop
+    default ports and the fragment, and give an empty path a single '/'.
+    The query string is left untouched. A URL saved without a scheme
+    ("example.com/page") is read as https, the way prepare_url fetches it.
+    """
+    url = url.strip()
+    if not SCHEME_RE.match(url):
+        url = 'https:' + url if url.startswith('//') else 'https://' + url
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if ':' in host:
+        host = f"[{host}]"  # IPv6 literal; hostname drops the brackets
+
+    netloc = host
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        netloc = f"{host}:{parts.port}"
+    if parts.username:
+        userinfo = parts.username
+        if parts.password:
+            userinfo += f":{parts.password}"
+        netloc = f"{userinfo}@{netloc}"
+
+    return urlunsplit((scheme, netloc, parts.path or '/', parts.query, ''))
+
+
+def _is_tracking_param(name):
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+
+def canonicalize_url(url):
+    """
+    Canonical form used to spot the same page saved twice: normalize_url,
+    plus tracking parameters removed, the query sorted and a trailing slash
+    dropped from non-root paths. Hash-bang fragments (#!/..., #/...) are kept
+    since single-page apps route on them.
+    """
+    parts = urlsplit(normalize_url(url))
+
+    path = parts.path
+    if len(path) > 1 and path.endswith('/'):
+        path = path.rstrip('/') or '/'
+
+    params = [(name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+              if not _is_tracking_param(name)]
+    query = urlencode(sorted(params))
+
+    fragment = urlsplit(url.strip()).fragment
+    if not fragment.startswith(('!', '/')):
+        fragment = ''
+
+    return urlunsplit((parts.scheme, parts.netloc, path, query, fragment))
+
+
+def url_hash(url):
+    """Fixed-width (sha256 hex) key for a URL that is already normalized/canonical"""
+    return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+
+def canonical_url_hash(url):
+    """Key for Link.url_hash: the hash of the canonical URL"""
+    try:
+        return url_hash(canonicalize_url(url))
+    except ValueError:
+        # Unparseable (bad port, broken IPv6 literal), e.g. saved before URLs were checked:
+        # only an identical URL matches it, as in the url_hash migration
+        return url_hash(url.strip())
@@ -0,0 +1,111 @@
+"""
+Cross-request cache for the current user.
+
+Every authenticated request needs the user's id, name and active flag, and
+nothing else from the users table. Those are kept in a bounded in-process
+LRU with a short TTL, so most requests never query users at all.
+
+Changes made through the ORM (deactivating a user, renaming them) drop the
+entry once their transaction commits. Other worker processes pick the change
+up when their copy expires, so USER_CACHE_TTL is the longest a deactivated
+account can keep working there. Code that updates users in bulk, bypassing
+the ORM, should call user_cache.invalidate() itself.
+"""
+import time
+from collections import namedtuple
+
+from flask import g, session
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from pkg.models import db, User
+from pkg.lru import LRUCache
+
+# What routes get as g.user: enough for ownership checks and the greeting
+CurrentUser = namedtuple('CurrentUser', 'id name is_active')
+
+CACHED_ATTRIBUTES = ('name', 'is_active')
+
+
+class UserCache:
+    """Flask extension caching CurrentUser rows by id"""
+
+    def __init__(self, app=None):
+        self._memory = LRUCache(1)
+        self.ttl = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('USER_CACHE_TTL', 30)  # Seconds before a cached user is re-read
+        app.config.setdefault('USER_CACHE_SIZE', 10000)  # Users kept per process
+        self._memory = LRUCache(app.config['USER_CACHE_SIZE'])
+        self.ttl = app.config['USER_CACHE_TTL']
+        app.extensions['user_cache'] = self
+
+    def get(self, user_id):
+        """CurrentUser for `user_id`, or None if there is no such user"""
+        cached = self._memory.get(user_id)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+
+        row = db.session.query(User.id, User.name, User.is_active).filter(User.id == user_id).first()
+        if row is None:
+            return None
+        user = CurrentUser(row.id, row.name, bool(row.is_active))
+        if self.ttl > 0:
+            self._memory.put(user_id, (time.monotonic() + self.ttl, user))
+        return user
+
+    def invalidate(self, user_id):
+        self._memory.pop(user_id)
+
+    def clear(self):
+        self._memory.clear()
+
+
+user_cache = UserCache()
+
+
+def load_current_user():
+    """
+    The logged-in, active user as g.user, or None. A session pointing at a
+    missing or deactivated account is cleared.
+    """
+    user_id = session.get('user_id')
+    user = user_cache.get(user_id) if user_id is not None else None
+    if user is None or not user.is_active:
+        session.pop('user_id', None)
+        session.pop('user_name', None)
+        user = None
+    g.user = user
+    return user
+
+
+# Invalidation: note users changed in a flush, drop them once it commits
+
+def _note_changed_user(target):
+    inspect(target).session.info.setdefault('changed_user_ids', set()).add(target.id)
+
+
+@event.listens_for(User, 'after_update')
+def _user_updated(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in CACHED_ATTRIBUTES):
+        _note_changed_user(target)
+
+
+@event.listens_for(User, 'after_delete')
+def _user_deleted(mapper, connection, target):
+    _note_changed_user(target)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed_users(session):
+    for user_id in session.info.pop('changed_user_ids', ()):
+        user_cache.invalidate(user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_rolled_back_users(session):
+    session.info.pop('changed_user_ids', None)